@@ -1,7 +1,22 @@
 import sqlite3
 from database_setup import DatabaseManager
+from claims_engine import adjudicate_claims, print_summary
+from claim_queue import lease_claims, complete_claim, release_claims, queue_stats
+from commission_ledger import run_payroll, print_payroll
+from performance_cube import DIMENSIONS, query_cube, print_rollup
+from agent import list_policy_packages
+from pagination import DEFAULT_PAGE_SIZE, browse, fetch_page
+from report_cache import cached_query
 
-def manage_agents(db ,nric):
+# Claims leased to an admin at a time while reviewing
+CLAIM_BATCH_SIZE = 10
+
+def list_agents(db, page_size=DEFAULT_PAGE_SIZE, token=None):
+    # One page of agents in agent ID order: (rows, next_token)
+    return fetch_page(db, "a.agent_id, a.nric, u.name, a.qualification, a.status",
+                      "agents a JOIN users u ON a.nric = u.nric", ["a.agent_id"], page_size=page_size, token=token)
+
+def manage_agents(db ,nric, page_size=DEFAULT_PAGE_SIZE):
     print("\nManaging Agents")
     while True:
         print("\n[1] View All Agents")
@@ -11,17 +26,12 @@ def manage_agents(db ,nric):
 
         if choice == "1":
             try:
-                db.cursor.execute('''
-                    SELECT a.agent_id, a.nric, u.name, a.qualification, a.status
-                    FROM agents a
-                    JOIN users u ON a.nric = u.nric
-                ''')
-                agents = db.cursor.fetchall()
-                if agents:
-                    print("\nAll Agents:")
+                def show_page(agents, page_number):
+                    print(f"\nAll Agents (page {page_number}):")
                     for agent in agents:
                         print(f"ID: {agent[0]}, NRIC: {agent[1]}, Name: {agent[2]}, Qualification: {agent[3]}, Status: {agent[4]}")
-                else:
+
+                if not browse(lambda token: list_agents(db, page_size, token), show_page):
                     print("No agents found.")
             except sqlite3.Error as e:
                 print(f"Error retrieving agents: {e}")
@@ -46,15 +56,15 @@ def manage_agents(db ,nric):
 
 def generate_reports(db):
     try:
-        db.cursor.execute('''
+        # Totals come from the agent_sales_summary table the purchased_policy triggers maintain
+        reports = cached_query(db, '''
             SELECT u.name, a.qualification, a.status, a.commission_rate, 
-                   SUM(p.premium) AS total_sales
+                   SUM(s.premium_total) AS total_sales
             FROM agents a
             JOIN users u ON a.nric = u.nric
-            JOIN purchased_policy p ON a.agent_id = p.agent_id
+            JOIN agent_sales_summary s ON a.agent_id = s.agent_id
             GROUP BY a.agent_id
-        ''')
-        reports = db.cursor.fetchall()
+        ''', tables=("agents", "users", "agent_sales_summary"))
         if reports:
             print("\nReports:\n")
             print(
@@ -69,31 +79,24 @@ def generate_reports(db):
     except sqlite3.Error as e:
         print(f"Error retrieving reports: {e}")
 
-def process_claims_approval(db):
+def process_claims_approval(db, adjuster="admin"):
     print("\nProcessing Claims Approval...")
 
-    # Check if the claims table exists and is empty
+    # Claims are leased from the shared work queue a batch at a time, so several admins
+    # can review at once without seeing the same claims. Each decision commits on its own.
     try:
-        table_name = "claims"
-        query = f"SELECT COUNT(*) FROM {table_name}"
-        db.cursor.execute(query)
-        result = db.cursor.fetchone()[0]
-
-        if result == 0:
-            print(f"The table {table_name} is empty.")
+        stats = queue_stats(db)
+        if stats["pending"] == 0:
+            print("No pending claims to process.")
             return
-        else:
-            print(f"The table {table_name} has {result} rows.")
+        print(f"{stats['pending']} pending claims ({stats['leased']} being reviewed by other admins).")
 
-        # Proceed with claims approval if the table is not empty
-        db.cursor.execute('''
-            SELECT claim_id, policy_id, customer_id, details, amount, status, date_filed
-            FROM claims
-            WHERE LOWER(status) = "Pending request"
-        ''')
-        claims = db.cursor.fetchall()
+        reviewed = 0
+        while True:
+            claims = lease_claims(db, adjuster, CLAIM_BATCH_SIZE)
+            if not claims:
+                break
 
-        if claims:
             for claim in claims:
                 claim_id, policy_id, customer_id, details, amount, status, date_filed = claim
                 print(f"""
@@ -113,43 +116,88 @@ def process_claims_approval(db):
                     decision = input("Approve (a) / Reject (r)? ").lower()
 
                 if decision == 'a':
-                    db.cursor.execute('''
-                        UPDATE claims
-                        SET status = "Accepted"
-                        WHERE claim_id = ?
-                    ''', (claim_id,))
-                    print(f"Claim {claim_id} has been approved.")
-                elif decision == 'r':
+                    done = complete_claim(db, claim_id, adjuster, "Accepted")
+                    message = f"Claim {claim_id} has been approved."
+                else:
                     rejection_reason = input("Enter the reason for rejection: ")
-                    db.cursor.execute('''
-                        UPDATE claims
-                        SET status = "Rejected", details = ?
-                        WHERE claim_id = ?
-                    ''', (f"{details} | Rejection Reason: {rejection_reason}", claim_id))
-                    print(f"Claim {claim_id} has been rejected.")
-
-            # Commit the transaction after all claims are processed
-            db.conn.commit()
-        else:
-            print("No pending claims to process.")
+                    done = complete_claim(db, claim_id, adjuster, "Rejected",
+                                          f"{details} | Rejection Reason: {rejection_reason}")
+                    message = f"Claim {claim_id} has been rejected."
+
+                if done:
+                    reviewed += 1
+                    print(message)
+                else:
+                    print(f"Your hold on claim {claim_id} expired and it was handed to another admin. "
+                          f"The decision was not saved.")
+
+        if reviewed == 0:
+            print("No pending claims available to you.")
 
     except sqlite3.Error as e:
         print(f"Error processing claims: {e}")
+    finally:
+        # Put back anything still held, e.g. after an error
+        try:
+            release_claims(db, adjuster)
+        except sqlite3.Error:
+            pass
+
+def auto_adjudicate_claims(db, adjuster="admin"):
+    # Settle the pending claims the rules can decide, then offer the rest for manual review
+    try:
+        summary = adjudicate_claims(db)
+        print_summary(summary)
+    except sqlite3.Error as e:
+        print(f"Error auto-adjudicating claims: {e}")
+        return
+
+    if summary["for_review"] and input("\nReview the remaining claims now? (y/n): ").lower() == "y":
+        process_claims_approval(db, adjuster)
+
+def run_commission_payroll(db):
+    # Show what each agent is owed, then pay it all out in one run
+    try:
+        payouts = run_payroll(db, dry_run=True)
+        print_payroll(payouts, dry_run=True)
+        if not payouts:
+            return
+        if input("\nPay out these balances? (yes/no): ").lower() != "yes":
+            print("Payroll canceled.")
+            return
+        print_payroll(run_payroll(db))
+    except sqlite3.Error as e:
+        print(f"Error running commission payroll: {e}")
+
+def view_performance_cube(db):
+    # Roll the agent performance cube up or drill down by period, agent and product
+    print(f"\nGroup by any of: {', '.join(DIMENSIONS)}")
+    by = [name.strip() for name in (input("Group by (default: year): ") or "year").split(",") if name.strip()]
+    agent_id = input("Agent ID (blank for all): ").strip() or None
+    start_month = input("From month YYYY-MM (blank for all): ").strip() or None
+    end_month = input("To month YYYY-MM (blank for all): ").strip() or None
+    try:
+        columns, rows = query_cube(db, by, agent_id, start_month, end_month)
+        if not rows:
+            print("No sales in this period.")
+            return
+        print()
+        print_rollup(columns, rows)
+    except ValueError as e:
+        print(f"Error: {e}")
+    except sqlite3.Error as e:
+        print(f"Error reading the performance cube: {e}")
 
-def review_policies(db):
+def review_policies(db, page_size=DEFAULT_PAGE_SIZE):
     print("\nReviewing All Policies ")
     try:
-        db.cursor.execute('''
-            SELECT policy_id, policy_type, policy_plan, coverage_amount, premium 
-            FROM policy_package
-        ''')
-        policies = db.cursor.fetchall()
-        if policies:
-            print("\nPolicies:")
+        def show_page(policies, page_number):
+            print(f"\nPolicies (page {page_number}):")
             for policy in policies:
                 print(f"Policy ID: {policy[0]}, Type: {policy[1]}, Plan: {policy[2]}, "
                       f"Coverage Amount: {policy[3]}, Premium: {policy[4]}")
-        else:
+
+        if not browse(lambda token: list_policy_packages(db, page_size, token), show_page):
             print("No policies found.")
     except sqlite3.Error as e:
         print(f"Error reviewing policies: {e}")
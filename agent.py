@@ -1,26 +1,15 @@
 from database_setup import sqlite3
+from id_allocator import get_allocator
+from pagination import DEFAULT_PAGE_SIZE, browse, fetch_page
+from report_cache import REPORT_CACHE, cached_query
 
-def generate_agent_id(db):
-    try:
-        # Fetch the last agent ID from the database
-        db.cursor.execute("SELECT agent_id FROM agents ORDER BY agent_id DESC LIMIT 1")
-        result = db.cursor.fetchone()
-
-        if result:
-            # Extract the numeric part of the last ID and increment it
-            last_id = result[0]  # Example: "AG01"
-            last_number = int(last_id[2:])  # Extract numeric part (e.g., 01)
-            new_number = last_number + 1
-        else:
-            # Start with 1 if no IDs exist
-            new_number = 1
+# Purchased policy columns shown in an agent's policy list
+POLICY_LIST_COLUMNS = ("customer_id", "policy_id", "agent_id", "policy_type", "policy_plan", "coverage_amount",
+                       "premium", "status", "start_date", "end_date")
 
-        # Format new ID with leading zeros (AG01, AG02, etc.)
-        return f"AG{new_number:02d}"
-    except Exception as e:
-        print(f"Error generating agent ID: {e}")
-        # Fallback to timestamp-based ID if there's an error
-        return f"AG{datetime.now().strftime('%Y%m%d%H%M%S')}"
+def generate_agent_id(db):
+    # Generate a new agent ID in the format AG01, AG02, etc.
+    return get_allocator(db).next_id(db, "agent")
 
 def manage_agent_profile(db, nric):
     # Allows agents to view and update their profile
@@ -144,11 +133,19 @@ def manage_policies(db):
     except Exception as e:
         print(f"Error managing policies: {e}")
 
-def view_all_policies(db):
-    try:
-        db.cursor.execute("SELECT * FROM policy_package")
-        policies = db.cursor.fetchall()
+def list_policy_packages(db, page_size=DEFAULT_PAGE_SIZE, token=None):
+    # One page of policy packages in policy ID order: (rows, next_token), cached until policy_package changes
+    return REPORT_CACHE.get(db, ("policy_packages", page_size, token), ("policy_package",), lambda: fetch_page(
+        db, "policy_id, policy_type, policy_plan, coverage_amount, premium, custom_data",
+        "policy_package", ["policy_id"], page_size=page_size, token=token))
 
+def list_agent_policies(db, agent_id, page_size=DEFAULT_PAGE_SIZE, token=None):
+    # One page of the policies an agent sold, in (customer_id, policy_id) order: (rows, next_token)
+    return fetch_page(db, ", ".join(POLICY_LIST_COLUMNS), "purchased_policy", ["customer_id", "policy_id"],
+                      "agent_id = ?", (agent_id,), page_size, token)
+
+def view_all_policies(db, page_size=DEFAULT_PAGE_SIZE):
+    try:
         # Headers
         custom_headers = ["Policy ID", "Policy Type", "Policy Plan", "Coverage Amount", "Premium", "Custom Data"]
 
@@ -157,56 +154,43 @@ def view_all_policies(db):
         print(header)
         print("=" * len(header))
 
-        # Print each policy row 
-        for policy in policies:
-    
-            policy_id = policy[0]  
-            policy_type = policy[1] 
-            policy_plan = policy[2]
-            coverage_amount = policy[3]
-            premium = policy[4]
-            custom_data = policy[5]
-
-            # Format and print the row
-            row = " | ".join(f"{str(item):<20}" for item in [
-                policy_id, policy_type, policy_plan, coverage_amount, premium, custom_data
-            ])
-            print(row)
+        # Print each policy row, a page at a time
+        def show_page(policies, page_number):
+            for policy in policies:
+                row = " | ".join(f"{str(item):<20}" for item in policy)
+                print(row)
+            print("=" * len(header))
 
-        print("=" * len(header))
+        browse(lambda token: list_policy_packages(db, page_size, token), show_page)
 
     except Exception as e:
         print(f"Error fetching policies: {e}")
 
-def view_customer_details(db, agent_id, nric):
+def view_customer_details(db, agent_id, nric, page_size=DEFAULT_PAGE_SIZE):
     try:
-        db.cursor.execute(
-            "SELECT * FROM purchased_policy WHERE agent_id = ?", (agent_id,)
-        )
-        policies = db.cursor.fetchall()
-
-        if not policies:
+        # Display list of customers in table, a page at a time
+        def show_page(policies, page_number):
+            headers = POLICY_LIST_COLUMNS
+            column_widths = [max(len(str(row[i])) for row in [headers] + policies) for i in range(len(headers))]
+
+            # Print header
+            print(f"\nPolicies List (page {page_number})")
+            print("=" * (sum(column_widths) + len(column_widths) - 1))
+            header_row = " | ".join(f"{headers[i]:<{column_widths[i]}}" for i in range(len(headers)))
+            print(header_row)
+            print("-" * len(header_row))
+
+            # Print each policy row
+            for policy in policies:
+                row = " | ".join(f"{str(policy[i]):<{column_widths[i]}}" for i in range(len(policy)))
+                print(row)
+
+            print("=" * len(header_row))
+
+        if not browse(lambda token: list_agent_policies(db, agent_id, page_size, token), show_page):
             print(f"No policies found for Agent ID: {agent_id}")
             return
 
-        # Display list of customers in table
-        headers = [desc[0] for desc in db.cursor.description]
-        column_widths = [max(len(str(row[i])) for row in [headers] + policies) for i in range(len(headers))]
-
-        # Print header
-        print("\nPolicies List")
-        print("=" * (sum(column_widths) + len(column_widths) - 1))
-        header_row = " | ".join(f"{headers[i]:<{column_widths[i]}}" for i in range(len(headers)))
-        print(header_row)
-        print("-" * len(header_row))
-
-        # Print each policy row
-        for policy in policies:
-            row = " | ".join(f"{str(policy[i]):<{column_widths[i]}}" for i in range(len(policy)))
-            print(row)
-
-        print("=" * len(header_row))
-
         # Display individual customer details
         db.cursor.execute('''
             SELECT users.nric, users.name, users.email, users.contact_number 
@@ -310,23 +294,22 @@ def calculate_commission(db, agent_id):
 
         commission_rate = result[0]
 
-        # Fetch the total premiums from policies sold by the agent
+        # Premiums paid and commission accrued at the rate in effect when each was paid, from the ledger
         db.cursor.execute('''
-            SELECT SUM(p.premium) 
-            FROM purchased_policy AS pp
-            JOIN policy_package AS p ON pp.policy_id = p.policy_id
-            WHERE pp.agent_id = ?
+            SELECT premium_total, accrued_total, paid_total, balance
+            FROM agent_commission_balance
+            WHERE agent_id = ?
         ''', (agent_id,))
-        total_premium = db.cursor.fetchone()[0] or 0  # Default to 0 if no policies are sold
-
-        # Calculate total commission
-        total_commission = total_premium * (commission_rate / 100)
+        balance = db.cursor.fetchone() or (0, 0, 0, 0)  # Default to 0 if no premiums are paid yet
+        total_premium, total_commission, commission_paid, commission_owed = balance
 
         # Display the results
         print("\n============[ Commission Details ]============")
         print(f"Total Premium Earned : RM{total_premium:.2f}")
         print(f"Commission Rate      : {commission_rate}%")
         print(f"Total Commission     : RM{total_commission:.2f}")
+        print(f"Commission Paid      : RM{commission_paid:.2f}")
+        print(f"Commission Owed      : RM{commission_owed:.2f}")
         print("================================================")
 
     except sqlite3.Error as e:
@@ -335,15 +318,13 @@ def calculate_commission(db, agent_id):
 def view_sales_report(db, agent_id):
     try:
         # Fetch sales details
-        db.cursor.execute('''
+        sales = cached_query(db, '''
             SELECT purchased_policy.policy_id, purchased_policy.customer_id, purchased_policy.policy_type, purchased_policy.premium, purchased_policy.start_date 
             FROM purchased_policy 
             WHERE purchased_policy.agent_id = ?
             ORDER BY start_date DESC;
 
-        ''', (agent_id,))
-
-        sales = db.cursor.fetchall()
+        ''', (agent_id,), ("purchased_policy",))
 
         if not sales:
             print("No sales records found for this agent.")
@@ -356,39 +337,28 @@ def view_sales_report(db, agent_id):
         for sale in sales:
             print(f"{sale[0]}      | {sale[1]}         | {sale[2]}      | {sale[3]}       | {sale[4]}")
 
-    # Retrieve the agent's commission rate
-        db.cursor.execute('''
-            SELECT commission_rate 
-            FROM agents 
-            WHERE agent_id = ?;
-        ''', (agent_id,))
-
-        commission_rate = db.cursor.fetchone()
-
-        if not commission_rate:
-            print("Agent commission rate not found.")
-            return
-
-        commission_rate = commission_rate[0]
-
-        # Calculate total policies sold yearly and total commission
-        db.cursor.execute('''
-            SELECT strftime('%Y', start_date) AS year, COUNT(*) AS total_policies, 
-                   SUM(premium * ?) AS total_commission 
-            FROM purchased_policy 
+        # Total policies sold yearly, from the sales summary
+        policies_sold = dict(cached_query(db, '''
+            SELECT year, SUM(policy_count) AS total_policies
+            FROM agent_sales_summary 
             WHERE agent_id = ?
-            GROUP BY year
-            ORDER BY year DESC;
-        ''', (commission_rate, agent_id))
+            GROUP BY year;
+        ''', (agent_id,), ("agent_sales_summary",)))
 
-        yearly_summary = db.cursor.fetchall()
+        # Commission earned yearly, from the commission ledger by payment date
+        commission_earned = dict(cached_query(db, '''
+            SELECT strftime('%Y', effective_date) AS year, SUM(commission_amount) AS total_commission
+            FROM commission_ledger
+            WHERE agent_id = ? AND entry_type != 'payout'
+            GROUP BY year;
+        ''', (agent_id,), ("commission_ledger",)))
 
         print("\n=============[ Yearly Summary ]=============")
         print("Year | Total Policies Sold | Total Commission")
         print("-" * 44)
 
-        for summary in yearly_summary:
-            print(f"{summary[0]} |      {summary[1]}              | {summary[2]:.2f}")
+        for year in sorted(set(policies_sold) | set(commission_earned), reverse=True):
+            print(f"{year} |      {policies_sold.get(year, 0)}              | {commission_earned.get(year, 0):.2f}")
             
     except sqlite3.Error as e:
         print(f"An error occurred while retrieving the sales report: {e}")
\ No newline at end of file
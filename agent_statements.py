@@ -0,0 +1,269 @@
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+from urllib.parse import quote
+
+from commission_ledger import commission_statement
+from database_setup import PooledSession
+
+# Month-end statements for every agent.
+# Agents are split into small batches that are handed to a process pool, biggest books first so
+# no worker is left with a long tail. Each worker opens its own read-only connection and writes
+# one statement file per agent; the per-agent timings come back to the parent, which writes them
+# to timings.csv so slow agents can be found.
+
+TIMING_COLUMNS = ("agent_id", "seconds", "policies", "ledger_entries", "error")
+
+_worker_conn = None
+
+
+def last_month(today=None):
+    # First and last day of the previous calendar month
+    end = (today or date.today()).replace(day=1) - timedelta(days=1)
+    return end.replace(day=1).isoformat(), end.isoformat()
+
+
+def _open_read_only(db_name):
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(db_name))}?mode=ro", uri=True, timeout=30)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def statement_data(db, agent_id, start_date, end_date):
+    """
+    Everything on one agent's statement for start_date to end_date ('YYYY-MM-DD', inclusive):
+    the agent, the policies they sold in the period, sales by type, yearly totals, the commission
+    ledger for the period and their current balances. Returns None for an unknown agent.
+    """
+    db.cursor.execute('''
+        SELECT a.agent_id, u.name, a.qualification, a.commission_rate, a.status
+        FROM agents a
+        LEFT JOIN users u ON u.nric = a.nric
+        WHERE a.agent_id = ?
+    ''', (agent_id,))
+    agent = db.cursor.fetchone()
+    if not agent:
+        return None
+
+    db.cursor.execute('''
+        SELECT policy_id, customer_id, policy_type, policy_plan, premium, status, start_date
+        FROM purchased_policy
+        WHERE agent_id = ? AND start_date >= ? AND start_date < date(?, '+1 day')
+        ORDER BY start_date, customer_id, policy_id
+    ''', (agent_id, start_date, end_date))
+    policies = db.cursor.fetchall()
+
+    db.cursor.execute('''
+        SELECT policy_type, SUM(policy_count), SUM(premium_total), SUM(commission_total)
+        FROM agent_sales_summary
+        WHERE agent_id = ? AND year || '-' || month BETWEEN substr(?, 1, 7) AND substr(?, 1, 7)
+        GROUP BY policy_type
+        ORDER BY policy_type
+    ''', (agent_id, start_date, end_date))
+    by_type = db.cursor.fetchall()
+
+    db.cursor.execute('''
+        SELECT year, SUM(policy_count), SUM(premium_total)
+        FROM agent_sales_summary
+        WHERE agent_id = ? AND year <= substr(?, 1, 4)
+        GROUP BY year
+        ORDER BY year DESC
+    ''', (agent_id, end_date))
+    yearly = db.cursor.fetchall()
+
+    db.cursor.execute('''
+        SELECT premium_total, accrued_total, paid_total, balance
+        FROM agent_commission_balance
+        WHERE agent_id = ?
+    ''', (agent_id,))
+    balance = db.cursor.fetchone() or (0, 0, 0, 0)
+
+    return {
+        "agent": agent,
+        "policies": policies,
+        "by_type": by_type,
+        "yearly": yearly,
+        "commission": commission_statement(db, agent_id, start_date, end_date),
+        "balance": balance,
+    }
+
+
+def render_statement(data):
+    agent_id, name, qualification, rate, status = data["agent"]
+    commission = data["commission"]
+    total_premium, total_commission, commission_paid, commission_owed = data["balance"]
+    lines = [
+        f"============[ Agent Statement: {agent_id} ]============",
+        f"Agent           : {name or ''} ({agent_id})",
+        f"Qualification   : {qualification or ''}",
+        f"Status          : {status or ''}",
+        f"Commission rate : {rate}%",
+        f"Period          : {commission['start_date']} to {commission['end_date']}",
+        "",
+        "-------------[ Policies Sold in Period ]-------------",
+        f"{'Policy ID':<12}{'Customer ID':<16}{'Type':<10}{'Plan':<10}{'Premium':>12}  {'Status':<16}Start Date",
+    ]
+    for policy_id, customer_id, policy_type, plan, premium, policy_status, start in data["policies"]:
+        lines.append(f"{policy_id:<12}{customer_id:<16}{policy_type or '':<10}{plan or '':<10}"
+                     f"{premium or 0:>12,.2f}  {policy_status or '':<16}{start}")
+    if not data["policies"]:
+        lines.append("No policies sold in this period.")
+
+    lines += ["", "-------------[ Sales by Policy Type ]-------------",
+              f"{'Type':<12}{'Sold':>6}{'Premium':>16}{'Commission':>14}"]
+    for policy_type, count, premium, commission_total in data["by_type"]:
+        lines.append(f"{policy_type:<12}{count:>6}{premium:>16,.2f}{commission_total:>14,.2f}")
+
+    lines += ["", "-------------[ Yearly Summary ]-------------", f"{'Year':<8}{'Sold':>6}{'Premium':>16}"]
+    for year, count, premium in data["yearly"]:
+        lines.append(f"{year:<8}{count:>6}{premium:>16,.2f}")
+
+    lines += [
+        "",
+        "-------------[ Commission ]-------------",
+        f"Opening balance : RM{commission['opening_balance']:,.2f}",
+        f"{'Date':<20}{'Entry':<10}{'Payment':<12}{'Premium':>12}{'Rate %':>8}{'Commission':>12}",
+    ]
+    for _, created_at, entry_type, payment_id, _, premium, entry_rate, amount, _ in commission["entries"]:
+        entry_rate = f"{entry_rate:g}" if entry_rate is not None else ""
+        lines.append(f"{created_at:<20}{entry_type:<10}{payment_id or '':<12}{premium or 0:>12,.2f}"
+                     f"{entry_rate:>8}{amount:>12,.2f}")
+    lines += [
+        f"Accrued         : RM{commission['accrued']:,.2f}",
+        f"Reversed        : RM{commission['reversed']:,.2f}",
+        f"Paid out        : RM{commission['paid']:,.2f}",
+        f"Closing balance : RM{commission['closing_balance']:,.2f}",
+        "",
+        "-------------[ To Date ]-------------",
+        f"Total Premium Earned : RM{total_premium:,.2f}",
+        f"Total Commission     : RM{total_commission:,.2f}",
+        f"Commission Paid      : RM{commission_paid:,.2f}",
+        f"Commission Owed      : RM{commission_owed:,.2f}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def _init_worker(db_name):
+    global _worker_conn
+    _worker_conn = PooledSession(db_name, _open_read_only(db_name))
+
+
+def write_statements(agent_ids, start_date, end_date, out_dir):
+    # Worker: write the statements of one batch of agents, returning a timing row per agent
+    timings = []
+    for agent_id in agent_ids:
+        started = time.perf_counter()
+        policies = entries = 0
+        error = ""
+        try:
+            data = statement_data(_worker_conn, agent_id, start_date, end_date)
+            if data is None:
+                raise ValueError("agent not found")
+            policies, entries = len(data["policies"]), len(data["commission"]["entries"])
+            path = os.path.join(out_dir, f"{agent_id}.txt")
+            with open(path + ".part", "w", encoding="utf-8") as target:
+                target.write(render_statement(data))
+            os.replace(path + ".part", path)
+        except (sqlite3.Error, OSError, ValueError) as e:
+            error = str(e)
+        timings.append((agent_id, time.perf_counter() - started, policies, entries, error))
+    return timings
+
+
+def agents_by_workload(db):
+    # Every agent, those with the most ledger entries and policies first
+    db.cursor.execute('''
+        SELECT a.agent_id
+        FROM agents a
+        LEFT JOIN (SELECT agent_id, COUNT(*) AS entries FROM commission_ledger GROUP BY agent_id) l
+               ON l.agent_id = a.agent_id
+        LEFT JOIN (SELECT agent_id, SUM(policy_count) AS sold FROM agent_sales_summary GROUP BY agent_id) s
+               ON s.agent_id = a.agent_id
+        ORDER BY COALESCE(l.entries, 0) + COALESCE(s.sold, 0) DESC, a.agent_id
+    ''')
+    return [row[0] for row in db.cursor.fetchall()]
+
+
+def run_statements(db_name, out_dir, start_date, end_date, agent_ids=None, workers=None, batch_size=8):
+    """
+    Write a statement for every agent (or `agent_ids`) into `out_dir` using `workers` processes,
+    and the per-agent timings to out_dir/timings.csv, slowest first.
+    Returns a summary dict with agent and error counts, throughput and the timings.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    if agent_ids is None:
+        conn = _open_read_only(db_name)
+        try:
+            agent_ids = agents_by_workload(PooledSession(db_name, conn))
+        finally:
+            conn.close()
+
+    started = time.perf_counter()
+    timings = []
+    batches = [agent_ids[i:i + batch_size] for i in range(0, len(agent_ids), batch_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_name,)) as pool:
+        futures = [pool.submit(write_statements, batch, start_date, end_date, out_dir) for batch in batches]
+        for future in as_completed(futures):
+            timings.extend(future.result())
+    elapsed = time.perf_counter() - started
+
+    timings.sort(key=lambda row: row[1], reverse=True)
+    with open(os.path.join(out_dir, "timings.csv"), "w", newline="") as target:
+        writer = csv.writer(target)
+        writer.writerow(TIMING_COLUMNS)
+        writer.writerows((agent_id, f"{seconds:.4f}", policies, entries, error)
+                         for agent_id, seconds, policies, entries, error in timings)
+
+    return {
+        "agents": len(timings),
+        "errors": sum(1 for row in timings if row[4]),
+        "workers": workers,
+        "seconds": elapsed,
+        "agents_per_sec": len(timings) / elapsed if elapsed > 0 else 0.0,
+        "timings": timings,
+    }
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    default_start, default_end = last_month()
+    parser = argparse.ArgumentParser(description="Write a sales and commission statement for every agent.")
+    parser.add_argument("out_dir", help="directory for the statement files")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--from", dest="start_date", default=default_start, help="period start (default: last month)")
+    parser.add_argument("--to", dest="end_date", default=default_end, help="period end (default: last month)")
+    parser.add_argument("--agents", help="comma-separated agent IDs (default: all)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--batch-size", type=int, default=8, help="agents sent to a worker at a time")
+    parser.add_argument("--slowest", type=int, default=10, help="slowest agents to list")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+    finally:
+        db.close()
+
+    agent_ids = [agent_id.strip() for agent_id in args.agents.split(",")] if args.agents else None
+    try:
+        summary = run_statements(args.db, args.out_dir, args.start_date, args.end_date, agent_ids,
+                                 args.workers, args.batch_size)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Wrote {summary['agents'] - summary['errors']:,} statements ({summary['errors']:,} errors) for "
+          f"{args.start_date} to {args.end_date} on {summary['workers']} workers in {summary['seconds']:.2f}s "
+          f"({summary['agents_per_sec']:,.1f} agents/sec)")
+    print(f"\nSlowest agents (all timings in {os.path.join(args.out_dir, 'timings.csv')}):")
+    for agent_id, seconds, policies, entries, error in summary["timings"][:args.slowest]:
+        print(f"  {agent_id:<10}{seconds * 1000:>9.1f} ms  {policies:>6} policies  {entries:>6} ledger entries"
+              f"{'  ' + error if error else ''}")
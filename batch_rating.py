@@ -0,0 +1,187 @@
+import argparse
+import random
+import time
+
+import numpy as np
+
+from insurance_class import RATING_COLUMNS, PolicyType, calculate_premium
+from rate_tables import DEFAULT_FACTORS, current_rates
+
+# Vectorized premium rating.
+# Each rate_* function takes equal-length column arrays of rating inputs and returns an array of
+# annual premiums that matches the scalar calculate_*_premium method of the same policy type to the cent.
+# The factor arithmetic is written in the same order as the scalar methods, so the floats agree bit for bit.
+# Factors come from the current compiled rate table unless a CompiledRates is passed in.
+
+def round_cents(values):
+    """
+    Round to 2 decimals exactly like Python's round(x, 2).
+    np.round scales by 100 first, which can land on the wrong side of a half-cent;
+    the few values that sit within rounding noise of a half-cent are redone with round().
+    """
+    rounded = np.round(values, 2)
+    scaled = values * 100
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_half):
+        rounded[i] = round(float(values[i]), 2)
+    return rounded
+
+
+def _lookup(labels, table, normalize, default=1.0):
+    # Map labels to factors, normalizing each distinct label only once
+    if isinstance(labels, np.ndarray) and labels.dtype.kind != "O":
+        labels = labels.tolist()
+    factors = {}
+    for label in labels:
+        if label not in factors:
+            factors[label] = table.get(normalize(label), default)
+    return np.fromiter(map(factors.__getitem__, labels), dtype=np.float64, count=len(labels))
+
+
+def _has_condition(medical_history, rates):
+    # Medical history is either a boolean flag array or free text where 'None' means no condition
+    if isinstance(medical_history, np.ndarray) and medical_history.dtype == bool:
+        return medical_history
+    if len(medical_history) and isinstance(medical_history[0], (bool, np.bool_)):
+        return np.asarray(medical_history, dtype=bool)
+    if isinstance(medical_history, np.ndarray):
+        medical_history = medical_history.tolist()
+    conditions = {}
+    for label in medical_history:
+        if label not in conditions:
+            conditions[label] = rates.has_condition(label)
+    return np.fromiter(map(conditions.__getitem__, medical_history), dtype=bool, count=len(medical_history))
+
+
+def _age_factors(table, ages, formula):
+    # Gather from the precomputed per-age table when every age is a whole number inside it
+    if ages.dtype.kind in "iu" and ages.size and ages.min() >= 0 and ages.max() < len(table):
+        return np.asarray(table)[ages]
+    return formula(ages)
+
+
+def rate_life(age, coverage_amount, medical_history, rates=None):
+    rates = rates or current_rates()
+    life = rates.life
+    age = np.asarray(age)
+    coverage_amount = np.asarray(coverage_amount, dtype=np.float64)
+
+    age_factor = _age_factors(rates.life_age_factors, age, lambda a: np.where(
+        a < life.base_age,
+        np.maximum(life.age_floor, 1 - ((life.base_age - a) * life.age_slope_down)),
+        1 + ((a - life.base_age) * life.age_slope_up)))
+    coverage_factor = 1 + (coverage_amount / life.coverage_divisor) * life.coverage_slope
+    medical_factor = np.where(_has_condition(medical_history, rates), life.medical_loading, 1.0)
+
+    monthly_premium = (coverage_amount / 1000) * life.base_rate * age_factor * coverage_factor * medical_factor
+    return round_cents(monthly_premium * 12)
+
+
+def rate_vehicle(vehicle_value, vehicle_age, rates=None):
+    rates = rates or current_rates()
+    vehicle = rates.vehicle
+    vehicle_value = np.asarray(vehicle_value, dtype=np.float64)
+    vehicle_age = np.asarray(vehicle_age)
+
+    age_factor = _age_factors(rates.vehicle_age_factors, vehicle_age, lambda a: 1 + (a * vehicle.age_slope))
+    value_factor = 1 + (vehicle_value / vehicle.value_divisor)
+    return round_cents(vehicle_value * vehicle.base_rate * age_factor * value_factor)
+
+
+def rate_property(property_value, property_age, property_type, rates=None):
+    rates = rates or current_rates()
+    prop = rates.property
+    property_value = np.asarray(property_value, dtype=np.float64)
+    property_age = np.asarray(property_age)
+
+    age_factor = _age_factors(rates.property_age_factors, property_age, lambda a: 1 + (a * prop.age_slope))
+    value_factor = 1 + (property_value / prop.value_divisor)
+    risk_factor = _lookup(property_type, rates.property_risk, str.lower)
+    return round_cents(property_value * prop.base_rate * age_factor * value_factor * risk_factor)
+
+
+def rate_health(age, coverage_amount, coverage_type, medical_history, rates=None):
+    rates = rates or current_rates()
+    health = rates.health
+    age = np.asarray(age)
+    coverage_amount = np.asarray(coverage_amount, dtype=np.float64)
+
+    age_factor = _age_factors(rates.health_age_factors, age, lambda a: 1 + (a * health.age_slope))
+    coverage_factor = 1 + (coverage_amount / health.coverage_divisor)
+    risk_factor = np.where(_has_condition(medical_history, rates), health.medical_loading, 1.0)
+    coverage_type_factor = _lookup(coverage_type, rates.health_coverage, str.upper)
+
+    annual_premium = (coverage_amount / 1000) * health.base_rate * age_factor * coverage_factor * risk_factor * \
+        coverage_type_factor
+    return round_cents(annual_premium)
+
+
+RATERS = {
+    PolicyType.LIFE.value: rate_life,
+    PolicyType.VEHICLE.value: rate_vehicle,
+    PolicyType.HEALTH.value: rate_health,
+    PolicyType.PROPERTY.value: rate_property,
+}
+
+
+def rate_batch(policy_type, columns, rates=None):
+    """
+    Rate a batch of one policy type. `columns` maps each name in RATING_COLUMNS[policy_type]
+    to an array-like of equal length. Returns a float64 array of annual premiums.
+    Pass `rates` to pin the CompiledRates used (its .version is the rate version of the result).
+    """
+    missing = [name for name in RATING_COLUMNS[policy_type] if name not in columns]
+    if missing:
+        raise ValueError(f"Missing rating columns for {policy_type}: {', '.join(missing)}")
+    return RATERS[policy_type](*(columns[name] for name in RATING_COLUMNS[policy_type]), rates=rates)
+
+
+def rate_scalar(policy_type, row, rates=None):
+    # Rate one policy the way create_custom_policy does: build the Insurance object, then call its method
+    return calculate_premium(policy_type, rates=rates, **row)
+
+
+def _random_columns(policy_type, rows, rng):
+    # Random rating inputs covering every factor band, including ages below 25 and unknown labels
+    histories = ["None", "none", "Asthma", "Diabetes", ""]
+    generators = {
+        "age": lambda: rng.randint(18, 80),
+        "coverage_amount": lambda: float(rng.randrange(10000, 2000000, 500)),
+        "medical_history": lambda: rng.choice(histories),
+        "vehicle_value": lambda: float(rng.randrange(20000, 500000, 100)),
+        "vehicle_age": lambda: rng.randint(0, 20),
+        "coverage_type": lambda: rng.choice(list(DEFAULT_FACTORS["health_coverage"]) + ["basic", "dental"]),
+        "property_value": lambda: float(rng.randrange(100000, 5000000, 1000)),
+        "property_age": lambda: rng.randint(0, 60),
+        "property_type": lambda: rng.choice(["residential", "Commercial", "INDUSTRIAL", "farm"]),
+    }
+    return {name: [generators[name]() for _ in range(rows)] for name in RATING_COLUMNS[policy_type]}
+
+
+def benchmark(rows=100000, seed=7):
+    """Time scalar rating in a loop against rate_batch for each policy type and check they agree."""
+    rng = random.Random(seed)
+    print(f"\n{'Policy Type':<10} {'Rows':>10} {'Scalar (s)':>12} {'Batch (s)':>12} {'Speedup':>9}  Match")
+    print("-" * 66)
+    for policy_type, names in RATING_COLUMNS.items():
+        columns = _random_columns(policy_type, rows, rng)
+
+        started = time.perf_counter()
+        scalar = [rate_scalar(policy_type, dict(zip(names, values))) for values in zip(*columns.values())]
+        scalar_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        batch = rate_batch(policy_type, columns)
+        batch_time = time.perf_counter() - started
+
+        match = bool(np.array_equal(np.array(scalar), batch))
+        print(f"{policy_type:<10} {rows:>10,} {scalar_time:>12.3f} {batch_time:>12.4f} "
+              f"{scalar_time / batch_time:>8.1f}x  {'yes' if match else 'NO'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare batch rating against the scalar premium methods.")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    benchmark(args.rows, args.seed)
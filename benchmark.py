@@ -0,0 +1,299 @@
+import argparse
+import builtins
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+
+from database_setup import DatabaseManager
+from data_generator import generate_book
+from main import login_user
+from customer import view_status, make_payment, file_claim, select_prepared_policy
+from agent import calculate_commission, view_sales_report
+from admin import generate_reports, process_claims_approval
+from report_cache import REPORT_CACHE
+
+# End-to-end benchmarks of the role workflows.
+# Each workflow is driven non-interactively: `input()` answers come from a script and
+# printed output is discarded, so only the database and application code are timed.
+
+
+@contextmanager
+def scripted_input(answers):
+    # Replace input() with a function that returns the scripted answers in order
+    answers = iter(answers)
+    original = builtins.input
+    builtins.input = lambda prompt="": next(answers)
+    try:
+        yield
+    finally:
+        builtins.input = original
+
+
+def _forever(answer):
+    while True:
+        yield answer
+
+
+class Candidates:
+    # Pools of users to drive the workflows with, fetched once per database
+    def __init__(self, db):
+        db.cursor.execute("SELECT nric, password FROM users WHERE role = 'Customer'")
+        self.customers = db.cursor.fetchall()
+        db.cursor.execute("SELECT agent_id FROM agents ORDER BY agent_id")
+        self.agents = [row[0] for row in db.cursor.fetchall()]
+        db.cursor.execute('''
+            SELECT DISTINCT pp.customer_id
+            FROM purchased_policy pp
+            LEFT JOIN payments p ON pp.policy_id = p.policy_id AND pp.customer_id = p.customer_id
+                AND p.status = 'Completed' AND p.term = pp.term
+            WHERE pp.status = 'Accepted' AND p.policy_id IS NULL
+        ''')
+        self.payers = [row[0] for row in db.cursor.fetchall()]
+        db.cursor.execute('''
+            SELECT DISTINCT customer_id FROM purchased_policy WHERE status IN ('Active', 'Premium paid')
+        ''')
+        self.claimants = [row[0] for row in db.cursor.fetchall()]
+        # Claims the approval workflow reviews on every run, taken when it first runs
+        self.review_batch = None
+
+
+def _pick(rng, pool, fallback=""):
+    return rng.choice(pool) if pool else fallback
+
+
+# Each workflow returns the call to time and the answers to feed its input() prompts
+def _login_user(db, candidates, rng):
+    nric, password = _pick(rng, candidates.customers, ("", ""))
+    return lambda: login_user(db), ["1", nric, password]
+
+def _view_status(db, candidates, rng):
+    nric = _pick(rng, candidates.customers, ("", ""))[0]
+    return lambda: view_status(db, nric), []
+
+def _make_payment(db, candidates, rng):
+    nric = _pick(rng, candidates.payers)
+    return lambda: make_payment(db, nric), ["1", "1"]
+
+def _file_claim(db, candidates, rng):
+    nric = _pick(rng, candidates.claimants)
+    return lambda: file_claim(db, nric), ["1", "Benchmark claim", "100"]
+
+def _select_prepared_policy(db, candidates, rng):
+    nric = _pick(rng, candidates.customers, ("", ""))[0]
+    return lambda: select_prepared_policy(db, nric), [rng.choice("1234"), rng.choice("12")]
+
+def _calculate_commission(db, candidates, rng):
+    agent_id = _pick(rng, candidates.agents)
+    return lambda: calculate_commission(db, agent_id), []
+
+def _view_sales_report(db, candidates, rng):
+    agent_id = _pick(rng, candidates.agents)
+    return lambda: view_sales_report(db, agent_id), []
+
+def _generate_reports(db, candidates, rng):
+    return lambda: generate_reports(db), []
+
+def _process_claims_approval(db, candidates, rng):
+    return lambda: process_claims_approval(db), _forever("a")
+
+
+# Untimed preparation before each run, so every run starts from the same state
+def _cold_report_cache(db, candidates):
+    # Time the report queries themselves rather than a cache hit
+    REPORT_CACHE.clear()
+
+def _reopen_claims(db, candidates):
+    # Put the claims pending at the first run back in the queue, since each run decides all of them
+    if candidates.review_batch is None:
+        db.cursor.execute("SELECT claim_id FROM claims WHERE status = 'Pending request'")
+        candidates.review_batch = [(row[0],) for row in db.cursor.fetchall()]
+        return
+    db.cursor.executemany('''
+        UPDATE claims
+        SET status = 'Pending request', processed_date = NULL, leased_by = NULL, lease_expires_at = NULL
+        WHERE claim_id = ?
+    ''', candidates.review_batch)
+    db.conn.commit()
+
+
+WORKFLOWS = {
+    "login_user": _login_user,
+    "view_status": _view_status,
+    "make_payment": _make_payment,
+    "file_claim": _file_claim,
+    "select_prepared_policy": _select_prepared_policy,
+    "calculate_commission": _calculate_commission,
+    "view_sales_report": _view_sales_report,
+    "generate_reports": _generate_reports,
+    "process_claims_approval": _process_claims_approval,
+}
+
+PREPARE = {
+    "view_sales_report": _cold_report_cache,
+    "generate_reports": _cold_report_cache,
+    "process_claims_approval": _reopen_claims,
+}
+
+
+def percentile(sorted_values, fraction):
+    # Linear interpolation between closest ranks
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    total = sum(ordered)
+    return {
+        "runs": len(ordered),
+        "mean_ms": total / len(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p90_ms": percentile(ordered, 0.90) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        "ops_per_sec": len(ordered) / total if total > 0 else 0.0,
+    }
+
+
+def prepare_database(workdir, customers, seed):
+    # Generate a pristine database once per size, then benchmark against a fresh copy
+    pristine = os.path.join(workdir, f"bench_{customers}_{seed}.db")
+    if not os.path.exists(pristine):
+        db = DatabaseManager(pristine)
+        with redirect_stdout(io.StringIO()):
+            db.connect()
+            db.init_database()
+            db.add_test_data()
+            generate_book(db, customers=customers, seed=seed)
+            db.close()
+    working = os.path.join(workdir, f"run_{customers}_{seed}.db")
+    shutil.copyfile(pristine, working)
+    return working
+
+
+def run_workflow(db, name, candidates, iterations, rng):
+    samples = []
+    prepare = PREPARE.get(name)
+    for _ in range(iterations):
+        if prepare:
+            prepare(db, candidates)
+        call, answers = WORKFLOWS[name](db, candidates, rng)
+        with scripted_input(answers), redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - started)
+        # Leave no transaction open between runs if a workflow failed part-way
+        if db.conn.in_transaction:
+            db.conn.rollback()
+    return summarize(samples)
+
+
+def run_suite(sizes, iterations=50, workflows=None, seed=42, workdir="benchmarks"):
+    os.makedirs(workdir, exist_ok=True)
+    workflows = workflows or list(WORKFLOWS)
+    results = {}
+    cache_stats = {}
+    for customers in sizes:
+        path = prepare_database(workdir, customers, seed)
+        REPORT_CACHE.clear()
+        REPORT_CACHE.reset_stats()
+        db = DatabaseManager(path)
+        with redirect_stdout(io.StringIO()):
+            db.connect()
+        try:
+            candidates = Candidates(db)
+            rng = random.Random(seed)
+            results[str(customers)] = {}
+            for name in workflows:
+                stats = run_workflow(db, name, candidates, iterations, rng)
+                results[str(customers)][name] = stats
+                print(f"{customers:>10,} customers  {name:<24} p50 {stats['p50_ms']:9.3f} ms  "
+                      f"p99 {stats['p99_ms']:9.3f} ms  {stats['ops_per_sec']:10.1f} ops/s")
+            cache_stats[str(customers)] = REPORT_CACHE.stats()
+            print(f"{customers:>10,} customers  report cache hit rate {cache_stats[str(customers)]['hit_rate']:.1%}")
+        finally:
+            with redirect_stdout(io.StringIO()):
+                db.close()
+            os.remove(path)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "iterations": iterations,
+            "seed": seed,
+        },
+        "results": results,
+        "report_cache": cache_stats,
+    }
+
+
+def compare(current, baseline, threshold=0.25, metric="p50_ms"):
+    """
+    Compare two result files. Returns a list of (size, workflow, baseline, current, change)
+    for every workflow whose `metric` got slower by more than `threshold` (0.25 = 25%).
+    """
+    regressions = []
+    for size, workflows in current["results"].items():
+        for name, stats in workflows.items():
+            before = baseline.get("results", {}).get(size, {}).get(name)
+            if not before or before[metric] <= 0:
+                continue
+            change = stats[metric] / before[metric] - 1
+            if change > threshold:
+                regressions.append((size, name, before[metric], stats[metric], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Insurance4You role workflows.")
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated customer counts")
+    parser.add_argument("--iterations", type=int, default=50, help="runs per workflow and size")
+    parser.add_argument("--workflows", help=f"comma-separated subset of: {', '.join(WORKFLOWS)}")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workdir", default="benchmarks", help="where generated databases are kept")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="flag slowdowns against a stored result file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before flagging")
+    parser.add_argument("--metric", default="p50_ms", choices=["mean_ms", "p50_ms", "p90_ms", "p99_ms"])
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    workflows = args.workflows.split(",") if args.workflows else None
+    unknown = set(workflows or []) - set(WORKFLOWS)
+    if unknown:
+        parser.error(f"unknown workflows: {', '.join(sorted(unknown))}")
+
+    current = run_suite(sizes, args.iterations, workflows, args.seed, args.workdir)
+    with open(args.output, "w") as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold, args.metric)
+        if regressions:
+            print(f"\nSlowdowns over {args.threshold:.0%} ({args.metric}):")
+            for size, name, before, after, change in regressions:
+                print(f"  {size:>10} customers  {name:<24} {before:9.3f} -> {after:9.3f} ms  (+{change:.0%})")
+            sys.exit(1)
+        print(f"\nNo slowdowns over {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
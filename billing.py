@@ -0,0 +1,113 @@
+import argparse
+import sqlite3
+import time
+
+from id_allocator import format_id, get_allocator
+
+# Batch premium billing.
+# Every 'Accepted' policy without a completed payment is billed: a payment record is created with an
+# allocated payment ID and the policy moves to 'Premium paid', the same two changes make_payment makes.
+# Policies are taken in (customer_id, policy_id) order a chunk at a time, and each chunk is billed in
+# its own transaction. A billed policy is no longer 'Accepted', so rerunning only picks up what is left.
+
+# Next chunk of unbilled policies after the (customer_id, policy_id) keyset position
+UNBILLED_SQL = '''
+    SELECT pp.customer_id, pp.policy_id, pp.premium, pp.term
+    FROM purchased_policy pp
+    WHERE pp.status = 'Accepted'
+      AND (pp.customer_id, pp.policy_id) > (?, ?)
+      AND NOT EXISTS (
+          SELECT 1 FROM payments p
+          WHERE p.policy_id = pp.policy_id AND p.customer_id = pp.customer_id AND p.status = 'Completed'
+            AND p.term = pp.term
+      )
+    ORDER BY pp.customer_id, pp.policy_id
+    LIMIT ?
+'''
+
+
+def run_billing(db, chunk_size=1000, payment_method="Auto Debit", progress_every=20000):
+    """
+    Bill every unpaid 'Accepted' policy. Returns a summary dict with the number of
+    policies billed, the total amount, and policies billed per second.
+    """
+    allocator = get_allocator(db)
+    last_key = ("", "")
+    billed = chunks = 0
+    total_amount = 0.0
+    next_report = progress_every
+    started = time.perf_counter()
+    db.conn.commit()
+
+    try:
+        while True:
+            # Take the write lock before reading, so a concurrent make_payment can't pay a policy in between
+            db.cursor.execute("BEGIN IMMEDIATE")
+            db.cursor.execute(UNBILLED_SQL, last_key + (chunk_size,))
+            policies = db.cursor.fetchall()
+            if not policies:
+                db.conn.commit()
+                break
+
+            numbers = allocator.reserve("payment", len(policies), db)
+            db.cursor.executemany('''
+                INSERT INTO payments (payment_id, customer_id, policy_id, amount, payment_date, payment_method, status,
+                                      term)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?, 'Completed', ?)
+            ''', [(format_id("payment", number), customer_id, policy_id, premium, payment_method, term)
+                  for number, (customer_id, policy_id, premium, term) in zip(numbers, policies)])
+            db.cursor.executemany('''
+                UPDATE purchased_policy
+                SET status = 'Premium paid'
+                WHERE customer_id = ? AND policy_id = ? AND status = 'Accepted'
+            ''', [(customer_id, policy_id) for customer_id, policy_id, _, _ in policies])
+            db.conn.commit()
+
+            last_key = policies[-1][:2]
+            billed += len(policies)
+            total_amount += sum(premium or 0 for _, _, premium, _ in policies)
+            chunks += 1
+            if billed >= next_report:
+                elapsed = time.perf_counter() - started
+                print(f"  {billed:,} policies billed ({billed / elapsed:,.0f} policies/sec)")
+                next_report += progress_every
+    except sqlite3.Error as e:
+        db.conn.rollback()
+        print(f"Billing stopped after {billed:,} policies: {e}")
+        raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        "billed": billed,
+        "amount": total_amount,
+        "chunks": chunks,
+        "seconds": elapsed,
+        "policies_per_sec": billed / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def print_summary(summary):
+    print("\n============[ Billing Run ]============")
+    print(f"Policies billed : {summary['billed']:,}")
+    print(f"Amount billed   : RM{summary['amount']:,.2f}")
+    print(f"Transactions    : {summary['chunks']:,}")
+    print(f"Elapsed         : {summary['seconds']:.2f}s ({summary['policies_per_sec']:,.0f} policies/sec)")
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Bill every accepted policy that has no completed payment.")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="policies billed per transaction")
+    parser.add_argument("--payment-method", default="Auto Debit")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        print_summary(run_billing(db, args.chunk_size, args.payment_method))
+    finally:
+        db.close()
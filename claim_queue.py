@@ -0,0 +1,87 @@
+import sqlite3
+
+# Claim work queue for concurrent adjusters.
+# An adjuster leases a batch of pending claims for a limited time; leased claims are invisible to
+# other adjusters until they are completed or the lease expires, at which point they go back into
+# the queue. Leasing and completing are each a single UPDATE, so every transaction is short.
+# The queue is ordered by priority: largest amount first, then oldest claim.
+
+DEFAULT_LEASE_SECONDS = 300
+
+# A pending claim is available when nobody holds a live lease on it
+AVAILABLE = "status = 'Pending request' AND (lease_expires_at IS NULL OR lease_expires_at <= datetime('now'))"
+
+
+def lease_claims(db, adjuster, batch_size=10, lease_seconds=DEFAULT_LEASE_SECONDS):
+    """
+    Lease up to `batch_size` of the highest-priority available claims to `adjuster`.
+    Returns the leased claims as (claim_id, policy_id, customer_id, details, amount, status, date_filed).
+    """
+    try:
+        db.cursor.execute(f'''
+            UPDATE claims
+            SET leased_by = ?, lease_expires_at = datetime('now', ?)
+            WHERE claim_id IN (
+                SELECT claim_id FROM claims
+                WHERE {AVAILABLE}
+                ORDER BY amount DESC, date_filed
+                LIMIT ?
+            )
+            RETURNING claim_id, policy_id, customer_id, details, amount, status, date_filed
+        ''', (adjuster, f"+{int(lease_seconds)} seconds", batch_size))
+        claims = db.cursor.fetchall()
+        db.conn.commit()
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+    # RETURNING gives rows in update order, so restore the priority order
+    return sorted(claims, key=lambda claim: (-(claim[4] or 0), claim[6] or ""))
+
+
+def complete_claim(db, claim_id, adjuster, status, details=None):
+    """
+    Record a decision on a claim leased by `adjuster` and release the lease.
+    Returns False (and changes nothing) if the lease expired and the claim was reclaimed or decided.
+    """
+    try:
+        db.cursor.execute('''
+            UPDATE claims
+            SET status = ?, details = COALESCE(?, details), processed_date = CURRENT_TIMESTAMP,
+                leased_by = NULL, lease_expires_at = NULL
+            WHERE claim_id = ? AND leased_by = ? AND status = 'Pending request'
+              AND lease_expires_at > datetime('now')
+        ''', (status, details, claim_id, adjuster))
+        completed = db.cursor.rowcount == 1
+        db.conn.commit()
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+    return completed
+
+
+def release_claims(db, adjuster):
+    # Hand back every claim the adjuster still holds, e.g. when leaving the review screen
+    try:
+        db.cursor.execute('''
+            UPDATE claims
+            SET leased_by = NULL, lease_expires_at = NULL
+            WHERE leased_by = ? AND status = 'Pending request'
+        ''', (adjuster,))
+        released = db.cursor.rowcount
+        db.conn.commit()
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+    return released
+
+
+def queue_stats(db):
+    db.cursor.execute('''
+        SELECT COUNT(*),
+               COALESCE(SUM(lease_expires_at > datetime('now')), 0),
+               COALESCE(SUM(lease_expires_at <= datetime('now')), 0)
+        FROM claims
+        WHERE status = 'Pending request'
+    ''')
+    pending, leased, expired = db.cursor.fetchone()
+    return {"pending": pending, "leased": leased, "expired_leases": expired, "available": pending - leased}
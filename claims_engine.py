@@ -0,0 +1,192 @@
+import argparse
+import json
+import sqlite3
+import time
+
+# Rule-based auto-adjudication of pending claims.
+# One set-based pass classifies the whole 'Pending request' queue into a temp table, then the
+# decisions are applied with UPDATE ... FROM in fixed-size transactions. Claims no rule decides
+# stay 'Pending request' and are left for process_claims_approval.
+# Claims an adjuster currently holds a lease on (see claim_queue) are skipped.
+
+DEFAULT_RULES = {
+    # Claims up to this amount on an in-force policy are approved without review
+    "fast_track_limits": {"LIFE": 5000, "VEHICLE": 3000, "HEALTH": 2000, "PROPERTY": 5000},
+    # Policy statuses a claim can be paid against (the same ones file_claim offers)
+    "in_force_statuses": ["Active", "Premium paid"],
+    "reject_not_in_force": True,
+    "reject_over_coverage": True,
+}
+
+# Reasons double as the text appended to rejected claims' details
+FAST_TRACK = "Fast track"
+NOT_IN_FORCE = "Policy is not in force"
+INVALID_AMOUNT = "Claim amount must be positive"
+OVER_COVERAGE = "Claim amount exceeds policy coverage"
+
+
+def load_rules(path):
+    # Rules file: JSON object overriding any of the DEFAULT_RULES keys
+    rules = dict(DEFAULT_RULES)
+    with open(path) as f:
+        rules.update(json.load(f))
+    return rules
+
+
+def _classify(db, rules):
+    """
+    Fill temp.claim_decisions with a decision for every pending claim a rule settles.
+    Returns the number of pending claims looked at.
+    """
+    limits = rules["fast_track_limits"]
+    statuses = rules["in_force_statuses"]
+
+    # First matching rule wins
+    branches = []
+    params = []
+    if rules["reject_not_in_force"]:
+        branches.append(f"WHEN pp.status NOT IN ({', '.join('?' * len(statuses))}) THEN ?")
+        params.extend(statuses)
+        params.append(NOT_IN_FORCE)
+    branches.append("WHEN c.amount IS NULL OR c.amount <= 0 THEN ?")
+    params.append(INVALID_AMOUNT)
+    if rules["reject_over_coverage"]:
+        branches.append("WHEN c.amount > pp.coverage_amount THEN ?")
+        params.append(OVER_COVERAGE)
+    branches.append(f"WHEN pp.status IN ({', '.join('?' * len(statuses))}) AND c.amount <= l.max_amount THEN ?")
+    params.extend(statuses)
+    params.append(FAST_TRACK)
+
+    limit_rows = ", ".join("(?, ?)" for _ in limits) or "(NULL, NULL)"
+    limit_params = [value for item in limits.items() for value in item]
+
+    db.cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS claim_decisions (
+            claim_id TEXT PRIMARY KEY,
+            decision TEXT NOT NULL,
+            reason TEXT NOT NULL
+        )
+    ''')
+    db.cursor.execute("DELETE FROM temp.claim_decisions")
+    db.cursor.execute(f'''
+        WITH limits (policy_type, max_amount) AS (VALUES {limit_rows}),
+        evaluated AS (
+            SELECT c.claim_id,
+                   CASE
+                       -- Claims on a policy we can't find are left for a person to look at
+                       WHEN pp.policy_id IS NULL THEN NULL
+                       {' '.join(branches)}
+                   END AS reason
+            FROM claims c
+            LEFT JOIN purchased_policy pp ON pp.policy_id = c.policy_id AND pp.customer_id = c.customer_id
+            LEFT JOIN limits l ON l.policy_type = pp.policy_type
+            WHERE c.status = 'Pending request'
+              AND (c.lease_expires_at IS NULL OR c.lease_expires_at <= datetime('now'))
+        )
+        INSERT INTO temp.claim_decisions (claim_id, decision, reason)
+        SELECT claim_id, CASE WHEN reason = ? THEN 'Accepted' ELSE 'Rejected' END, reason
+        FROM evaluated
+        WHERE reason IS NOT NULL
+        ORDER BY claim_id
+    ''', limit_params + params + [FAST_TRACK])
+
+    db.cursor.execute("SELECT COUNT(*) FROM claims WHERE status = 'Pending request'")
+    return db.cursor.fetchone()[0]
+
+
+def adjudicate_claims(db, rules=None, batch_size=5000, dry_run=False):
+    """
+    Auto-adjudicate the pending claims queue.
+    Returns a summary dict: claims evaluated, approved, rejected, left for review, and claims/sec.
+    With dry_run the decisions are counted but nothing is changed.
+    """
+    rules = rules or DEFAULT_RULES
+    started = time.perf_counter()
+    approved = rejected = 0
+    try:
+        db.conn.commit()
+        pending = _classify(db, rules)
+        db.conn.commit()
+        db.cursor.execute('''
+            SELECT COUNT(*), COALESCE(SUM(decision = 'Accepted'), 0), COALESCE(MAX(rowid), 0)
+            FROM temp.claim_decisions
+        ''')
+        decided, to_approve, last_row = db.cursor.fetchone()
+
+        if not dry_run:
+            # Apply in rowid slices so each transaction stays short
+            for start in range(0, last_row, batch_size):
+                db.cursor.execute("BEGIN")
+                db.cursor.execute('''
+                    UPDATE claims
+                    SET status = d.decision,
+                        details = CASE WHEN d.decision = 'Rejected'
+                                       THEN COALESCE(claims.details, '') || ' | Rejection Reason: ' || d.reason
+                                       ELSE claims.details END,
+                        processed_date = CURRENT_TIMESTAMP,
+                        leased_by = NULL,
+                        lease_expires_at = NULL
+                    FROM temp.claim_decisions d
+                    WHERE d.rowid > ? AND d.rowid <= ?
+                      AND claims.claim_id = d.claim_id
+                      AND claims.status = 'Pending request'
+                      AND (claims.lease_expires_at IS NULL OR claims.lease_expires_at <= datetime('now'))
+                ''', (start, start + batch_size))
+                db.conn.commit()
+
+            db.cursor.execute('''
+                SELECT COALESCE(SUM(c.status = 'Accepted'), 0), COALESCE(SUM(c.status = 'Rejected'), 0)
+                FROM temp.claim_decisions d
+                JOIN claims c ON c.claim_id = d.claim_id
+                WHERE c.status = d.decision
+            ''')
+            approved, rejected = db.cursor.fetchone()
+        else:
+            approved, rejected = to_approve, decided - to_approve
+        db.cursor.execute("DELETE FROM temp.claim_decisions")
+        db.conn.commit()
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        "evaluated": pending,
+        "approved": approved,
+        "rejected": rejected,
+        "for_review": pending - approved - rejected,
+        "seconds": elapsed,
+        "claims_per_sec": pending / elapsed if elapsed > 0 else 0.0,
+        "dry_run": dry_run,
+    }
+
+
+def print_summary(summary):
+    title = "Auto-Adjudication (dry run)" if summary["dry_run"] else "Auto-Adjudication"
+    print(f"\n============[ {title} ]============")
+    print(f"Pending claims evaluated : {summary['evaluated']:,}")
+    print(f"Approved                 : {summary['approved']:,}")
+    print(f"Rejected                 : {summary['rejected']:,}")
+    print(f"Left for manual review   : {summary['for_review']:,}")
+    print(f"Elapsed                  : {summary['seconds']:.3f}s ({summary['claims_per_sec']:,.0f} claims/sec)")
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Auto-adjudicate pending claims with rules.")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--rules", help="JSON file overriding the default rules")
+    parser.add_argument("--batch-size", type=int, default=5000, help="claims updated per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="report the decisions without applying them")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        rules = load_rules(args.rules) if args.rules else DEFAULT_RULES
+        print_summary(adjudicate_claims(db, rules, args.batch_size, args.dry_run))
+    finally:
+        db.close()
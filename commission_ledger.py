@@ -0,0 +1,390 @@
+import argparse
+import sqlite3
+
+# Append-only commission ledger.
+# Every premium event writes one commission_ledger entry for the policy's agent: an 'accrual' when a
+# payment is completed, at the agent's commission rate at that moment, and a 'reversal' that cancels
+# it if the payment stops being completed or is deleted. Payroll adds 'payout' entries. Entries are
+# never updated or deleted; each records the agent's running balance after it, and
+# agent_commission_balance holds the current balance and totals per agent. Statements for a period
+# are a range scan of one agent's entries, and payroll is a single pass over the balances.
+# created_at is when an entry was posted; effective_date is the date of the premium event it belongs
+# to (the payment date, or for a reversal that of the accrual it cancels), which yearly reports group by.
+
+ACCRUAL = "accrual"
+REVERSAL = "reversal"
+PAYOUT = "payout"
+
+# Commission earned on one payment row at its agent's current rate
+_COMMISSION = "ROUND(COALESCE({row}.amount, 0) * COALESCE(a.commission_rate, 0) / 100.0, 2)"
+# Date commission on one payment row is earned: its payment date, never later than now
+_PAYMENT_DATE = "MIN(COALESCE({row}.payment_date, CURRENT_TIMESTAMP), CURRENT_TIMESTAMP)"
+
+
+def _accrue(row):
+    # Credit the policy's agent with commission on a completed payment: balance first, then the entry
+    commission = _COMMISSION.format(row=row)
+    source = f'''
+        FROM purchased_policy pp
+        JOIN agents a ON a.agent_id = pp.agent_id
+        WHERE pp.customer_id = {row}.customer_id AND pp.policy_id = {row}.policy_id
+          AND {row}.status = 'Completed'
+    '''
+    return f'''
+        INSERT INTO agent_commission_balance (agent_id, balance, premium_total, accrued_total, updated_at)
+        SELECT pp.agent_id, {commission}, COALESCE({row}.amount, 0), {commission}, CURRENT_TIMESTAMP
+        {source}
+        ON CONFLICT (agent_id) DO UPDATE SET
+            balance = ROUND(balance + excluded.balance, 2),
+            premium_total = ROUND(premium_total + excluded.premium_total, 2),
+            accrued_total = ROUND(accrued_total + excluded.accrued_total, 2),
+            updated_at = excluded.updated_at;
+        INSERT INTO commission_ledger (agent_id, entry_type, payment_id, customer_id, policy_id, premium_amount,
+                                       commission_rate, commission_amount, balance_after, effective_date)
+        SELECT pp.agent_id, '{ACCRUAL}', {row}.payment_id, {row}.customer_id, {row}.policy_id,
+               COALESCE({row}.amount, 0), a.commission_rate, {commission},
+               (SELECT balance FROM agent_commission_balance WHERE agent_id = pp.agent_id),
+               {_PAYMENT_DATE.format(row=row)}
+        {source};
+    '''
+
+
+def _reverse(row):
+    # Cancel whatever commission a payment has outstanding, at the rate it was accrued at
+    source = f'''
+        FROM commission_ledger l
+        WHERE l.payment_id = {row}.payment_id
+        GROUP BY l.agent_id
+        HAVING SUM(l.premium_amount) != 0 OR SUM(l.commission_amount) != 0
+    '''
+    return f'''
+        INSERT INTO agent_commission_balance (agent_id, balance, premium_total, accrued_total, updated_at)
+        SELECT l.agent_id, -SUM(l.commission_amount), -SUM(l.premium_amount), -SUM(l.commission_amount),
+               CURRENT_TIMESTAMP
+        {source}
+        ON CONFLICT (agent_id) DO UPDATE SET
+            balance = ROUND(balance + excluded.balance, 2),
+            premium_total = ROUND(premium_total + excluded.premium_total, 2),
+            accrued_total = ROUND(accrued_total + excluded.accrued_total, 2),
+            updated_at = excluded.updated_at;
+        INSERT INTO commission_ledger (agent_id, entry_type, payment_id, customer_id, policy_id, premium_amount,
+                                       commission_rate, commission_amount, balance_after, effective_date)
+        SELECT l.agent_id, '{REVERSAL}', {row}.payment_id, {row}.customer_id, {row}.policy_id,
+               -SUM(l.premium_amount),
+               (SELECT commission_rate FROM commission_ledger
+                WHERE payment_id = {row}.payment_id AND agent_id = l.agent_id AND entry_type = '{ACCRUAL}'
+                ORDER BY entry_id DESC LIMIT 1),
+               -SUM(l.commission_amount),
+               (SELECT balance FROM agent_commission_balance WHERE agent_id = l.agent_id),
+               (SELECT effective_date FROM commission_ledger
+                WHERE payment_id = {row}.payment_id AND agent_id = l.agent_id AND entry_type = '{ACCRUAL}'
+                ORDER BY entry_id DESC LIMIT 1)
+        {source};
+    '''
+
+
+SCHEMA = [
+    # AUTOINCREMENT so entry IDs are never reused and always follow posting order
+    '''
+    CREATE TABLE IF NOT EXISTS commission_ledger (
+        entry_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        agent_id TEXT NOT NULL,
+        entry_type TEXT NOT NULL,
+        payment_id TEXT,
+        customer_id TEXT,
+        policy_id TEXT,
+        premium_amount REAL NOT NULL DEFAULT 0,
+        commission_rate REAL,
+        commission_amount REAL NOT NULL,
+        balance_after REAL NOT NULL,
+        created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_commission_ledger_agent ON commission_ledger (agent_id, created_at, entry_id)",
+    "CREATE INDEX IF NOT EXISTS idx_commission_ledger_payment ON commission_ledger (payment_id)",
+    '''
+    CREATE TABLE IF NOT EXISTS agent_commission_balance (
+        agent_id TEXT PRIMARY KEY,
+        balance REAL NOT NULL DEFAULT 0,
+        premium_total REAL NOT NULL DEFAULT 0,
+        accrued_total REAL NOT NULL DEFAULT 0,
+        paid_total REAL NOT NULL DEFAULT 0,
+        updated_at DATETIME
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_commission_ledger_no_update
+    BEFORE UPDATE ON commission_ledger
+    BEGIN
+        SELECT RAISE(ABORT, 'commission_ledger is append-only');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_commission_ledger_no_delete
+    BEFORE DELETE ON commission_ledger
+    BEGIN
+        SELECT RAISE(ABORT, 'commission_ledger is append-only');
+    END
+    ''',
+]
+
+# Triggers posting the premium events of payments
+PAYMENT_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_commission_payment_insert
+    AFTER INSERT ON payments
+    WHEN new.status = 'Completed'
+    BEGIN
+        {_accrue("new")}
+    END
+    ''',
+    # A changed completed payment is reversed and accrued again as a new premium event
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_commission_payment_update
+    AFTER UPDATE OF status, amount, customer_id, policy_id ON payments
+    WHEN (old.status = 'Completed' OR new.status = 'Completed')
+     AND (old.status IS NOT new.status OR old.amount IS NOT new.amount
+          OR old.customer_id IS NOT new.customer_id OR old.policy_id IS NOT new.policy_id)
+    BEGIN
+        {_reverse("old")}
+        {_accrue("new")}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_commission_payment_delete
+    AFTER DELETE ON payments
+    BEGIN
+        {_reverse("old")}
+    END
+    ''',
+]
+
+
+def create_commission_ledger(cursor):
+    """
+    Migration step: create the ledger, then accrue commission on the completed payments already on record,
+    dated and ordered by payment date (never later than now). No rate history exists before the ledger,
+    so these use each agent's current rate. The payment triggers write effective_date, so
+    add_effective_dates in a later migration installs them.
+    """
+    for statement in SCHEMA:
+        cursor.execute(statement)
+    cursor.execute("SELECT 1 FROM commission_ledger LIMIT 1")
+    if cursor.fetchone():
+        return
+    commission = _COMMISSION.format(row="p")
+    cursor.execute(f'''
+        INSERT INTO commission_ledger (agent_id, entry_type, payment_id, customer_id, policy_id, premium_amount,
+                                       commission_rate, commission_amount, balance_after, created_at)
+        SELECT pp.agent_id, '{ACCRUAL}', p.payment_id, p.customer_id, p.policy_id, COALESCE(p.amount, 0),
+               a.commission_rate, {commission},
+               ROUND(SUM({commission}) OVER (PARTITION BY pp.agent_id ORDER BY p.payment_date, p.payment_id), 2),
+               {_PAYMENT_DATE.format(row="p")}
+        FROM payments p
+        JOIN purchased_policy pp ON pp.customer_id = p.customer_id AND pp.policy_id = p.policy_id
+        JOIN agents a ON a.agent_id = pp.agent_id
+        WHERE p.status = 'Completed'
+        ORDER BY p.payment_date, p.payment_id
+    ''')
+    cursor.execute('''
+        INSERT INTO agent_commission_balance (agent_id, balance, premium_total, accrued_total, updated_at)
+        SELECT agent_id, ROUND(SUM(commission_amount), 2), ROUND(SUM(premium_amount), 2),
+               ROUND(SUM(commission_amount), 2), CURRENT_TIMESTAMP
+        FROM commission_ledger
+        GROUP BY agent_id
+    ''')
+
+
+def add_effective_dates(cursor):
+    """
+    Migration step: date every entry by its premium event. An accrual takes its payment's date, capped at
+    when it was posted; a reversal takes the date of the accrual it cancels; a payout is dated when it was
+    posted. Then install the payment triggers, which date new entries the same way.
+    """
+    guard = next(statement for statement in SCHEMA if "trg_commission_ledger_no_update" in statement)
+    cursor.execute("DROP TRIGGER IF EXISTS trg_commission_ledger_no_update")
+    cursor.execute(f'''
+        UPDATE commission_ledger
+        SET effective_date = MIN(COALESCE((SELECT payment_date FROM payments p
+                                           WHERE p.payment_id = commission_ledger.payment_id), created_at),
+                                 created_at)
+        WHERE entry_type != '{REVERSAL}'
+    ''')
+    cursor.execute(f'''
+        UPDATE commission_ledger
+        SET effective_date = COALESCE((SELECT a.effective_date FROM commission_ledger a
+                                       WHERE a.payment_id = commission_ledger.payment_id
+                                         AND a.agent_id = commission_ledger.agent_id
+                                         AND a.entry_type = '{ACCRUAL}' AND a.entry_id < commission_ledger.entry_id
+                                       ORDER BY a.entry_id DESC LIMIT 1), created_at)
+        WHERE entry_type = '{REVERSAL}'
+    ''')
+    cursor.execute(guard)
+    for statement in PAYMENT_TRIGGERS:
+        name = statement.split("IF NOT EXISTS", 1)[1].split()[0]
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(statement)
+
+
+def verify_balances(db, tolerance=0.005):
+    """
+    Check agent_commission_balance against the ledger: the balance must equal the sum of the agent's
+    entries and the balance_after of their latest entry. Returns (agent_id, balance, ledger_sum, last_balance)
+    for each agent that differs.
+    """
+    db.cursor.execute('''
+        WITH sums AS (
+            SELECT agent_id, SUM(commission_amount) AS total, MAX(entry_id) AS last_entry
+            FROM commission_ledger
+            GROUP BY agent_id
+        )
+        SELECT COALESCE(b.agent_id, s.agent_id), b.balance, s.total, l.balance_after
+        FROM sums s
+        JOIN commission_ledger l ON l.entry_id = s.last_entry
+        LEFT JOIN agent_commission_balance b ON b.agent_id = s.agent_id
+        WHERE b.agent_id IS NULL OR ABS(b.balance - s.total) > ? OR ABS(b.balance - l.balance_after) > ?
+        UNION ALL
+        SELECT b.agent_id, b.balance, NULL, NULL
+        FROM agent_commission_balance b
+        WHERE b.balance != 0 AND NOT EXISTS (SELECT 1 FROM commission_ledger WHERE agent_id = b.agent_id)
+    ''', (tolerance, tolerance))
+    return db.cursor.fetchall()
+
+
+def commission_statement(db, agent_id, start_date, end_date):
+    """
+    Commission statement for one agent from start_date to end_date inclusive ('YYYY-MM-DD').
+    Returns a dict with the opening and closing balance, the period's accrued, reversed and paid
+    amounts, and its entries in posting order.
+    """
+    # Opening balance: the running balance after the last entry before the period
+    db.cursor.execute('''
+        SELECT balance_after FROM commission_ledger
+        WHERE agent_id = ? AND created_at < ?
+        ORDER BY created_at DESC, entry_id DESC
+        LIMIT 1
+    ''', (agent_id, start_date))
+    row = db.cursor.fetchone()
+    opening = row[0] if row else 0.0
+
+    db.cursor.execute('''
+        SELECT entry_id, created_at, entry_type, payment_id, policy_id, premium_amount, commission_rate,
+               commission_amount, balance_after
+        FROM commission_ledger
+        WHERE agent_id = ? AND created_at >= ? AND created_at < date(?, '+1 day')
+        ORDER BY created_at, entry_id
+    ''', (agent_id, start_date, end_date))
+    entries = db.cursor.fetchall()
+
+    totals = {ACCRUAL: 0.0, REVERSAL: 0.0, PAYOUT: 0.0}
+    for entry in entries:
+        totals[entry[2]] += entry[7]
+    return {
+        "agent_id": agent_id,
+        "start_date": start_date,
+        "end_date": end_date,
+        "opening_balance": opening,
+        "accrued": totals[ACCRUAL],
+        "reversed": 0.0 - totals[REVERSAL],
+        "paid": 0.0 - totals[PAYOUT],
+        "closing_balance": entries[-1][8] if entries else opening,
+        "entries": entries,
+    }
+
+
+def print_statement(statement):
+    print(f"\n============[ Commission Statement: {statement['agent_id']} ]============")
+    print(f"Period          : {statement['start_date']} to {statement['end_date']}")
+    print(f"Opening balance : RM{statement['opening_balance']:,.2f}")
+    print("-" * 78)
+    print(f"{'Date':<20}{'Entry':<10}{'Payment':<12}{'Premium':>12}{'Rate %':>8}{'Commission':>12}")
+    for _, created_at, entry_type, payment_id, _, premium, rate, commission, _ in statement["entries"]:
+        rate = f"{rate:g}" if rate is not None else ""
+        print(f"{created_at:<20}{entry_type:<10}{payment_id or '':<12}{premium:>12,.2f}{rate:>8}{commission:>12,.2f}")
+    print("-" * 78)
+    print(f"Accrued         : RM{statement['accrued']:,.2f}")
+    print(f"Reversed        : RM{statement['reversed']:,.2f}")
+    print(f"Paid out        : RM{statement['paid']:,.2f}")
+    print(f"Closing balance : RM{statement['closing_balance']:,.2f}")
+
+
+def run_payroll(db, dry_run=False):
+    """
+    Pay every agent their positive commission balance in one transaction: one 'payout' entry per agent
+    and their balance back to zero. Negative balances carry forward. Returns a list of
+    (agent_id, name, amount); with dry_run nothing is written.
+    """
+    try:
+        db.conn.commit()
+        db.cursor.execute("BEGIN IMMEDIATE")
+        db.cursor.execute('''
+            SELECT b.agent_id, u.name, b.balance
+            FROM agent_commission_balance b
+            LEFT JOIN agents a ON a.agent_id = b.agent_id
+            LEFT JOIN users u ON u.nric = a.nric
+            WHERE b.balance > 0
+            ORDER BY b.agent_id
+        ''')
+        payouts = db.cursor.fetchall()
+        if not dry_run:
+            db.cursor.execute(f'''
+                INSERT INTO commission_ledger (agent_id, entry_type, commission_amount, balance_after,
+                                               effective_date)
+                SELECT agent_id, '{PAYOUT}', -balance, 0, CURRENT_TIMESTAMP
+                FROM agent_commission_balance
+                WHERE balance > 0
+                ORDER BY agent_id
+            ''')
+            db.cursor.execute('''
+                UPDATE agent_commission_balance
+                SET paid_total = ROUND(paid_total + balance, 2), balance = 0, updated_at = CURRENT_TIMESTAMP
+                WHERE balance > 0
+            ''')
+        db.conn.commit()
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+    return payouts
+
+
+def print_payroll(payouts, dry_run=False):
+    title = "Commission Payroll (dry run)" if dry_run else "Commission Payroll"
+    print(f"\n============[ {title} ]============")
+    print(f"{'Agent ID':<12}{'Name':<25}{'Amount (RM)':>14}")
+    print("-" * 51)
+    for agent_id, name, amount in payouts:
+        print(f"{agent_id:<12}{(name or ''):<25}{amount:>14,.2f}")
+    print("-" * 51)
+    print(f"{len(payouts):,} agents, RM{sum(amount for _, _, amount in payouts):,.2f} in total")
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Commission statements, payroll and ledger checks.")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--statement", metavar="AGENT_ID", help="print a commission statement for this agent")
+    parser.add_argument("--from", dest="start_date", default="0000-01-01", help="statement start date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end_date", default="9999-12-31", help="statement end date (YYYY-MM-DD)")
+    parser.add_argument("--payroll", action="store_true", help="pay out every agent's commission balance")
+    parser.add_argument("--dry-run", action="store_true", help="with --payroll, list the payouts without paying")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        if args.statement:
+            print_statement(commission_statement(db, args.statement, args.start_date, args.end_date))
+        elif args.payroll:
+            print_payroll(run_payroll(db, args.dry_run), args.dry_run)
+        else:
+            mismatches = verify_balances(db)
+            print(f"{len(mismatches)} agent balances differ from the ledger.")
+            for agent_id, balance, total, last_balance in mismatches[:20]:
+                print(f"  {agent_id}: balance {balance}, ledger sum {total}, last running balance {last_balance}")
+    except sqlite3.Error as e:
+        print(f"Error: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,14 @@
+import pytest
+
+from database_setup import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    # A migrated database holding the sample data from database_setup
+    manager = DatabaseManager(str(tmp_path / "insurance_system.db"))
+    manager.connect()
+    manager.init_database()
+    manager.add_test_data()
+    yield manager
+    manager.close()
@@ -1,30 +1,20 @@
 from database_setup import sqlite3
 from insurance_class import LifeInsurance, VehicleInsurance, HealthInsurance, PropertyInsurance, PolicyPlan, PolicyType, generate_policy_id
+from id_allocator import get_allocator
+from quote_cache import quote_with_version
+from exposure import get_exposure
 
 def generate_customer_id(db):
     """
     Generate a new customer ID in the format C01, C02, etc.
     """
-    try:
-        # Fetch the last customer ID from the database
-        db.cursor.execute("SELECT customer_id FROM customers ORDER BY customer_id DESC LIMIT 1")
-        result = db.cursor.fetchone()
-
-        if result:
-            # Extract the numeric part of the last ID and increment it
-            last_id = result[0]  # Example: "C01"
-            last_number = int(last_id[1:])  # Extract numeric part (e.g., 01)
-            new_number = last_number + 1
-        else:
-            # Start with 1 if no IDs exist
-            new_number = 1
+    return get_allocator(db).next_id(db, "customer")
 
-        # Format new ID with leading zeros (C01, C02, etc.)
-        return f"C{new_number:02d}"
-    except Exception as e:
-        print(f"Error generating customer ID: {e}")
-        # Fallback to timestamp-based ID if there's an error
-        return f"C{datetime.now().strftime('%Y%m%d%H%M%S')}"
+def generate_claim_id(db):
+    """
+    Generate a new claim ID in the format C01, C02, etc.
+    """
+    return get_allocator(db).next_id(db, "claim")
 
 def manage_customer_profile(db, nric):
     # Allows the customer to view and update their profile
@@ -137,6 +127,9 @@ def file_claim(db, customer_id):
             print(f"   Type: {policy[1]}")
             print(f"   Plan: {policy[2]}")
             print(f"   Status: {policy[3]}")
+            exposure = get_exposure(db, customer_id, policy[0])
+            if exposure and exposure["remaining_coverage"] is not None:
+                print(f"   Remaining Coverage: RM{exposure['remaining_coverage']:,.2f}")
 
         # Allow the customer to select a policy
         try:
@@ -153,26 +146,32 @@ def file_claim(db, customer_id):
             details = input("Enter claim details: ")
             amount = float(input("Enter claim amount: RM"))
 
-            # Generate the next claim ID
-            db.cursor.execute("SELECT claim_id FROM claims ORDER BY claim_id DESC LIMIT 1")
-            last_claim = db.cursor.fetchone()
-
-            if last_claim:
-                # Extract the numeric part of the last claim ID and increment it
-                last_number = int(last_claim[0][1:])  # Skip the first character (e.g., 'C')
-                new_number = last_number + 1
-            else:
-                # If no claims exist, start with C01
-                new_number = 1
+            # Check the claim fits in the coverage earlier claims have left
+            exposure = get_exposure(db, customer_id, policy_id)
+            if exposure and exposure["remaining_coverage"] is not None and amount > exposure["remaining_coverage"]:
+                print(f"\nClaim amount exceeds the remaining coverage of RM{exposure['remaining_coverage']:,.2f}.")
+                return
 
-            # Format the new claim ID
-            claim_id = f"C{new_number:02}"
+            # Generate the next claim ID
+            claim_id = generate_claim_id(db)
 
-            # Insert the claim into the database
+            # Insert the claim against the policy's current term, re-checking the coverage in the same
+            # statement in case another claim on this policy was filed in the meantime
             db.cursor.execute("""
-                INSERT INTO claims (claim_id, policy_id, customer_id, details, amount, status, date_filed)
-                VALUES (?, ?, ?, ?, ?, 'Pending request', CURRENT_TIMESTAMP)
-            """, (claim_id, policy_id, customer_id, details, amount))
+                INSERT INTO claims (claim_id, policy_id, customer_id, details, amount, status, date_filed, term)
+                SELECT ?, ?, ?, ?, ?, 'Pending request', CURRENT_TIMESTAMP,
+                       COALESCE((SELECT term FROM purchased_policy WHERE customer_id = ? AND policy_id = ?), 1)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM policy_exposure
+                    WHERE customer_id = ? AND policy_id = ? AND coverage_amount - total_claimed < ?
+                )
+            """, (claim_id, policy_id, customer_id, details, amount, customer_id, policy_id,
+                  customer_id, policy_id, amount))
+
+            if db.cursor.rowcount == 0:
+                db.conn.rollback()
+                print("\nClaim amount exceeds the remaining coverage for this policy.")
+                return
 
             db.conn.commit()
             print("\nClaim filed successfully!")
@@ -255,7 +254,7 @@ def select_prepared_policy(db, nric):
 
             # Get an agent
             db.cursor.execute("""
-                SELECT agents.nric, users.name 
+                SELECT agents.agent_id, users.name 
                 FROM agents
                 JOIN users ON agents.nric = users.nric
                 ORDER BY RANDOM()
@@ -264,7 +263,7 @@ def select_prepared_policy(db, nric):
             agent = db.cursor.fetchone()
 
             if agent:
-                agent_nric = agent[0]
+                agent_id = agent[0]
                 agent_name = agent[1]
 
                 # Insert into purchased_policy
@@ -272,7 +271,7 @@ def select_prepared_policy(db, nric):
                     INSERT INTO purchased_policy 
                     (customer_id, policy_id, agent_id, policy_type, policy_plan, coverage_amount, premium, status, start_date, end_date)
                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, DATE('now'), DATE('now', '+1 year'))
-                """, (nric, selected_policy[0], agent_nric, selected_type, selected_policy[1], selected_policy[2], selected_policy[3], 'Pending request'))
+                """, (nric, selected_policy[0], agent_id, selected_type, selected_policy[1], selected_policy[2], selected_policy[3], 'Pending request'))
 
                 db.conn.commit()
                 print("\nPolicy purchased successfully!")
@@ -319,9 +318,12 @@ def create_custom_policy(db, nric):
                 death_benefit=death_benefit,
                 medical_history=medical_history
             )
-            # Calculate premium using subclass method
-            premium = insurance.calculate_life_premium(age, coverage_amount)
+            # Calculate premium using subclass method (memoized by the quote cache)
+            premium, rate_version = quote_with_version(
+                PolicyType.LIFE.value, coverage_amount=coverage_amount, age=age,
+                medical_history=medical_history)
             insurance.premium = premium
+            insurance.rate_version = rate_version
             custom_data = f"Beneficiary: {beneficiary}, Medical History: {medical_history}"
             policy_type = PolicyType.LIFE.value
 
@@ -343,9 +345,12 @@ def create_custom_policy(db, nric):
                 vehicle_details={'type': vehicle_type, 'value': vehicle_value, 'age': vehicle_age},
                 accident_coverage=True
             )
-            # Calculate premium using subclass method
-            premium = insurance.calculate_vehicle_premium(vehicle_value, vehicle_age)
+            # Calculate premium using subclass method (memoized by the quote cache)
+            premium, rate_version = quote_with_version(
+                PolicyType.VEHICLE.value, coverage_amount=coverage_amount, vehicle_value=vehicle_value,
+                vehicle_age=vehicle_age)
             insurance.premium = premium
+            insurance.rate_version = rate_version
             custom_data = f"Vehicle Type: {vehicle_type}, Vehicle Value: RM{vehicle_value}"
             policy_type = PolicyType.VEHICLE.value
 
@@ -369,9 +374,12 @@ def create_custom_policy(db, nric):
                 deductible=deductible,
                 copayment=copayment
             )
-            # Calculate premium using subclass method
-            premium = insurance.calculate_health_premium(age, medical_history)
+            # Calculate premium using subclass method (memoized by the quote cache)
+            premium, rate_version = quote_with_version(
+                PolicyType.HEALTH.value, coverage_amount=coverage_amount, age=age,
+                coverage_type=coverage_type, medical_history=medical_history)
             insurance.premium = premium
+            insurance.rate_version = rate_version
             custom_data = f"Coverage Type: {coverage_type}, Medical History: {medical_history}"
             policy_type = PolicyType.HEALTH.value
 
@@ -394,9 +402,12 @@ def create_custom_policy(db, nric):
                 property_value=property_value,
                 property_type=property_type
             )
-            # Calculate premium using subclass method
-            premium = insurance.calculate_property_premium(property_value, property_age)
+            # Calculate premium using subclass method (memoized by the quote cache)
+            premium, rate_version = quote_with_version(
+                PolicyType.PROPERTY.value, coverage_amount=coverage_amount, property_type=property_type,
+                property_value=property_value, property_age=property_age)
             insurance.premium = premium
+            insurance.rate_version = rate_version
             custom_data = f"Property Type: {property_type}, Property Value: RM{property_value}"
             policy_type = PolicyType.PROPERTY.value
 
@@ -433,10 +444,10 @@ def create_custom_policy(db, nric):
         db.cursor.execute("""
             INSERT INTO custom_policy 
             (customer_id, policy_id, agent_id, policy_type, policy_plan, 
-            coverage_amount, premium, status, start_date, end_date)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, DATE('now'), DATE('now', '+1 year'))
+            coverage_amount, premium, status, start_date, end_date, rate_version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, DATE('now'), DATE('now', '+1 year'), ?)
         """, (customer_id, policy_id, agent[0], policy_type, "CUSTOM",
-              coverage_amount, premium, 'Pending request'))
+              coverage_amount, premium, 'Pending request', rate_version))
 
         # Insert into type-specific tables based on policy type
         if type_choice == "1":  # Life Insurance
@@ -604,9 +615,10 @@ def make_payment(db, nric):
     try:
         # Fetch policies eligible for payment
         db.cursor.execute("""
-            SELECT pp.policy_id, pp.policy_type, pp.policy_plan, pp.premium, pp.status
+            SELECT pp.policy_id, pp.policy_type, pp.policy_plan, pp.premium, pp.status, pp.term
             FROM purchased_policy pp
-            LEFT JOIN payments p ON pp.policy_id = p.policy_id AND p.status = 'Completed'
+            LEFT JOIN payments p ON pp.policy_id = p.policy_id AND pp.customer_id = p.customer_id
+                AND p.status = 'Completed' AND p.term = pp.term
             WHERE pp.customer_id = ? AND pp.status = 'Accepted' AND p.policy_id IS NULL
         """, (nric,))
         policies = db.cursor.fetchall()
@@ -632,6 +644,7 @@ def make_payment(db, nric):
             selected_policy = policies[policy_choice]
             policy_id = selected_policy[0]
             premium_amount = selected_policy[3]
+            term = selected_policy[5]
 
             print("\nSelect Payment Option:")
             print("[1] Debit/Credit Card")
@@ -647,9 +660,9 @@ def make_payment(db, nric):
 
             db.cursor.execute("""
                 INSERT INTO payments (payment_id, customer_id, policy_id, amount, 
-                                      payment_date, payment_method, status)
-                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?, 'Completed')
-            """, (payment_id, nric, policy_id, premium_amount, payment_method))
+                                      payment_date, payment_method, status, term)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP, ?, 'Completed', ?)
+            """, (payment_id, nric, policy_id, premium_amount, payment_method, term))
 
             db.cursor.execute("""
                 UPDATE purchased_policy
@@ -671,19 +684,8 @@ def make_payment(db, nric):
         db.conn.rollback()
 
 def generate_payment_id(db):
-    # Generate a new payment ID
-    db.cursor.execute("SELECT payment_id FROM payments ORDER BY payment_id DESC LIMIT 1")
-    result = db.cursor.fetchone()
-
-    if result and result[0].startswith("PAYMENT"):
-        # Extract the numeric part, increment it, and format it back
-        last_id = int(result[0][7:])  # Extract numeric part after 'PAYMENT'
-        new_id = f"PAYMENT{last_id + 1:03}"
-    else:
-        # Start with PAYMENT001 if no existing IDs
-        new_id = "PAYMENT001"
-
-    return new_id
+    # Generate a new payment ID in the format PAYMENT001, PAYMENT002, etc.
+    return get_allocator(db).next_id(db, "payment")
 
 def cancel_policy(db, customer_id):
     """
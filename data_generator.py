@@ -0,0 +1,403 @@
+import argparse
+import json
+import random
+import time
+from datetime import date, timedelta
+
+from database_setup import DatabaseManager
+from id_allocator import get_allocator, format_id
+from insurance_class import PolicyType, calculate_premium
+from rate_tables import current_rates
+
+# Synthetic book-of-business generator for scale testing.
+# The same seed and profile against the same starting database always produce the same rows.
+
+FIRST_NAMES = ["Aisyah", "Daniel", "Mei Ling", "Arjun", "Nurul", "Jason", "Siti", "Kumar", "Hui Min", "Farid",
+               "Priya", "Adam", "Chloe", "Hafiz", "Wei Jie", "Lina", "Ravi", "Sofea", "Marcus", "Zara"]
+LAST_NAMES = ["Tan", "Abdullah", "Lim", "Raj", "Wong", "Ismail", "Lee", "Ng", "Hassan", "Chong",
+              "Pillai", "Yusof", "Goh", "Ahmad", "Teo", "Ong", "Razak", "Chan", "Nair", "Ibrahim"]
+OCCUPATIONS = ["Engineer", "Teacher", "Nurse", "Accountant", "Sales Assistant", "Designer", "Driver",
+               "Doctor", "Lawyer", "Chef", "Technician", "Business Owner", "Clerk", "Programmer"]
+QUALIFICATIONS = ["Diploma in Insurance", "Bachelor in Finance", "Bachelor in Marketing",
+                  "Master in Finance", "Bachelor in Actuarial Science"]
+VEHICLE_TYPES = ["Perodua Myvi", "Proton Saga", "Honda City", "Toyota Vios", "Honda Civic", "BMW 3 Series"]
+PROPERTY_TYPES = ["residential", "commercial", "industrial"]
+HEALTH_COVERAGE_TYPES = ["BASIC", "COMPREHENSIVE", "FAMILY", "INDIVIDUAL", "HOSPITAL", "OUTPATIENT", "SPECIALIST"]
+MEDICAL_HISTORIES = ["None", "None", "None", "Asthma", "Diabetes", "Hypertension"]
+PAYMENT_METHODS = ["Debit/Credit Card", "Online Banking"]
+
+# Catalog used when the database has no standard packages yet (same plans as add_test_data)
+DEFAULT_CATALOG = [
+    ("VEHICLE", "Standard", 50000, 1200, "Includes roadside assistance and towing service up to 100 miles."),
+    ("HEALTH", "Standard", 20000, 1500, "Includes regular medical check up."),
+    ("LIFE", "Standard", 30000, 100, "Include advisor form lawyers."),
+    ("PROPERTY", "Standard", 20000, 2000, "Include food support when disaster happen."),
+    ("VEHICLE", "Premium", 500000, 15000, "Includes roadside assistance and towing service up to 100 miles."),
+    ("HEALTH", "Premium", 200000, 25000, "Includes regular medical check up."),
+    ("LIFE", "Premium", 300000, 15000, "Include advisor from lawyers."),
+    ("PROPERTY", "Premium", 200000, 20000, "Include food support when disaster happen."),
+]
+
+DEFAULT_PROFILE = {
+    "customers_per_agent": 250,
+    # Number of policies held by a customer -> probability
+    "policies_per_customer": {"0": 0.10, "1": 0.35, "2": 0.30, "3": 0.15, "4": 0.10},
+    # Share of a customer's policies that are custom rather than catalog plans
+    "custom_share": 0.20,
+    "policy_status": {"Pending request": 0.10, "Accepted": 0.15, "Premium paid": 0.35, "Active": 0.15,
+                      "Cancelled": 0.10, "Expired": 0.15},
+    "custom_status": {"Pending request": 0.25, "Accepted": 0.65, "Rejected": 0.10},
+    # Probability that an in-force policy has a claim filed against it
+    "claim_rate": 0.15,
+    "claim_status": {"Pending request": 0.40, "Accepted": 0.45, "Rejected": 0.15},
+    "customer_age": [18, 75],
+    "agent_age": [21, 60],
+    "income": [20000, 300000],
+    "commission_rate": [5.0, 20.0],
+    "coverage_amounts": [20000, 50000, 100000, 150000, 250000, 500000, 1000000],
+    "start_year": 2020,
+    "end_year": 2025,
+}
+
+# Inputs each policy type's premium calculator needs, besides the coverage amount
+RATING_INPUTS = {
+    "LIFE": ("age", "medical_history"),
+    "VEHICLE": ("vehicle_value", "vehicle_age"),
+    "HEALTH": ("age", "coverage_type", "medical_history"),
+    "PROPERTY": ("property_type", "property_value", "property_age"),
+}
+POLICY_PREFIXES = {"LIFE": "L", "VEHICLE": "V", "HEALTH": "H", "PROPERTY": "P"}
+PAID_STATUSES = {"Premium paid", "Active", "Expired"}
+CLAIMABLE_STATUSES = {"Premium paid", "Active"}
+
+INSERT_SQL = {
+    "users": "INSERT INTO users (nric, role, name, email, password, contact_number, age) VALUES (?, ?, ?, ?, ?, ?, ?)",
+    "customers": "INSERT INTO customers (customer_id, nric, occupation, income) VALUES (?, ?, ?, ?)",
+    "agents": "INSERT INTO agents (agent_id, nric, qualification, commission_rate) VALUES (?, ?, ?, ?)",
+    "policy_package": """INSERT INTO policy_package (policy_id, policy_type, policy_plan, coverage_amount, premium,
+                         custom_data) VALUES (?, ?, ?, ?, ?, ?)""",
+    "purchased_policy": """INSERT INTO purchased_policy (customer_id, policy_id, agent_id, policy_type, policy_plan,
+                           coverage_amount, premium, status, start_date, end_date)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    "custom_policy": """INSERT INTO custom_policy (customer_id, policy_id, agent_id, policy_type, policy_plan,
+                        coverage_amount, premium, status, start_date, end_date, rate_version)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+    "life_policy_details": """INSERT INTO life_policy_details (policy_id, customer_id, beneficiary_name,
+                              death_benefit, medical_history) VALUES (?, ?, ?, ?, ?)""",
+    "vehicle_policy_details": """INSERT INTO vehicle_policy_details (policy_id, customer_id, vehicle_type,
+                                 vehicle_value, vehicle_age, vehicle_registration, accident_coverage)
+                                 VALUES (?, ?, ?, ?, ?, ?, ?)""",
+    "property_policy_details": """INSERT INTO property_policy_details (policy_id, customer_id, property_address,
+                                  property_type, property_value, property_age) VALUES (?, ?, ?, ?, ?, ?)""",
+    "health_policy_details": """INSERT INTO health_policy_details (policy_id, customer_id, coverage_type,
+                                medical_history, deductible, copayment) VALUES (?, ?, ?, ?, ?, ?)""",
+    "claims": """INSERT INTO claims (claim_id, policy_id, customer_id, details, amount, status, date_filed,
+                 processed_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+    "payments": """INSERT INTO payments (payment_id, customer_id, policy_id, amount, payment_date, payment_method,
+                   status) VALUES (?, ?, ?, ?, ?, ?, ?)""",
+}
+
+
+class BulkLoader:
+    """
+    Buffers rows per table and writes them with executemany in fixed-size chunks.
+    Commits every `commit_every` rows, so the load runs as a few large transactions.
+    """
+    def __init__(self, db, chunk_size=5000, commit_every=200000):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.commit_every = commit_every
+        self.buffers = {table: [] for table in INSERT_SQL}
+        self.counts = {table: 0 for table in INSERT_SQL}
+        self._uncommitted = 0
+
+    def add(self, table, row):
+        buffer = self.buffers[table]
+        buffer.append(row)
+        if len(buffer) >= self.chunk_size:
+            # Write the tables it refers to first, so triggers on this one see their rows
+            for name in INSERT_SQL:
+                self.flush(name)
+                if name == table:
+                    break
+
+    def flush(self, table):
+        buffer = self.buffers[table]
+        if not buffer:
+            return
+        self.db.cursor.executemany(INSERT_SQL[table], buffer)
+        self.counts[table] += len(buffer)
+        self._uncommitted += len(buffer)
+        buffer.clear()
+        if self._uncommitted >= self.commit_every:
+            self.db.conn.commit()
+            self._uncommitted = 0
+
+    def finish(self):
+        for table in INSERT_SQL:
+            self.flush(table)
+        self.db.conn.commit()
+
+
+class IdStream:
+    # Hands out IDs for one sequence, reserving blocks inside the loader's transaction
+    def __init__(self, db, name, block_size=5000):
+        self.db = db
+        self.name = name
+        self.block_size = block_size
+        self._numbers = iter(())
+
+    def next(self):
+        number = next(self._numbers, None)
+        if number is None:
+            self._numbers = iter(get_allocator(self.db).reserve(self.name, self.block_size, self.db))
+            number = next(self._numbers)
+        return format_id(self.name, number)
+
+
+def _weighted_choice(rng, weights):
+    # Pick a key from a {value: probability} mapping
+    keys = list(weights)
+    return rng.choices(keys, weights=[weights[k] for k in keys])[0]
+
+
+def _add_year(day):
+    # Same behaviour as SQLite's DATE(day, '+1 year'), where 29 Feb rolls over to 1 Mar
+    try:
+        return day.replace(year=day.year + 1)
+    except ValueError:
+        return date(day.year + 1, 3, 1)
+
+
+def _custom_premium(policy_type, coverage_amount, details, rates):
+    # Price a custom policy with the same calculators create_custom_policy uses
+    inputs = {name: details[name] for name in RATING_INPUTS[policy_type]}
+    return calculate_premium(policy_type, coverage_amount=coverage_amount, rates=rates, **inputs)
+
+
+def _load_catalog(db, loader, policy_ids):
+    # Use the existing standard plans, or create the default catalog if there are none
+    db.cursor.execute('''
+        SELECT policy_id, policy_type, policy_plan, coverage_amount, premium
+        FROM policy_package
+        WHERE policy_plan != 'CUSTOM'
+        ORDER BY policy_id
+    ''')
+    catalog = db.cursor.fetchall()
+    if catalog:
+        return catalog
+
+    for policy_type, plan, coverage, premium, custom_data in DEFAULT_CATALOG:
+        policy_id = policy_ids[policy_type].next()
+        loader.add("policy_package", (policy_id, policy_type, plan, coverage, premium, custom_data))
+        catalog.append((policy_id, policy_type, plan, coverage, premium))
+    return catalog
+
+
+def generate_book(db, customers=10000, agents=None, seed=42, profile=None, chunk_size=5000, commit_every=200000):
+    """
+    Fill every table with a consistent synthetic book of business.
+    Returns a dict of row counts per table plus elapsed seconds and rows/sec.
+    """
+    settings = dict(DEFAULT_PROFILE)
+    settings.update(profile or {})
+    rng = random.Random(seed)
+    if agents is None:
+        agents = max(1, customers // settings["customers_per_agent"])
+
+    started = time.perf_counter()
+    db.conn.commit()
+    db.cursor.execute("BEGIN")
+    loader = BulkLoader(db, chunk_size, commit_every)
+    allocator = get_allocator(db)
+    # Price the whole book with one rate table version
+    rates = current_rates()
+
+    policy_ids = {policy_type: IdStream(db, f"policy_{prefix}", chunk_size)
+                  for policy_type, prefix in POLICY_PREFIXES.items()}
+    claim_ids = IdStream(db, "claim", chunk_size)
+    payment_ids = IdStream(db, "payment", chunk_size)
+    catalog = _load_catalog(db, loader, policy_ids)
+
+    # Synthetic NRICs continue after the rows already in `users`, so reruns do not collide
+    db.cursor.execute("SELECT COUNT(*) FROM users")
+    serial = db.cursor.fetchone()[0]
+
+    first_day = date(settings["start_year"], 1, 1)
+    day_span = (date(settings["end_year"], 12, 31) - first_day).days
+    policy_counts = {int(k): v for k, v in settings["policies_per_customer"].items()}
+
+    def new_user(role, age_range):
+        nonlocal serial
+        serial += 1
+        nric = f"9{serial:011d}"
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        name = f"{first} {last}"
+        email = f"{first}.{last}.{serial}@example.com".replace(" ", "").lower()
+        contact = f"01{rng.randrange(10000000, 99999999)}"
+        age = rng.randint(*age_range)
+        loader.add("users", (nric, role, name, email, f"pw{serial}", contact, age))
+        return nric, name, age
+
+    # Agents
+    agent_ids = allocator.reserve_ids("agent", agents, db)
+    for agent_id in agent_ids:
+        nric, _, _ = new_user("Agent", settings["agent_age"])
+        rate = round(rng.uniform(*settings["commission_rate"]), 2)
+        loader.add("agents", (agent_id, nric, rng.choice(QUALIFICATIONS), rate))
+
+    # Customers and everything hanging off them
+    for number in allocator.reserve("customer", customers, db):
+        customer_id = format_id("customer", number)
+        nric, name, age = new_user("Customer", settings["customer_age"])
+        loader.add("customers", (customer_id, nric, rng.choice(OCCUPATIONS),
+                                 round(rng.uniform(*settings["income"]), 2)))
+
+        held = set()
+        for _ in range(_weighted_choice(rng, policy_counts)):
+            agent_id = rng.choice(agent_ids)
+            start = first_day + timedelta(days=rng.randrange(day_span))
+            start_date, end_date = start.isoformat(), _add_year(start).isoformat()
+
+            if rng.random() < settings["custom_share"]:
+                policy_type = rng.choice(list(POLICY_PREFIXES))
+                policy_id = policy_ids[policy_type].next()
+                coverage = rng.choice(settings["coverage_amounts"])
+                details = _random_details(rng, policy_type, coverage, age, name)
+                premium = _custom_premium(policy_type, coverage, details, rates)
+                loader.add("policy_package", (policy_id, policy_type, "CUSTOM", coverage, premium,
+                                              details["custom_data"]))
+                custom_status = _weighted_choice(rng, settings["custom_status"])
+                loader.add("custom_policy", (nric, policy_id, agent_id, policy_type, "CUSTOM", coverage,
+                                             premium, custom_status, start_date, end_date, rates.version))
+                _add_details(loader, policy_type, policy_id, customer_id, details)
+                if custom_status != "Accepted":
+                    continue
+                plan = "CUSTOM"
+                status = _weighted_choice(rng, settings["policy_status"])
+                # Approved custom policies enter purchased_policy as 'Accepted' at the earliest
+                if status == "Pending request":
+                    status = "Accepted"
+            else:
+                policy_id, policy_type, plan, coverage, premium = rng.choice(catalog)
+                if policy_id in held:
+                    continue
+                status = _weighted_choice(rng, settings["policy_status"])
+
+            held.add(policy_id)
+            loader.add("purchased_policy", (nric, policy_id, agent_id, policy_type, plan, coverage, premium,
+                                            status, start_date, end_date))
+
+            if status in PAID_STATUSES:
+                paid_on = start + timedelta(days=rng.randrange(30))
+                loader.add("payments", (payment_ids.next(), nric, policy_id, premium,
+                                        f"{paid_on.isoformat()} {rng.randrange(24):02d}:{rng.randrange(60):02d}:00",
+                                        rng.choice(PAYMENT_METHODS), "Completed"))
+
+            if status in CLAIMABLE_STATUSES and rng.random() < settings["claim_rate"]:
+                claim_status = _weighted_choice(rng, settings["claim_status"])
+                filed = start + timedelta(days=rng.randrange(31, 365))
+                processed = None if claim_status == "Pending request" else \
+                    (filed + timedelta(days=rng.randrange(1, 30))).isoformat()
+                amount = round(coverage * rng.uniform(0.01, 0.6), 2)
+                loader.add("claims", (claim_ids.next(), policy_id, nric, f"{policy_type.title()} claim", amount,
+                                      claim_status, filed.isoformat(), processed))
+
+    loader.finish()
+    elapsed = time.perf_counter() - started
+    total = sum(loader.counts.values())
+    result = dict(loader.counts)
+    result.update({"total_rows": total, "elapsed_sec": elapsed,
+                   "rows_per_sec": total / elapsed if elapsed > 0 else 0.0})
+    return result
+
+
+def _random_details(rng, policy_type, coverage, age, name):
+    # Rating inputs and type-specific columns for one custom policy
+    if policy_type == PolicyType.LIFE.value:
+        history = rng.choice(MEDICAL_HISTORIES)
+        beneficiary = f"{rng.choice(FIRST_NAMES)} {name.split()[-1]}"
+        return {"beneficiary": beneficiary, "death_benefit": float(coverage), "medical_history": history, "age": age,
+                "custom_data": f"Beneficiary: {beneficiary}, Medical History: {history}"}
+    if policy_type == PolicyType.VEHICLE.value:
+        vehicle_type = rng.choice(VEHICLE_TYPES)
+        value = float(rng.randrange(30000, 300000, 1000))
+        registration = f"{rng.choice('ABCDJKMNPRTW')}{rng.choice('ABCDEFGHJKLMNPQRSTUVWXY')}" \
+                       f"{rng.choice('ABCDEFGHJKLMNPQRSTUVWXY')} {rng.randrange(1, 9999)}"
+        return {"vehicle_type": vehicle_type, "vehicle_value": value, "vehicle_age": rng.randrange(0, 15),
+                "vehicle_registration": registration,
+                "custom_data": f"Vehicle Type: {vehicle_type}, Vehicle Value: RM{value}"}
+    if policy_type == PolicyType.HEALTH.value:
+        coverage_type = rng.choice(HEALTH_COVERAGE_TYPES)
+        history = rng.choice(MEDICAL_HISTORIES)
+        return {"coverage_type": coverage_type, "medical_history": history, "age": age,
+                "deductible": float(rng.choice([500, 1000, 2000])), "copayment": float(rng.choice([10, 15, 20])),
+                "custom_data": f"Coverage Type: {coverage_type}, Medical History: {history}"}
+    property_type = rng.choice(PROPERTY_TYPES)
+    value = float(rng.randrange(150000, 3000000, 10000))
+    address = f"{rng.randrange(1, 999)} Jalan {rng.choice(LAST_NAMES)}, City"
+    return {"property_type": property_type, "property_value": value, "property_age": rng.randrange(0, 40),
+            "property_address": address,
+            "custom_data": f"Property Type: {property_type}, Property Value: RM{value}"}
+
+
+def _add_details(loader, policy_type, policy_id, customer_id, details):
+    if policy_type == PolicyType.LIFE.value:
+        loader.add("life_policy_details", (policy_id, customer_id, details["beneficiary"],
+                                           details["death_benefit"], details["medical_history"]))
+    elif policy_type == PolicyType.VEHICLE.value:
+        loader.add("vehicle_policy_details", (policy_id, customer_id, details["vehicle_type"],
+                                              details["vehicle_value"], details["vehicle_age"],
+                                              details["vehicle_registration"], True))
+    elif policy_type == PolicyType.HEALTH.value:
+        loader.add("health_policy_details", (policy_id, customer_id, details["coverage_type"],
+                                             details["medical_history"], details["deductible"],
+                                             details["copayment"]))
+    else:
+        loader.add("property_policy_details", (policy_id, customer_id, details["property_address"],
+                                               details["property_type"], details["property_value"],
+                                               details["property_age"]))
+
+
+def print_report(result):
+    print("\n============[ Synthetic Data Load ]============")
+    for table in INSERT_SQL:
+        print(f"{table:<24}: {result[table]:>12,} rows")
+    print("-" * 47)
+    print(f"{'Total':<24}: {result['total_rows']:>12,} rows")
+    print(f"{'Elapsed':<24}: {result['elapsed_sec']:>12.2f} s")
+    print(f"{'Throughput':<24}: {result['rows_per_sec']:>12,.0f} rows/sec")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic insurance book of business.")
+    parser.add_argument("--db", default="insurance_system.db", help="database file to fill")
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--agents", type=int, default=None, help="default: one per customers_per_agent customers")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--profile", help="JSON file overriding keys of DEFAULT_PROFILE")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="rows per executemany call")
+    parser.add_argument("--commit-every", type=int, default=200000, help="rows per transaction")
+    args = parser.parse_args()
+
+    profile = None
+    if args.profile:
+        with open(args.profile) as f:
+            profile = json.load(f)
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        db.init_database()
+        # Bulk loads do not need a durable fsync per transaction
+        db.cursor.execute("PRAGMA journal_mode=WAL")
+        db.cursor.execute("PRAGMA synchronous=NORMAL")
+        result = generate_book(db, args.customers, args.agents, args.seed, profile,
+                               args.chunk_size, args.commit_every)
+        print_report(result)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,238 @@
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from migrations import run_migrations
+
+
+class PooledSession:
+    """
+    Handle given out by the connection pool.
+    Exposes the same `conn` and `cursor` attributes as DatabaseManager so the
+    customer, agent and admin functions can be called with it unchanged.
+    """
+    def __init__(self, db_name, conn):
+        self.db_name = db_name
+        self.conn = conn
+        self.cursor = conn.cursor()
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections in WAL mode.
+    A connection is owned by one thread while it is checked out; nested
+    checkouts on the same thread reuse that connection instead of taking
+    a second one from the pool.
+    """
+    def __init__(self, db_name, max_size=8, timeout=30.0, busy_timeout=5.0):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.timeout = timeout
+        self.busy_timeout = busy_timeout
+
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+        # Statistics
+        self._started = time.perf_counter()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._peak_in_use = 0
+
+    def _new_connection(self):
+        # Open a connection that may be handed between threads by the pool
+        conn = sqlite3.connect(self.db_name, timeout=self.busy_timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def checkout(self):
+        """Take a connection from the pool, waiting up to `timeout` seconds for one to free up."""
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        create = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.OperationalError("Connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._created < self.max_size:
+                    self._created += 1
+                    create = True
+                    conn = None
+                    break
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise sqlite3.OperationalError(
+                        f"Timed out after {self.timeout}s waiting for a database connection")
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+
+        if create:
+            try:
+                conn = self._new_connection()
+            except sqlite3.Error:
+                with self._cond:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+
+        waited = time.perf_counter() - started
+        with self._cond:
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def checkin(self, conn):
+        """Return a connection to the pool, discarding any uncommitted work."""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # A broken connection is dropped and replaced on the next checkout
+            conn.close()
+            conn = None
+
+        with self._cond:
+            self._in_use -= 1
+            if conn is None or self._closed:
+                self._created -= 1
+                if conn is not None:
+                    conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        # Check out a connection for the current thread, reusing it for nested checkouts
+        held = getattr(self._local, "session", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self.checkout()
+        session = PooledSession(self.db_name, conn)
+        self._local.session = session
+        self._local.depth = 1
+        try:
+            yield session
+        finally:
+            self._local.session = None
+            self._local.depth = 0
+            self.checkin(conn)
+
+    def stats(self):
+        # Snapshot of pool usage
+        with self._cond:
+            elapsed = time.perf_counter() - self._started
+            return {
+                "max_size": self.max_size,
+                "open_connections": self._created,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "peak_in_use": self._peak_in_use,
+                "checkouts": self._checkouts,
+                "checkouts_per_sec": self._checkouts / elapsed if elapsed > 0 else 0.0,
+                "timeouts": self._timeouts,
+                "total_wait_sec": self._total_wait,
+                "avg_wait_sec": self._total_wait / self._checkouts if self._checkouts else 0.0,
+                "max_wait_sec": self._max_wait,
+            }
+
+    def close(self):
+        # Close idle connections; checked-out ones are closed when returned
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop().close()
+                self._created -= 1
+            self._cond.notify_all()
+
 
 class DatabaseManager:
-    def __init__(self, db_name="insurance_system.db"):
+    def __init__(self, db_name="insurance_system.db", pool_size=None, pool_timeout=30.0):
         self.db_name = db_name
         self.conn = None
         self.cursor = None
+        # Pooled mode is enabled by giving a pool size
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.pool = None
 
     def connect(self):
         # Establish database connection
         try:
-            self.conn = sqlite3.connect(self.db_name)
-            self.cursor = self.conn.cursor()
-            print(f"Successfully connected to {self.db_name}")
+            if self.pool_size:
+                self.pool = ConnectionPool(self.db_name, max_size=self.pool_size, timeout=self.pool_timeout)
+                # Open the first connection now so configuration errors surface here
+                with self.pool.connection():
+                    pass
+                print(f"Successfully connected to {self.db_name} (pool of {self.pool_size})")
+            else:
+                self.conn = sqlite3.connect(self.db_name)
+                self.cursor = self.conn.cursor()
+                print(f"Successfully connected to {self.db_name}")
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
             raise
 
+    @contextmanager
+    def session(self):
+        """
+        Yield an object with `conn` and `cursor` for one unit of work.
+        In pooled mode this is a connection checked out for the current thread,
+        otherwise it is the manager itself.
+        """
+        if self.pool is None:
+            yield self
+        else:
+            with self.pool.connection() as session:
+                yield session
+
+    def _on_session(self, session):
+        # A plain manager working on a checked-out connection, for methods that need `conn` and `cursor`
+        manager = DatabaseManager(self.db_name)
+        manager.conn, manager.cursor = session.conn, session.cursor
+        return manager
+
+    def pool_stats(self):
+        # Pool statistics, or None when not running in pooled mode
+        return self.pool.stats() if self.pool else None
+
     def close(self):
         # Close database connection
+        if self.pool:
+            self.pool.close()
+            print("Database connection pool closed")
         if self.conn:
             self.conn.close()
             print("Database connection closed")
 
     def init_database(self):
         # Initialize database tables
+        if self.pool is not None:
+            # Pooled mode has no connection of its own, so the tables are created on a checked-out one
+            with self.session() as session:
+                return self._on_session(session).init_database()
         try:
             # Users table (base table for all user types)
             self.cursor.execute('''
@@ -204,12 +413,18 @@ class DatabaseManager:
             self.conn.commit()
             print("Database tables created successfully")
 
+            # Bring indexes and later schema changes up to date
+            run_migrations(self)
+
         except sqlite3.Error as e:
             print(f"Error creating tables: {e}")
             raise
 
     def add_test_data(self):
         # Add some test data to the database
+        if self.pool is not None:
+            with self.session() as session:
+                return self._on_session(session).add_test_data()
         try:
             # Add test users
             test_data = [
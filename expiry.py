@@ -0,0 +1,125 @@
+import argparse
+import sqlite3
+import time
+from datetime import date
+
+# Policy expiry sweeper.
+# Policies still in force after their end date are moved to 'Expired'. Each run covers the end dates
+# from the previous run's cut-off (the high-water mark in job_checkpoints) up to today, seeking the
+# (status, end_date) index for one in-force status at a time. Rows are expired a bounded batch per
+# transaction with a short pause in between, so the write lock is never held for long and
+# interactive users get their turn. A batch only touches rows that are still due, so an interrupted
+# run is simply repeated. A policy that comes due behind the mark later (e.g. restored from a backup)
+# is only found by a --full sweep.
+
+JOB_NAME = "expire_policies"
+EXPIRED = "Expired"
+
+# Statuses of a policy that is in force (or about to be) until its end date
+IN_FORCE = ("Accepted", "Premium paid", "Active")
+TABLES = ("purchased_policy", "custom_policy")
+
+_EXPIRE_BATCH = '''
+    UPDATE {table} SET status = '{expired}'
+    WHERE rowid IN (SELECT rowid FROM {table}
+                    WHERE status = ? AND end_date >= ? AND end_date < ?
+                    LIMIT ?)
+'''
+
+
+def read_mark(db):
+    # End date up to which every policy has been swept ('' before the first run)
+    db.cursor.execute("SELECT last_key FROM job_checkpoints WHERE job_name = ?", (JOB_NAME,))
+    row = db.cursor.fetchone()
+    return row[0] if row and row[0] else ""
+
+
+def _save_mark(db, mark, rows):
+    db.cursor.execute('''
+        INSERT INTO job_checkpoints (job_name, last_key, rows_done, status, updated_at)
+        VALUES (?, ?, ?, 'completed', CURRENT_TIMESTAMP)
+        ON CONFLICT (job_name) DO UPDATE SET
+            last_key = excluded.last_key,
+            rows_done = rows_done + excluded.rows_done,
+            status = excluded.status,
+            updated_at = excluded.updated_at
+    ''', (JOB_NAME, mark, rows))
+
+
+def expire_policies(db, as_of=None, batch_size=500, pause=0.02, full=False):
+    """
+    Expire every in-force policy whose end date is before `as_of` ('YYYY-MM-DD', default today)
+    and after the last run's cut-off (from the beginning with full=True). Each batch of at most
+    `batch_size` rows is its own transaction, followed by `pause` seconds without the lock.
+    Returns a summary dict with the rows expired per table, the range swept and the longest
+    lock hold.
+    """
+    as_of = as_of or date.today().isoformat()
+    since = "" if full else read_mark(db)
+    db.conn.commit()
+    summary = {"since": since, "as_of": as_of, "expired": dict.fromkeys(TABLES, 0), "batches": 0,
+               "max_batch_seconds": 0.0}
+    started = time.perf_counter()
+    if since >= as_of:
+        summary["seconds"] = 0.0
+        return summary
+
+    try:
+        for table in TABLES:
+            statement = _EXPIRE_BATCH.format(table=table, expired=EXPIRED)
+            for status in IN_FORCE:
+                while True:
+                    batch_started = time.perf_counter()
+                    db.cursor.execute("BEGIN IMMEDIATE")
+                    db.cursor.execute(statement, (status, since, as_of, batch_size))
+                    expired = db.cursor.rowcount
+                    db.conn.commit()
+                    summary["max_batch_seconds"] = max(summary["max_batch_seconds"],
+                                                       time.perf_counter() - batch_started)
+                    summary["batches"] += 1
+                    summary["expired"][table] += expired
+                    if expired < batch_size:
+                        break
+                    time.sleep(pause)
+
+        # Only a sweep that got through every table moves the mark
+        db.cursor.execute("BEGIN IMMEDIATE")
+        _save_mark(db, max(as_of, read_mark(db)), sum(summary["expired"].values()))
+        db.conn.commit()
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+    summary["seconds"] = time.perf_counter() - started
+    return summary
+
+
+def print_summary(summary):
+    since = summary["since"] or "the beginning"
+    print(f"\nSwept end dates from {since} to before {summary['as_of']}")
+    for table, count in summary["expired"].items():
+        print(f"  {table}: {count:,} expired")
+    print(f"  {summary['batches']:,} batches in {summary['seconds']:.2f}s, "
+          f"longest lock hold {summary['max_batch_seconds'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Move in-force policies past their end date to Expired.")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--as-of", help="expire end dates before this date (YYYY-MM-DD, default: today)")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows expired per transaction")
+    parser.add_argument("--pause", type=float, default=0.02, help="seconds between batches")
+    parser.add_argument("--full", action="store_true", help="sweep all end dates, not just those since the last run")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        print_summary(expire_policies(db, args.as_of, args.batch_size, args.pause, args.full))
+    except sqlite3.Error as e:
+        print(f"Error expiring policies: {e}")
+    finally:
+        db.close()
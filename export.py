@@ -0,0 +1,305 @@
+import argparse
+import contextlib
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+# Streaming data export.
+# A dataset's rows are read from a cursor a batch at a time with fetchmany and passed through
+# generators (progress reporting, then a CSV or JSON Lines writer) into a buffered file, so memory
+# use stays the same however many rows match. Each dataset names the columns that can be selected
+# and filtered on; rows come out in primary key order.
+
+# Dataset name -> FROM clause, selectable columns (name -> SQL expression) and ORDER BY
+DATASETS = {
+    "policy_packages": {
+        "from": "policy_package p",
+        "columns": {
+            "policy_id": "p.policy_id",
+            "policy_type": "p.policy_type",
+            "policy_plan": "p.policy_plan",
+            "coverage_amount": "p.coverage_amount",
+            "premium": "p.premium",
+            "custom_data": "p.custom_data",
+        },
+        "order": "p.policy_id",
+    },
+    "purchased_policies": {
+        "from": '''purchased_policy pp
+                   LEFT JOIN agents a ON a.agent_id = pp.agent_id
+                   LEFT JOIN users u ON u.nric = a.nric''',
+        "columns": {
+            "customer_id": "pp.customer_id",
+            "policy_id": "pp.policy_id",
+            "agent_id": "pp.agent_id",
+            "agent_name": "u.name",
+            "policy_type": "pp.policy_type",
+            "policy_plan": "pp.policy_plan",
+            "coverage_amount": "pp.coverage_amount",
+            "premium": "pp.premium",
+            "status": "pp.status",
+            "start_date": "pp.start_date",
+            "end_date": "pp.end_date",
+        },
+        "order": "pp.customer_id, pp.policy_id",
+    },
+    "customers": {
+        "from": "customers c JOIN users u ON u.nric = c.nric",
+        "columns": {
+            "customer_id": "c.customer_id",
+            "nric": "c.nric",
+            "name": "u.name",
+            "email": "u.email",
+            "contact_number": "u.contact_number",
+            "age": "u.age",
+            "occupation": "c.occupation",
+            "income": "c.income",
+        },
+        "order": "c.customer_id",
+    },
+    "agents": {
+        "from": '''agents a
+                   JOIN users u ON u.nric = a.nric
+                   LEFT JOIN (SELECT agent_id, SUM(policy_count) AS policies_sold, SUM(premium_total) AS total_sales
+                              FROM agent_sales_summary
+                              GROUP BY agent_id) s ON s.agent_id = a.agent_id''',
+        "columns": {
+            "agent_id": "a.agent_id",
+            "nric": "a.nric",
+            "name": "u.name",
+            "qualification": "a.qualification",
+            "status": "a.status",
+            "commission_rate": "a.commission_rate",
+            "policies_sold": "COALESCE(s.policies_sold, 0)",
+            "total_sales": "COALESCE(s.total_sales, 0)",
+        },
+        "order": "a.agent_id",
+    },
+    "claims": {
+        "from": "claims c",
+        "columns": {
+            "claim_id": "c.claim_id",
+            "customer_id": "c.customer_id",
+            "policy_id": "c.policy_id",
+            "amount": "c.amount",
+            "status": "c.status",
+            "date_filed": "c.date_filed",
+            "processed_date": "c.processed_date",
+            "details": "c.details",
+        },
+        "order": "c.claim_id",
+    },
+    "payments": {
+        "from": "payments p",
+        "columns": {
+            "payment_id": "p.payment_id",
+            "customer_id": "p.customer_id",
+            "policy_id": "p.policy_id",
+            "amount": "p.amount",
+            "payment_date": "p.payment_date",
+            "payment_method": "p.payment_method",
+            "status": "p.status",
+            "provider_reference": "p.provider_reference",
+        },
+        "order": "p.payment_id",
+    },
+    "commission_ledger": {
+        "from": "commission_ledger l",
+        "columns": {
+            "entry_id": "l.entry_id",
+            "created_at": "l.created_at",
+            "effective_date": "l.effective_date",
+            "agent_id": "l.agent_id",
+            "entry_type": "l.entry_type",
+            "payment_id": "l.payment_id",
+            "customer_id": "l.customer_id",
+            "policy_id": "l.policy_id",
+            "premium_amount": "l.premium_amount",
+            "commission_rate": "l.commission_rate",
+            "commission_amount": "l.commission_amount",
+            "balance_after": "l.balance_after",
+        },
+        "order": "l.entry_id",
+    },
+}
+
+FORMATS = ("csv", "jsonl")
+OPERATORS = ("=", "!=", "<", "<=", ">", ">=")
+_FILTER = re.compile(r"^\s*(\w+)\s*(!=|<=|>=|=|<|>)\s*(.*?)\s*$")
+_COLUMN_REF = re.compile(r"^\w+\.\w+$")
+WRITE_BUFFER = 1 << 20
+
+
+def parse_filter(text):
+    """Turn 'column<op>value' (e.g. 'status=Active', 'premium>=1000') into a (column, op, value) filter."""
+    match = _FILTER.match(text)
+    if not match:
+        raise ValueError(f"filter '{text}' is not of the form column<op>value")
+    return match.groups()
+
+
+def _as_number(value):
+    # A numeric-looking string as an int or float, anything else unchanged
+    if isinstance(value, str):
+        for convert in (int, float):
+            try:
+                return convert(value)
+            except ValueError:
+                pass
+    return value
+
+
+def build_query(dataset, columns=None, filters=None):
+    """
+    SQL and parameters for a dataset export. `columns` is a list of column names (default: all),
+    `filters` a list of (column, op, value) tuples that must all hold. Raises ValueError for names
+    the dataset doesn't have.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"unknown dataset '{dataset}' (choose from {', '.join(DATASETS)})")
+    spec = DATASETS[dataset]
+    available = spec["columns"]
+    columns = list(columns or available)
+    unknown = [name for name in columns + [f[0] for f in filters or []] if name not in available]
+    if unknown:
+        raise ValueError(f"{dataset} has no column {', '.join(unknown)} (columns: {', '.join(available)})")
+
+    conditions = []
+    params = []
+    for column, op, value in filters or []:
+        if op not in OPERATORS:
+            raise ValueError(f"unsupported operator '{op}'")
+        conditions.append(f"{available[column]} {op} ?")
+        # A table column's affinity converts the value itself, so text IDs keep their leading zeros;
+        # computed columns have none, so numbers are passed as numbers to compare numerically
+        params.append(value if _COLUMN_REF.match(available[column]) else _as_number(value))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    sql = f'''
+        SELECT {', '.join(f"{available[name]} AS {name}" for name in columns)}
+        FROM {spec["from"]}
+        {where}
+        ORDER BY {spec["order"]}
+    '''
+    return sql, params, columns
+
+
+def iter_rows(db, sql, params=(), batch_size=5000):
+    # Rows of a query, fetched a batch at a time on a cursor of its own
+    cursor = db.conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def with_progress(rows, every=100000, label="rows", out=sys.stderr):
+    # Pass rows through, reporting the count and rate every `every` rows
+    started = time.perf_counter()
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if every and count % every == 0:
+            elapsed = time.perf_counter() - started
+            print(f"  {count:,} {label} exported ({count / elapsed:,.0f}/sec)", file=out)
+
+
+def write_csv(rows, columns, stream):
+    writer = csv.writer(stream)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(rows, columns, stream):
+    count = 0
+    for row in rows:
+        stream.write(json.dumps(dict(zip(columns, row)), default=str))
+        stream.write("\n")
+        count += 1
+    return count
+
+
+WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
+
+
+def export(db, dataset, path, fmt=None, columns=None, filters=None, batch_size=5000, progress_every=100000):
+    """
+    Stream a dataset to `path` ('-' for stdout) as CSV or JSON Lines (default: from the file extension).
+    The file is written under a temporary name and renamed when complete.
+    Returns a summary dict with the row count, seconds and rows/sec.
+    """
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    if fmt not in WRITERS:
+        raise ValueError(f"unknown format '{fmt}' (choose from {', '.join(FORMATS)})")
+    sql, params, columns = build_query(dataset, columns, filters)
+    rows = with_progress(iter_rows(db, sql, params, batch_size), progress_every, dataset)
+
+    started = time.perf_counter()
+    if path == "-":
+        count = WRITERS[fmt](rows, columns, sys.stdout)
+        sys.stdout.flush()
+    else:
+        partial = path + ".part"
+        try:
+            with open(partial, "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER) as stream:
+                count = WRITERS[fmt](rows, columns, stream)
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+    elapsed = time.perf_counter() - started
+    return {
+        "dataset": dataset,
+        "path": path,
+        "format": fmt,
+        "rows": count,
+        "seconds": elapsed,
+        "rows_per_sec": count / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Export a dataset to CSV or JSON Lines.")
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("output", help="output file, or - for stdout")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the output file extension")
+    parser.add_argument("--columns", help="comma-separated columns to export (default: all)")
+    parser.add_argument("--where", action="append", default=[], metavar="FILTER",
+                        help="filter such as status=Active or premium>=1000; repeat to combine")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows fetched from the database at a time")
+    parser.add_argument("--progress-every", type=int, default=100000, help="rows between progress lines (0 for none)")
+    args = parser.parse_args()
+
+    # Status messages go to stderr so an export to stdout stays clean
+    db = DatabaseManager(args.db)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            db.connect()
+            run_migrations(db)
+        columns = [name.strip() for name in args.columns.split(",")] if args.columns else None
+        summary = export(db, args.dataset, args.output, args.format, columns,
+                         [parse_filter(text) for text in args.where], args.batch_size, args.progress_every)
+        print(f"Exported {summary['rows']:,} {args.dataset} rows to {summary['path']} in {summary['seconds']:.2f}s "
+              f"({summary['rows_per_sec']:,.0f} rows/sec)", file=sys.stderr)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+    finally:
+        with contextlib.redirect_stdout(sys.stderr):
+            db.close()
@@ -0,0 +1,267 @@
+import argparse
+import sqlite3
+
+# Per-policy claims exposure.
+# policy_exposure holds, for every purchased policy, the coverage amount, the total of its claims
+# that are pending or accepted (claimed), the total accepted (approved) and the number of claims.
+# Triggers on purchased_policy and claims keep it current, so coverage checks are single-row lookups.
+# Rejected claims do not use up coverage. Only claims filed against the policy's current term count:
+# a renewal starts the new term with its full coverage.
+
+# How much one claim row adds to each total
+CLAIMED = "CASE WHEN {row}.status = 'Rejected' THEN 0 ELSE COALESCE({row}.amount, 0) END"
+APPROVED = "CASE WHEN {row}.status = 'Accepted' THEN COALESCE({row}.amount, 0) ELSE 0 END"
+
+# A claim row counts if it is for the policy's current term, or there is no purchased policy
+CURRENT_TERM = '''{row}.term = COALESCE((SELECT term FROM purchased_policy
+                                         WHERE customer_id = {row}.customer_id AND policy_id = {row}.policy_id),
+                                        {row}.term)'''
+
+
+def _apply_claim(row, sign):
+    # Upsert that adds (sign=+1) or removes (sign=-1) one claim's contribution
+    return f'''
+        INSERT INTO policy_exposure (customer_id, policy_id, coverage_amount, total_claimed, total_approved,
+                                     claim_count)
+        SELECT {row}.customer_id, {row}.policy_id,
+               (SELECT coverage_amount FROM purchased_policy
+                WHERE customer_id = {row}.customer_id AND policy_id = {row}.policy_id),
+               {sign} * ({CLAIMED.format(row=row)}), {sign} * ({APPROVED.format(row=row)}), {sign}
+        WHERE {CURRENT_TERM.format(row=row)}
+        ON CONFLICT (customer_id, policy_id) DO UPDATE SET
+            total_claimed = total_claimed + excluded.total_claimed,
+            total_approved = total_approved + excluded.total_approved,
+            claim_count = claim_count + excluded.claim_count;
+    '''
+
+
+def _drop_orphan(row):
+    # Remove the row again once a policy that was never purchased has no claims left
+    return f'''
+        DELETE FROM policy_exposure
+        WHERE customer_id = {row}.customer_id AND policy_id = {row}.policy_id AND claim_count = 0
+          AND NOT EXISTS (SELECT 1 FROM purchased_policy
+                          WHERE customer_id = {row}.customer_id AND policy_id = {row}.policy_id);
+    '''
+
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS policy_exposure (
+        customer_id TEXT NOT NULL,
+        policy_id TEXT NOT NULL,
+        coverage_amount REAL,
+        total_claimed REAL NOT NULL DEFAULT 0,
+        total_approved REAL NOT NULL DEFAULT 0,
+        claim_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (customer_id, policy_id)
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_exposure_policy_insert
+    AFTER INSERT ON purchased_policy
+    BEGIN
+        INSERT INTO policy_exposure (customer_id, policy_id, coverage_amount)
+        VALUES (new.customer_id, new.policy_id, new.coverage_amount)
+        ON CONFLICT (customer_id, policy_id) DO UPDATE SET coverage_amount = excluded.coverage_amount;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_exposure_policy_coverage
+    AFTER UPDATE OF coverage_amount ON purchased_policy
+    BEGIN
+        UPDATE policy_exposure SET coverage_amount = new.coverage_amount
+        WHERE customer_id = new.customer_id AND policy_id = new.policy_id;
+    END
+    ''',
+    # A new term starts with none of its coverage used; claims are only ever filed against the current term
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_exposure_policy_term
+    AFTER UPDATE OF term ON purchased_policy
+    WHEN old.term IS NOT new.term
+    BEGIN
+        UPDATE policy_exposure SET total_claimed = 0, total_approved = 0, claim_count = 0
+        WHERE customer_id = new.customer_id AND policy_id = new.policy_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_exposure_policy_delete
+    AFTER DELETE ON purchased_policy
+    BEGIN
+        UPDATE policy_exposure SET coverage_amount = NULL
+        WHERE customer_id = old.customer_id AND policy_id = old.policy_id;
+        DELETE FROM policy_exposure
+        WHERE customer_id = old.customer_id AND policy_id = old.policy_id AND claim_count = 0;
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_exposure_claim_insert
+    AFTER INSERT ON claims
+    BEGIN
+        {_apply_claim("new", 1)}
+    END
+    ''',
+    # Lease and processed_date updates don't touch the totals, so only these columns fire it
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_exposure_claim_update
+    AFTER UPDATE OF status, amount, policy_id, customer_id, term ON claims
+    WHEN old.status IS NOT new.status OR old.amount IS NOT new.amount
+      OR old.policy_id IS NOT new.policy_id OR old.customer_id IS NOT new.customer_id
+      OR old.term IS NOT new.term
+    BEGIN
+        {_apply_claim("old", -1)}
+        {_drop_orphan("old")}
+        {_apply_claim("new", 1)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_exposure_claim_delete
+    AFTER DELETE ON claims
+    BEGIN
+        {_apply_claim("old", -1)}
+        {_drop_orphan("old")}
+    END
+    ''',
+]
+
+# The aggregate recomputed from scratch: one row per purchased policy or claimed policy
+RECOMPUTE_SQL = f'''
+    WITH claim_totals AS (
+        SELECT c.customer_id, c.policy_id,
+               SUM({CLAIMED.format(row="c")}) AS total_claimed,
+               SUM({APPROVED.format(row="c")}) AS total_approved,
+               COUNT(*) AS claim_count
+        FROM claims c
+        LEFT JOIN purchased_policy pp ON pp.customer_id = c.customer_id AND pp.policy_id = c.policy_id
+        WHERE c.term = COALESCE(pp.term, c.term)
+        GROUP BY c.customer_id, c.policy_id
+    ),
+    keys AS (
+        SELECT customer_id, policy_id FROM purchased_policy
+        UNION
+        SELECT customer_id, policy_id FROM claim_totals
+    )
+    SELECT k.customer_id, k.policy_id, pp.coverage_amount,
+           COALESCE(ct.total_claimed, 0), COALESCE(ct.total_approved, 0), COALESCE(ct.claim_count, 0)
+    FROM keys k
+    LEFT JOIN purchased_policy pp ON pp.customer_id = k.customer_id AND pp.policy_id = k.policy_id
+    LEFT JOIN claim_totals ct ON ct.customer_id = k.customer_id AND ct.policy_id = k.policy_id
+'''
+
+
+def create_exposure(cursor):
+    # Migration step: create the table. The triggers read policy and claim terms, so recreate_exposure
+    # adds them and fills the table once those columns exist.
+    cursor.execute(SCHEMA[0])
+
+
+def recreate_exposure(cursor):
+    # Migration step: replace the triggers with their current definitions, then refill the table
+    for statement in SCHEMA[1:]:
+        name = statement.split("IF NOT EXISTS", 1)[1].split()[0]
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(statement)
+    rebuild_exposure(cursor)
+
+
+def rebuild_exposure(cursor):
+    cursor.execute("DELETE FROM policy_exposure")
+    cursor.execute(f'''
+        INSERT INTO policy_exposure (customer_id, policy_id, coverage_amount, total_claimed, total_approved,
+                                     claim_count)
+        {RECOMPUTE_SQL}
+    ''')
+    return cursor.rowcount
+
+
+def verify_exposure(db, tolerance=0.005):
+    """
+    Compare policy_exposure with a full recompute.
+    Returns a list of (customer_id, policy_id, stored, recomputed) for rows that differ;
+    stored/recomputed are (coverage, claimed, approved, count) tuples or None when the row is missing.
+    """
+    db.cursor.execute(f'''
+        WITH fresh (customer_id, policy_id, coverage_amount, total_claimed, total_approved, claim_count) AS (
+            {RECOMPUTE_SQL}
+        ),
+        paired AS (
+            SELECT f.customer_id, f.policy_id,
+                   e.coverage_amount AS s_cov, e.total_claimed AS s_claimed,
+                   e.total_approved AS s_approved, e.claim_count AS s_count, e.policy_id IS NOT NULL AS s_found,
+                   f.coverage_amount AS f_cov, f.total_claimed AS f_claimed,
+                   f.total_approved AS f_approved, f.claim_count AS f_count, 1 AS f_found
+            FROM fresh f
+            LEFT JOIN policy_exposure e ON e.customer_id = f.customer_id AND e.policy_id = f.policy_id
+            UNION ALL
+            SELECT e.customer_id, e.policy_id,
+                   e.coverage_amount, e.total_claimed, e.total_approved, e.claim_count, 1,
+                   NULL, NULL, NULL, NULL, 0
+            FROM policy_exposure e
+            WHERE NOT EXISTS (SELECT 1 FROM fresh f
+                              WHERE f.customer_id = e.customer_id AND f.policy_id = e.policy_id)
+        )
+        SELECT * FROM paired
+        WHERE s_found != f_found
+           OR s_cov IS NOT f_cov
+           OR ABS(s_claimed - f_claimed) > ?
+           OR ABS(s_approved - f_approved) > ?
+           OR s_count != f_count
+    ''', (tolerance, tolerance))
+    mismatches = []
+    for row in db.cursor.fetchall():
+        stored = row[2:6] if row[6] else None
+        recomputed = row[7:11] if row[11] else None
+        mismatches.append((row[0], row[1], stored, recomputed))
+    return mismatches
+
+
+def get_exposure(db, customer_id, policy_id):
+    """
+    Exposure of one policy as a dict, or None if it has none recorded.
+    remaining_coverage is None when the policy has no coverage amount.
+    """
+    db.cursor.execute('''
+        SELECT coverage_amount, total_claimed, total_approved, claim_count
+        FROM policy_exposure
+        WHERE customer_id = ? AND policy_id = ?
+    ''', (customer_id, policy_id))
+    row = db.cursor.fetchone()
+    if not row:
+        return None
+    coverage, claimed, approved, count = row
+    return {
+        "coverage_amount": coverage,
+        "total_claimed": claimed,
+        "total_approved": approved,
+        "claim_count": count,
+        "remaining_coverage": coverage - claimed if coverage is not None else None,
+    }
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild the policy claims exposure aggregate.")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the whole table from claims")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        mismatches = verify_exposure(db)
+        print(f"{len(mismatches)} policies differ from a full recompute.")
+        for customer_id, policy_id, stored, recomputed in mismatches[:20]:
+            print(f"  {customer_id} {policy_id}: stored {stored}, recomputed {recomputed}")
+        if args.rebuild:
+            try:
+                rows = rebuild_exposure(db.cursor)
+                db.conn.commit()
+                print(f"Rebuilt exposure for {rows} policies.")
+            except sqlite3.Error as e:
+                db.conn.rollback()
+                print(f"Error rebuilding exposure: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+
+# Sequence name -> (table, id column, prefix, minimum digits)
+SEQUENCES = {
+    "customer": ("customers", "customer_id", "C", 2),
+    "agent": ("agents", "agent_id", "AG", 2),
+    "payment": ("payments", "payment_id", "PAYMENT", 3),
+    "claim": ("claims", "claim_id", "C", 2),
+    "policy_L": ("policy_package", "policy_id", "L", 3),
+    "policy_V": ("policy_package", "policy_id", "V", 3),
+    "policy_H": ("policy_package", "policy_id", "H", 3),
+    "policy_P": ("policy_package", "policy_id", "P", 3),
+    "policy_X": ("policy_package", "policy_id", "X", 3),
+}
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def get_allocator(db):
+    # One allocator per database file, shared by every connection and thread in the process
+    with _allocators_lock:
+        allocator = _allocators.get(db.db_name)
+        if allocator is None:
+            allocator = IdAllocator(db.db_name)
+            _allocators[db.db_name] = allocator
+        return allocator
+
+
+def format_id(name, number):
+    # Render a sequence number as an ID, e.g. ("payment", 7) -> "PAYMENT007"
+    _, _, prefix, width = SEQUENCES[name]
+    return f"{prefix}{number:0{width}d}"
+
+
+class IdAllocator:
+    """
+    Hands out IDs from the `id_sequences` table.
+    Numbers are reserved in blocks on a dedicated autocommit connection, so a
+    reserved block belongs to this process even if the caller rolls back, and
+    are then given out from memory.
+
+    If the caller's connection already holds an open transaction, a block cannot be
+    reserved on another connection without waiting on the caller's own write lock.
+    In that case a single number is reserved inside the caller's transaction instead,
+    so it is released again if that transaction rolls back.
+    """
+    def __init__(self, db_name, block_size=20):
+        self.db_name = db_name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._conn_lock = threading.Lock()
+        self._blocks = {}  # sequence name -> [next number, end (exclusive)]
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_name, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+        return self._conn
+
+    def _seed_sequence(self, cursor, name):
+        # First use of a sequence starts after the highest numeric ID already in the table
+        cursor.execute("SELECT 1 FROM id_sequences WHERE name = ?", (name,))
+        if cursor.fetchone():
+            return
+        table, column, prefix, _ = SEQUENCES[name]
+        cursor.execute(f'''
+            INSERT OR IGNORE INTO id_sequences (name, next_value)
+            SELECT ?, COALESCE(MAX(CAST(SUBSTR({column}, ?) AS INTEGER)), 0) + 1
+            FROM {table}
+            WHERE {column} GLOB ?
+        ''', (name, len(prefix) + 1, f"{prefix}[0-9]*"))
+
+    def _advance(self, cursor, name, count):
+        # Move the sequence forward by `count` and return the first number reserved
+        self._seed_sequence(cursor, name)
+        cursor.execute('''
+            UPDATE id_sequences SET next_value = next_value + ? WHERE name = ?
+        ''', (count, name))
+        cursor.execute("SELECT next_value FROM id_sequences WHERE name = ?", (name,))
+        return cursor.fetchone()[0] - count
+
+    def reserve(self, name, count, db=None):
+        """
+        Atomically reserve `count` consecutive numbers. Returns range(first, first + count).
+        Pass `db` when its connection may be inside a write transaction (e.g. a bulk load),
+        so the reservation joins that transaction instead of waiting on its lock.
+        """
+        if name not in SEQUENCES:
+            raise KeyError(f"Unknown ID sequence: {name}")
+        if db is not None and db.conn.in_transaction:
+            first = self._advance(db.cursor, name, count)
+            return range(first, first + count)
+        with self._conn_lock:
+            cursor = self._connection().cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                first = self._advance(cursor, name, count)
+                cursor.execute("COMMIT")
+            except sqlite3.Error:
+                cursor.execute("ROLLBACK")
+                raise
+        return range(first, first + count)
+
+    def reserve_ids(self, name, count, db=None):
+        # Reserve `count` IDs for a bulk insert, formatted and in ascending order
+        return [format_id(name, number) for number in self.reserve(name, count, db)]
+
+    def next_number(self, db, name):
+        with self._lock:
+            block = self._blocks.get(name)
+            if block and block[0] < block[1]:
+                number = block[0]
+                block[0] += 1
+                return number
+
+        if db.conn.in_transaction:
+            return self.reserve(name, 1, db).start
+
+        numbers = self.reserve(name, self.block_size)
+        with self._lock:
+            self._blocks[name] = [numbers.start + 1, numbers.stop]
+        return numbers.start
+
+    def next_id(self, db, name):
+        """Return the next formatted ID for sequence `name`, e.g. 'C04' for 'customer'."""
+        return format_id(name, self.next_number(db, name))
+
+    def close(self):
+        with self._conn_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        with self._lock:
+            self._blocks.clear()
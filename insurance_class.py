@@ -1,5 +1,7 @@
 from enum import Enum
 from datetime import datetime
+from id_allocator import get_allocator
+from rate_tables import current_rates
 
 class PolicyType(Enum):
     LIFE = "LIFE"
@@ -28,33 +30,44 @@ def generate_policy_id(db, policy_type):
     }
 
     prefix = prefix_map.get(policy_type, 'X')
-
-    try:
-        # Get the last policy ID for this type
-        db.cursor.execute("""
-            SELECT policy_id FROM policy_package 
-            WHERE policy_id LIKE ? 
-            ORDER BY policy_id DESC LIMIT 1
-        """, (f'{prefix}%',))
-
-        result = db.cursor.fetchone()
-
-        if result:
-            last_id = result[0]
-            # Extract the number part and increment
-            last_number = int(last_id[1:])
-            new_number = last_number + 1
-        else:
-            # If no existing policies of this type, start with 1
-            new_number = 1
-
-        # Format the new policy ID with leading zeros (4 digits)
-        return f"{prefix}{new_number:03d}"
-
-    except Exception as e:
-        print(f"Error generating policy ID: {e}")
-        # Fallback ID in case of error
-        return f"{prefix}{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    return get_allocator(db).next_id(db, f"policy_{prefix}")
+
+def rating_version():
+    # Version of the rate table currently used for pricing
+    return current_rates().version
+
+# Rating inputs per policy type, in the order batch_rating.rate_batch expects them
+RATING_COLUMNS = {
+    PolicyType.LIFE.value: ("age", "coverage_amount", "medical_history"),
+    PolicyType.VEHICLE.value: ("vehicle_value", "vehicle_age"),
+    PolicyType.HEALTH.value: ("age", "coverage_amount", "coverage_type", "medical_history"),
+    PolicyType.PROPERTY.value: ("property_value", "property_age", "property_type"),
+}
+
+def calculate_premium(policy_type, coverage_amount=0, age=None, medical_history="None", vehicle_value=None,
+                      vehicle_age=None, coverage_type="BASIC", property_type="", property_value=None,
+                      property_age=None, rates=None):
+    """
+    Rate a single policy from its inputs by building the insurance object and
+    calling its premium method, the same way create_custom_policy does.
+    Pass `rates` to price with a specific CompiledRates instead of the current one.
+    """
+    if policy_type == PolicyType.LIFE.value:
+        insurance = LifeInsurance("CUSTOM", coverage_amount, 0, None, None, None, "", coverage_amount,
+                                  medical_history)
+        return insurance.calculate_life_premium(age, coverage_amount, rates)
+    elif policy_type == PolicyType.VEHICLE.value:
+        insurance = VehicleInsurance("CUSTOM", coverage_amount, 0, None, None, None,
+                                     {'value': vehicle_value, 'age': vehicle_age}, True)
+        return insurance.calculate_vehicle_premium(vehicle_value, vehicle_age, rates)
+    elif policy_type == PolicyType.HEALTH.value:
+        insurance = HealthInsurance("CUSTOM", coverage_amount, 0, None, None, None, coverage_type, 0, 0)
+        return insurance.calculate_health_premium(age, medical_history, rates)
+    elif policy_type == PolicyType.PROPERTY.value:
+        insurance = PropertyInsurance("CUSTOM", coverage_amount, 0, None, None, None, "", property_value,
+                                      property_type)
+        return insurance.calculate_property_premium(property_value, property_age, rates)
+    raise ValueError(f"Unknown policy type: {policy_type}")
 
 class Insurance:
     def __init__(self, policy_type, policy_plan, coverage_amount, premium, start_date, end_date, status):
@@ -67,6 +80,8 @@ class Insurance:
         self.status = status
         # policy_id will be set when saving to database
         self.policy_id = None
+        # Rate table version of the last premium calculated for this policy
+        self.rate_version = None
 
     def update_policy(self, db_manager, updates):
         """Update policy details in the database"""
@@ -103,12 +118,6 @@ class Insurance:
                 WHERE policy_id = ?
             """, (self.policy_id,))
 
-            db_manager.cursor.execute("""
-                UPDATE purchased_policy 
-                SET status = 'Cancelled'
-                WHERE policy_id = ?
-            """, (self.policy_id,))
-
             db_manager.conn.commit()
             self.status = 'Cancelled'
             return True
@@ -124,22 +133,24 @@ class LifeInsurance(Insurance):
         self.death_benefit = death_benefit
         self.medical_history = medical_history
 
-    def calculate_life_premium(self, age, coverage_amount):
+    def calculate_life_premium(self, age, coverage_amount, rates=None):
         # Calculate life insurance premium based on age and coverage amount
-        # Base monthly rate per RM1000 of coverage for a 25-year-old
-        base_rate = 0.15  # RM0.15 per RM1000 of coverage per month
+        rates = rates or current_rates()
+        self.rate_version = rates.version
+        life = rates.life
 
-        # Age factor (increases as age increases)
-        # At age 25, factor should be close to 1.0
-        age_factor = 1 + ((age - 25) * 0.04)  # 4% increase for each year above 25
-        if age < 25:
-            age_factor = max(0.8, 1 - ((25 - age) * 0.02))  # 2% decrease for each year below 25, minimum 0.8
+        # Base monthly rate per RM1000 of coverage for a person at the base age
+        base_rate = life.base_rate
+
+        # Age factor (increases above the base age, discounted below it down to a floor)
+        age_factor = rates.life_age_factor(age)
 
         # Coverage factor (slight increase for higher coverage amounts)
-        coverage_factor = 1 + (coverage_amount / 1000000) * 0.1
+        coverage_factor = 1 + (coverage_amount / life.coverage_divisor) * life.coverage_slope
 
         # Medical history factor (already handled in the class)
-        medical_factor = 1.0 if not hasattr(self, 'medical_history') or self.medical_history.lower() == 'none' else 1.5
+        medical_factor = 1.0 if not hasattr(self, 'medical_history') or not rates.has_condition(self.medical_history) \
+            else life.medical_loading
 
         # Calculate monthly premium
         monthly_premium = (coverage_amount / 1000) * base_rate * age_factor * coverage_factor * medical_factor
@@ -156,14 +167,16 @@ class VehicleInsurance(Insurance):
         self.vehicle_details = vehicle_details
         self.accident_coverage = accident_coverage
 
-    def calculate_vehicle_premium(self, vehicle_value, vehicle_age):
+    def calculate_vehicle_premium(self, vehicle_value, vehicle_age, rates=None):
         # Calculate premium based on vehicle value and age
-        # Base rate of 5% of vehicle value
-        base_rate = 0.05
+        rates = rates or current_rates()
+        self.rate_version = rates.version
+        # Base rate as a share of vehicle value
+        base_rate = rates.vehicle.base_rate
         # Age factor - increases premium for older vehicles
-        age_factor = 1 + (vehicle_age * 0.1)  # 10% increase per year
+        age_factor = rates.vehicle_age_factor(vehicle_age)
         # Value factor - higher rates for more expensive vehicles
-        value_factor = 1 + (vehicle_value / 100000)  # Increases with vehicle value
+        value_factor = 1 + (vehicle_value / rates.vehicle.value_divisor)
 
         annual_premium = vehicle_value * base_rate * age_factor * value_factor
         return round(annual_premium, 2)
@@ -191,27 +204,24 @@ class PropertyInsurance(Insurance):
         self.property_value = property_value
         self.property_type = property_type
 
-    def calculate_property_premium(self, property_value, property_age):
+    def calculate_property_premium(self, property_value, property_age, rates=None):
         # Calculate premium based on property value and age
-        # Base rate of 0.3% of property value
-        base_rate = 0.003
+        rates = rates or current_rates()
+        self.rate_version = rates.version
+        # Base rate as a share of property value
+        base_rate = rates.property.base_rate
         # Age factor increases with property age
-        age_factor = 1 + (property_age * 0.015)  # 1.5% increase per year
+        age_factor = rates.property_age_factor(property_age)
         # Value factor for expensive properties
-        value_factor = 1 + (property_value / 1000000)
-        risk_factor = self._calculate_risk_factor()
+        value_factor = 1 + (property_value / rates.property.value_divisor)
+        risk_factor = self._calculate_risk_factor(rates)
 
         annual_premium = property_value * base_rate * age_factor * value_factor * risk_factor
         return round(annual_premium, 2)
 
-    def _calculate_risk_factor(self):
-        # Calculate risk factor based on property type
-        risk_factors = {
-            'residential': 1.0,
-            'commercial': 1.2,
-            'industrial': 1.5
-        }
-        return risk_factors.get(self.property_type.lower(), 1.0)
+    def _calculate_risk_factor(self, rates=None):
+        # Calculate risk factor based on property type (residential, commercial, industrial)
+        return (rates or current_rates()).property_risk_factor(self.property_type)
 
 class HealthInsurance(Insurance):
     def __init__(self, policy_plan, coverage_amount, premium, start_date, end_date, status,
@@ -222,33 +232,29 @@ class HealthInsurance(Insurance):
         self.deductible = deductible
         self.copayment = copayment
 
-        # Define valid coverage types and their multipliers
-        self.coverage_multipliers = {
-            'BASIC': 1.0,  # Basic coverage (standard multiplier)
-            'COMPREHENSIVE': 1.5,  # Comprehensive coverage (50% premium increase)
-            'FAMILY': 2.0,  # Family coverage (100% premium increase)
-            'INDIVIDUAL': 0.8,  # Individual coverage (20% discount)
-            'HOSPITAL': 1.2,  # Hospital-only coverage (20% premium increase)
-            'OUTPATIENT': 1.1,  # Outpatient coverage (10% premium increase)
-            'SPECIALIST': 1.3  # Specialist coverage (30% premium increase)
-        }
+    @property
+    def coverage_multipliers(self):
+        # Valid coverage types and their multipliers, from the current rate table
+        return current_rates().health_coverage
 
-    def calculate_health_premium(self, age, medical_history="None"):
+    def calculate_health_premium(self, age, medical_history="None", rates=None):
         # Calculate premium based on age, medical history, and coverage type
-        # Base rate of 3% per RM1000 of coverage
-        base_rate = 0.03
+        rates = rates or current_rates()
+        self.rate_version = rates.version
+        # Base rate per RM1000 of coverage
+        base_rate = rates.health.base_rate
 
-        # Age factor increases exponentially with age
-        age_factor = 1 + (age * 0.025)  # 2.5% increase per year of age
+        # Age factor increases with age
+        age_factor = rates.health_age_factor(age)
 
         # Coverage factor based on total coverage amount
-        coverage_factor = 1 + (self.coverage_amount / 100000)
+        coverage_factor = 1 + (self.coverage_amount / rates.health.coverage_divisor)
 
         # Risk factor based on medical history
-        risk_factor = self._calculate_risk_factor(medical_history)
+        risk_factor = self._calculate_risk_factor(medical_history, rates)
 
         # Coverage type factor
-        coverage_type_factor = self.coverage_multipliers.get(self.coverage_type, 1.0)
+        coverage_type_factor = rates.health_coverage_factor(self.coverage_type)
 
         # Calculate annual premium with all factors
         annual_premium = (
@@ -262,11 +268,12 @@ class HealthInsurance(Insurance):
 
         return round(annual_premium, 2)
 
-    def _calculate_risk_factor(self, medical_history):
-        # Calculate risk factor based on medical history
-        if medical_history.lower() == "none":
+    def _calculate_risk_factor(self, medical_history, rates=None):
+        # Calculate risk factor based on medical history (loading for pre-existing conditions)
+        rates = rates or current_rates()
+        if not rates.has_condition(medical_history):
             return 1.0
-        return 1.8  # 80% increase for pre-existing conditions
+        return rates.health.medical_loading
 
     def get_coverage_description(self):
         # Return a description of what the coverage type includes
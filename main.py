@@ -1,10 +1,13 @@
 from datetime import date
 from enum import Enum
 from database_setup import sqlite3, DatabaseManager
+from migrations import run_migrations
+from rate_tables import load_rates
 from customer import manage_customer_profile, file_claim, generate_customer_id, choose_insurance, validate_custom_policy,\
     view_status, make_payment, generate_payment_id, cancel_policy
 from insurance_class import PolicyPlan, PolicyType, generate_policy_id, Insurance, LifeInsurance, VehicleInsurance, PropertyInsurance, HealthInsurance
-from admin import manage_agents, generate_reports, process_claims_approval, review_policies, validate_custom_policy
+from admin import manage_agents, generate_reports, process_claims_approval, review_policies, validate_custom_policy, \
+    auto_adjudicate_claims, run_commission_payroll, view_performance_cube
 from agent import manage_agent_profile, manage_policies, calculate_commission, view_sales_report, generate_agent_id
 
 class PaymentMethod(Enum):
@@ -182,7 +185,10 @@ def admin_menu(db, nric):
         print("[3] Process Claims Approval")
         print("[4] Review Policies")
         print("[5] Validate Custom Policy")
-        print("[6] Log Out")
+        print("[6] Auto-Adjudicate Claims")
+        print("[7] Commission Payroll")
+        print("[8] Performance Cube")
+        print("[9] Log Out")
         choice = input("Enter your choice: ")
 
         if choice == "1":
@@ -190,12 +196,18 @@ def admin_menu(db, nric):
         elif choice == "2":
             Administrator.generate_reports(db)
         elif choice == "3":
-            Administrator.process_claims_approval(db)
+            Administrator.process_claims_approval(db, nric)
         elif choice == "4":
             Administrator.review_policies(db)
         elif choice == "5":
             Administrator.validate_custom_policy(db)
         elif choice == "6":
+            Administrator.auto_adjudicate_claims(db, nric)
+        elif choice == "7":
+            Administrator.run_commission_payroll(db)
+        elif choice == "8":
+            Administrator.view_performance_cube(db)
+        elif choice == "9":
             print("Logging out...")
             break
         else:
@@ -290,8 +302,8 @@ class Administrator(User):
     def generate_reports(db):
         generate_reports(db)
 
-    def process_claims_approval(db):
-        process_claims_approval(db)
+    def process_claims_approval(db, nric):
+        process_claims_approval(db, nric)
 
     def review_policies(db):
         review_policies(db)
@@ -299,32 +311,49 @@ class Administrator(User):
     def validate_custom_policy(db):
         validate_custom_policy(db)
 
-# Connect to Database
-db = DatabaseManager()
-db.connect()
+    def auto_adjudicate_claims(db, nric):
+        auto_adjudicate_claims(db, nric)
 
-while True:
-    # Welcome page
-    print("\n===============[ Welcome To Insurance4You ]===============")
-    print("[1] Register \n[2] Login \n[3] Exit")
-    choice = input("Enter choice: ")
-    try:
-        if choice == '1': # Register user
-            User.register(db)
-        elif choice == '2': # Login user
-            User.login(db)
-        elif choice == '3':
-            print("Thank you for using Insurance4You. Goodbye!")
-            db.close()
-            break
-        else:
-            print("Invalid choice. Please try again.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
-
-        # Optional: Ask if user wants to continue
-        continue_choice = input("\nWould you like to return to main menu? (y/n): ")
-        if continue_choice.lower() != 'y':
-            print("Thank you for using Insurance4You. Goodbye!")
-            db.close()
-            break
\ No newline at end of file
+    def run_commission_payroll(db):
+        run_commission_payroll(db)
+
+    def view_performance_cube(db):
+        view_performance_cube(db)
+
+# ===================================================== Entry Point =====================================================
+def main():
+    # Connect to Database
+    db = DatabaseManager()
+    db.connect()
+    run_migrations(db)
+    load_rates(db)
+
+    while True:
+        # Welcome page
+        print("\n===============[ Welcome To Insurance4You ]===============")
+        print("[1] Register \n[2] Login \n[3] Exit")
+        choice = input("Enter choice: ")
+        try:
+            if choice == '1': # Register user
+                User.register(db)
+            elif choice == '2': # Login user
+                User.login(db)
+            elif choice == '3':
+                print("Thank you for using Insurance4You. Goodbye!")
+                db.close()
+                break
+            else:
+                print("Invalid choice. Please try again.")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+
+            # Optional: Ask if user wants to continue
+            continue_choice = input("\nWould you like to return to main menu? (y/n): ")
+            if continue_choice.lower() != 'y':
+                print("Thank you for using Insurance4You. Goodbye!")
+                db.close()
+                break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import sqlite3
+import time
+
+from commission_ledger import add_effective_dates, create_commission_ledger
+from exposure import create_exposure, recreate_exposure
+from outbox import create_outbox
+from performance_cube import create_cube, recreate_cube_triggers, recreate_dirty_keys
+from rate_tables import seed_default_rates
+from report_cache import create_table_versions
+from sales_summary import create_sales_summary, fix_policy_agent_ids, recreate_sales_triggers
+
+# Ordered list of schema migrations: (version, description, steps).
+# A step is either an SQL statement or a function taking the cursor.
+# Each migration runs in its own transaction and is recorded in `schema_version`.
+MIGRATIONS = [
+    (1, "Indexes for hot query paths", [
+        # calculate_commission, view_sales_report, generate_reports
+        "CREATE INDEX IF NOT EXISTS idx_purchased_policy_agent ON purchased_policy (agent_id)",
+        # process_claims_approval
+        "CREATE INDEX IF NOT EXISTS idx_claims_status ON claims (status)",
+        # validate_custom_policy
+        "CREATE INDEX IF NOT EXISTS idx_custom_policy_status ON custom_policy (status)",
+        # make_payment anti-join on completed payments
+        "CREATE INDEX IF NOT EXISTS idx_payments_policy_status ON payments (policy_id, status)",
+    ]),
+    (2, "ID sequence table", [
+        # Rows are created on first use by id_allocator, starting after the highest existing ID
+        '''
+        CREATE TABLE IF NOT EXISTS id_sequences (
+            name TEXT PRIMARY KEY,
+            next_value INTEGER NOT NULL
+        )
+        ''',
+    ]),
+    (3, "Rate tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS rate_table_versions (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            is_active INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS rate_factors (
+            version INTEGER NOT NULL,
+            factor_group TEXT NOT NULL,
+            factor_key TEXT NOT NULL,
+            value REAL NOT NULL,
+            PRIMARY KEY (version, factor_group, factor_key),
+            FOREIGN KEY (version) REFERENCES rate_table_versions (version)
+        )
+        ''',
+        # Version 1 holds the factors that used to be hard-coded in insurance_class
+        seed_default_rates,
+        # Rate table version each custom policy premium was priced under
+        "ALTER TABLE custom_policy ADD COLUMN rate_version INTEGER",
+    ]),
+    (4, "Job checkpoints", [
+        # Progress of resumable batch jobs, committed together with each chunk of work
+        '''
+        CREATE TABLE IF NOT EXISTS job_checkpoints (
+            job_name TEXT PRIMARY KEY,
+            last_key TEXT,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            rate_version INTEGER,
+            status TEXT NOT NULL DEFAULT 'running',
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Re-rating looks custom policies up by policy_id alone
+        "CREATE INDEX IF NOT EXISTS idx_custom_policy_policy ON custom_policy (policy_id)",
+    ]),
+    (5, "Claim leases", [
+        # Adjuster currently holding a pending claim, and when that lease runs out
+        "ALTER TABLE claims ADD COLUMN leased_by TEXT",
+        "ALTER TABLE claims ADD COLUMN lease_expires_at DATETIME",
+        # claim_queue hands out pending claims largest and oldest first
+        "CREATE INDEX IF NOT EXISTS idx_claims_queue ON claims (status, amount DESC, date_filed)",
+        "CREATE INDEX IF NOT EXISTS idx_claims_leased_by ON claims (leased_by)",
+    ]),
+    (6, "Policy claims exposure", [
+        # Table, maintaining triggers and a backfill from the existing claims
+        create_exposure,
+    ]),
+    (7, "Billing indexes", [
+        # Unpaid-policy anti-join matches payments on both policy and customer:
+        # prepared plans share a policy_id across every customer who bought them
+        "CREATE INDEX IF NOT EXISTS idx_payments_policy_customer ON payments (policy_id, customer_id, status)",
+        "DROP INDEX IF EXISTS idx_payments_policy_status",
+        # Billing walks 'Accepted' policies in (customer_id, policy_id) order
+        "CREATE INDEX IF NOT EXISTS idx_purchased_policy_status ON purchased_policy (status, customer_id, policy_id)",
+    ]),
+    (8, "Payment provider references", [
+        # Settlement files identify each payment by the provider's reference; unique so reapplying is a no-op
+        "ALTER TABLE payments ADD COLUMN provider_reference TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_payments_provider_reference ON payments (provider_reference)",
+    ]),
+    (9, "Agent sales summary", [
+        # Policies bought from a prepared plan were credited to the agent's NRIC instead of the agent ID
+        fix_policy_agent_ids,
+        create_sales_summary,
+    ]),
+    (10, "Commission ledger", [
+        create_commission_ledger,
+    ]),
+    (11, "Sales summary triggers without IN lists", [
+        # Superseded by the term-aware triggers of migration 20
+    ]),
+    (12, "Keyset pagination indexes", [
+        # An agent's policies are paged in (customer_id, policy_id) order after the agent_id seek
+        "CREATE INDEX IF NOT EXISTS idx_purchased_policy_agent_key ON purchased_policy (agent_id, customer_id, policy_id)",
+        "DROP INDEX IF EXISTS idx_purchased_policy_agent",
+    ]),
+    (13, "Table change counters", [
+        # Bumped by triggers on every write; the report cache checks them before serving a result
+        create_table_versions,
+    ]),
+    (14, "Agent performance cube", [
+        # Cells by agent, month, policy type and plan, refreshed from a log of changed cells
+        create_cube,
+    ]),
+    (15, "Policy expiry indexes", [
+        # The expiry sweeper seeks in-force statuses by end date
+        "CREATE INDEX IF NOT EXISTS idx_purchased_policy_status_end ON purchased_policy (status, end_date)",
+        "CREATE INDEX IF NOT EXISTS idx_custom_policy_status_end ON custom_policy (status, end_date)",
+        # Covered by the new index, which leads with status
+        "DROP INDEX IF EXISTS idx_custom_policy_status",
+    ]),
+    (16, "Policy terms", [
+        # Renewals start a new term on the same policy; payments are matched to the term they pay for
+        "ALTER TABLE purchased_policy ADD COLUMN term INTEGER NOT NULL DEFAULT 1",
+        "ALTER TABLE payments ADD COLUMN term INTEGER NOT NULL DEFAULT 1",
+        # Terms a renewal has closed
+        '''
+        CREATE TABLE IF NOT EXISTS policy_terms (
+            customer_id TEXT NOT NULL,
+            policy_id TEXT NOT NULL,
+            term INTEGER NOT NULL,
+            agent_id TEXT,
+            policy_type TEXT,
+            policy_plan TEXT,
+            coverage_amount INTEGER,
+            premium INTEGER,
+            status TEXT,
+            start_date DATE,
+            end_date DATE,
+            renewed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (customer_id, policy_id, term)
+        )
+        ''',
+    ]),
+    (17, "Transition outbox", [
+        # Events from here on; rows already in the tables have no creation event
+        create_outbox,
+    ]),
+    (18, "Claims by policy term", [
+        # Exposure only counts the claims of a policy's current term, so a renewal restores its coverage
+        "ALTER TABLE claims ADD COLUMN term INTEGER NOT NULL DEFAULT 1",
+        # Claims filed since a renewal belong to the term they were filed in
+        '''
+        UPDATE claims
+        SET term = 1 + (SELECT COUNT(*) FROM policy_terms t
+                        WHERE t.customer_id = claims.customer_id AND t.policy_id = claims.policy_id
+                          AND t.end_date <= date(claims.date_filed))
+        WHERE EXISTS (SELECT 1 FROM policy_terms t
+                      WHERE t.customer_id = claims.customer_id AND t.policy_id = claims.policy_id)
+        ''',
+        recreate_exposure,
+        # The cube's claim totals come from the exposure; migration 20 rebuilds it
+    ]),
+    (19, "Cube change log without reused sequence numbers", [
+        recreate_dirty_keys,
+    ]),
+    (20, "Sales by policy term", [
+        # Start of the current term; the first term starts on start_date
+        "ALTER TABLE purchased_policy ADD COLUMN term_start DATE",
+        '''
+        UPDATE purchased_policy
+        SET term_start = (SELECT MAX(t.end_date) FROM policy_terms t
+                          WHERE t.customer_id = purchased_policy.customer_id
+                            AND t.policy_id = purchased_policy.policy_id)
+        WHERE term > 1
+        ''',
+        # Every term is a sale in the month it started, so a renewal no longer rewrites its first term's month
+        recreate_sales_triggers,
+        recreate_cube_triggers,
+    ]),
+    (21, "Commission by payment date", [
+        # Yearly commission is reported by the date of the payment it was earned on, not when it was posted
+        "ALTER TABLE commission_ledger ADD COLUMN effective_date DATETIME",
+        add_effective_dates,
+    ]),
+]
+
+
+def ensure_version_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            duration_ms REAL
+        )
+    ''')
+
+
+def current_version(db):
+    """Return the highest applied migration version (0 for a database that has none)."""
+    ensure_version_table(db.cursor)
+    db.cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return db.cursor.fetchone()[0]
+
+
+def run_migrations(db, target=None):
+    """
+    Apply every migration newer than the database's recorded version, up to `target`.
+    Works on existing databases in place. Returns a list of (version, description, seconds).
+    """
+    if getattr(db, "pool", None) is not None:
+        # A pooled DatabaseManager migrates through a checked-out connection
+        with db.session() as session:
+            return run_migrations(session, target)
+
+    applied = []
+    version = current_version(db)
+    db.conn.commit()
+
+    for migration_version, description, steps in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        if target is not None and migration_version > target:
+            break
+
+        started = time.perf_counter()
+        try:
+            db.cursor.execute("BEGIN")
+            for step in steps:
+                if callable(step):
+                    step(db.cursor)
+                else:
+                    db.cursor.execute(step)
+            elapsed = time.perf_counter() - started
+            db.cursor.execute('''
+                INSERT INTO schema_version (version, description, duration_ms)
+                VALUES (?, ?, ?)
+            ''', (migration_version, description, elapsed * 1000))
+            db.conn.commit()
+        except sqlite3.Error as e:
+            db.conn.rollback()
+            print(f"Migration {migration_version} ({description}) failed: {e}")
+            raise
+
+        applied.append((migration_version, description, elapsed))
+        print(f"Applied migration {migration_version} ({description}) in {elapsed * 1000:.1f} ms")
+
+    return applied
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+
+    db = DatabaseManager()
+    try:
+        db.connect()
+        run_migrations(db)
+        print(f"Schema version: {current_version(db)}")
+    finally:
+        db.close()
@@ -0,0 +1,267 @@
+import argparse
+import sqlite3
+import time
+
+# Transactional outbox of policy, claim and payment state transitions.
+# Triggers on purchased_policy, custom_policy, claims and payments append an event to outbox_events
+# whenever a row is created, deleted or changes status, inside the transaction that made the change,
+# whichever code path made it. seq is AUTOINCREMENT and SQLite has a single writer, so sequence
+# numbers are never reused and become visible in order. Consumers read the events after their own
+# position a batch at a time and record the new position in outbox_consumers once a batch is handled.
+# Events are never updated, and only events every consumer has moved past can be pruned.
+
+EVENT_COLUMNS = ("seq", "entity", "event", "customer_id", "policy_id", "entity_id", "old_status", "new_status",
+                 "created_at")
+CREATED = "created"
+STATUS_CHANGED = "status_changed"
+DELETED = "deleted"
+
+# Tables whose transitions are recorded -> the column identifying a row beyond (customer_id, policy_id)
+ENTITIES = {
+    "purchased_policy": None,
+    "custom_policy": None,
+    "claims": "claim_id",
+    "payments": "payment_id",
+}
+
+
+def _event(table, event, row, old_status, new_status):
+    entity_id = f"{row}.{ENTITIES[table]}" if ENTITIES[table] else "NULL"
+    return f'''
+        INSERT INTO outbox_events (entity, event, customer_id, policy_id, entity_id, old_status, new_status)
+        VALUES ('{table}', '{event}', {row}.customer_id, {row}.policy_id, {entity_id}, {old_status}, {new_status});
+    '''
+
+
+def _event_triggers(table):
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_outbox_{table}_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            {_event(table, CREATED, "new", "NULL", "new.status")}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_outbox_{table}_update
+        AFTER UPDATE OF status ON {table}
+        WHEN old.status IS NOT new.status
+        BEGIN
+            {_event(table, STATUS_CHANGED, "new", "old.status", "new.status")}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_outbox_{table}_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            {_event(table, DELETED, "old", "old.status", "NULL")}
+        END
+        ''',
+    ]
+
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS outbox_events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        entity TEXT NOT NULL,
+        event TEXT NOT NULL,
+        customer_id TEXT,
+        policy_id TEXT,
+        entity_id TEXT,
+        old_status TEXT,
+        new_status TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS outbox_consumers (
+        consumer TEXT PRIMARY KEY,
+        last_seq INTEGER NOT NULL DEFAULT 0,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_outbox_events_no_update
+    BEFORE UPDATE ON outbox_events
+    BEGIN
+        SELECT RAISE(ABORT, 'outbox_events is append-only');
+    END
+    ''',
+    # Pruning may only remove events that every consumer has already read
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_outbox_events_no_unread_delete
+    BEFORE DELETE ON outbox_events
+    WHEN old.seq > (SELECT COALESCE(MIN(last_seq), 0) FROM outbox_consumers)
+    BEGIN
+        SELECT RAISE(ABORT, 'outbox event not yet read by every consumer');
+    END
+    ''',
+] + [statement for table in ENTITIES for statement in _event_triggers(table)]
+
+
+def create_outbox(cursor):
+    # Migration step: the event log, consumer positions and the triggers that record transitions
+    for statement in SCHEMA:
+        cursor.execute(statement)
+
+
+# Last sequence number handed out, which pruning doesn't lower
+_LATEST_SEQ = "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'outbox_events'), 0)"
+
+
+def latest_seq(db):
+    db.cursor.execute(_LATEST_SEQ)
+    return db.cursor.fetchone()[0]
+
+
+def read_events(db, after_seq=0, limit=500, entities=None):
+    """
+    Up to `limit` events after sequence number `after_seq`, oldest first, optionally only for the
+    tables in `entities`. Rows are tuples in EVENT_COLUMNS order.
+    """
+    conditions = ["seq > ?"]
+    params = [after_seq]
+    if entities:
+        unknown = [entity for entity in entities if entity not in ENTITIES]
+        if unknown:
+            raise ValueError(f"unknown entity {', '.join(unknown)} (choose from {', '.join(ENTITIES)})")
+        conditions.append(f"entity IN ({', '.join('?' * len(entities))})")
+        params.extend(entities)
+    db.cursor.execute(f'''
+        SELECT {', '.join(EVENT_COLUMNS)}
+        FROM outbox_events
+        WHERE {' AND '.join(conditions)}
+        ORDER BY seq
+        LIMIT ?
+    ''', params + [limit])
+    return db.cursor.fetchall()
+
+
+def consumer_position(db, consumer):
+    # Sequence number of the last event `consumer` has handled (0 for a new consumer)
+    db.cursor.execute("SELECT last_seq FROM outbox_consumers WHERE consumer = ?", (consumer,))
+    row = db.cursor.fetchone()
+    return row[0] if row else 0
+
+
+def save_position(db, consumer, seq):
+    # Record `consumer`'s position inside the caller's transaction; it never moves backwards
+    db.cursor.execute('''
+        INSERT INTO outbox_consumers (consumer, last_seq, updated_at)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (consumer) DO UPDATE SET
+            last_seq = MAX(last_seq, excluded.last_seq),
+            updated_at = excluded.updated_at
+    ''', (consumer, seq))
+
+
+def consume(db, consumer, handler, batch_size=500, entities=None, max_batches=None):
+    """
+    Pass the events after `consumer`'s position to handler(events) a batch at a time, saving the
+    position after each batch. The position is committed together with whatever the handler wrote
+    through `db`, so a database consumer sees each event exactly once; anything else may see the
+    last batch again after a crash. Returns a summary dict.
+    """
+    position = consumer_position(db, consumer)
+    # Everything up to here is already committed, so events skipped by the entity filter can be passed over
+    high = latest_seq(db)
+    db.conn.commit()
+    handled = batches = 0
+    started = time.perf_counter()
+    try:
+        while max_batches is None or batches < max_batches:
+            events = read_events(db, position, batch_size, entities)
+            if events:
+                handler(events)
+                position = events[-1][0]
+                handled += len(events)
+                batches += 1
+            if len(events) < batch_size:
+                position = max(position, high)
+            save_position(db, consumer, position)
+            db.conn.commit()
+            if len(events) < batch_size:
+                break
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+    elapsed = time.perf_counter() - started
+    return {
+        "consumer": consumer,
+        "events": handled,
+        "batches": batches,
+        "position": position,
+        "seconds": elapsed,
+        "events_per_sec": handled / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def consumer_lag(db):
+    # (consumer, position, events behind, last update) for every registered consumer
+    db.cursor.execute(f'''
+        SELECT c.consumer, c.last_seq, ({_LATEST_SEQ}) - c.last_seq, c.updated_at
+        FROM outbox_consumers c
+        ORDER BY c.consumer
+    ''')
+    return db.cursor.fetchall()
+
+
+def prune_events(db):
+    # Delete the events every consumer has read. Returns the number deleted.
+    try:
+        db.cursor.execute('''
+            DELETE FROM outbox_events
+            WHERE seq <= (SELECT MIN(last_seq) FROM outbox_consumers)
+        ''')
+        deleted = db.cursor.rowcount
+        db.conn.commit()
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+    return deleted
+
+
+def print_events(events):
+    for seq, entity, event, customer_id, policy_id, entity_id, old_status, new_status, created_at in events:
+        subject = f"{entity} {customer_id}/{policy_id}" + (f" {entity_id}" if entity_id else "")
+        change = f"{old_status or '-'} -> {new_status or '-'}"
+        print(f"{seq:>10}  {created_at}  {event:<15}{subject:<50}{change}")
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Read the outbox of policy, claim and payment transitions.")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--consume", metavar="CONSUMER", help="print this consumer's new events and move it past them")
+    parser.add_argument("--after", type=int, help="print events after this sequence number")
+    parser.add_argument("--entity", action="append", choices=sorted(ENTITIES), help="only these tables; repeatable")
+    parser.add_argument("--limit", type=int, default=100, help="events to print with --after")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--prune", action="store_true", help="delete events every consumer has read")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        if args.consume:
+            summary = consume(db, args.consume, print_events, args.batch_size, args.entity)
+            print(f"{summary['consumer']}: {summary['events']:,} events in {summary['seconds']:.2f}s, "
+                  f"now at {summary['position']}")
+        elif args.after is not None:
+            print_events(read_events(db, args.after, args.limit, args.entity))
+        elif args.prune:
+            print(f"Pruned {prune_events(db):,} events.")
+        else:
+            print(f"Latest event: {latest_seq(db)}")
+            for consumer, position, lag, updated_at in consumer_lag(db):
+                print(f"  {consumer:<20} at {position:>10}  {lag:>8,} behind  (updated {updated_at})")
+    except ValueError as e:
+        print(f"Error: {e}")
+    except sqlite3.Error as e:
+        print(f"Error: {e}")
+    finally:
+        db.close()
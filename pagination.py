@@ -0,0 +1,71 @@
+import base64
+import json
+
+# Keyset pagination for listings.
+# A page is the next `page_size` rows after the last key of the previous page, in key order, found by
+# seeking the index rather than skipping rows with OFFSET, so every page costs the same. The position
+# is handed out as an opaque continuation token that callers pass back to get the following page.
+
+DEFAULT_PAGE_SIZE = 20
+
+
+def encode_token(key):
+    # Key values of the last row shown, as URL-safe text
+    text = json.dumps(list(key), separators=(",", ":"))
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def decode_token(token, key_count):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid continuation token.")
+    if not isinstance(key, list) or len(key) != key_count:
+        raise ValueError("Invalid continuation token.")
+    return key
+
+
+def fetch_page(db, columns, source, keys, where="", params=(), page_size=DEFAULT_PAGE_SIZE, token=None):
+    """
+    One page of `SELECT columns FROM source WHERE where`, ordered by the `keys` columns, which must be
+    unique together. Returns (rows, next_token); next_token is None on the last page.
+    """
+    if page_size < 1:
+        raise ValueError("Page size must be at least 1.")
+    conditions = [f"({where})"] if where else []
+    args = list(params)
+    if token:
+        conditions.append(f"({', '.join(keys)}) > ({', '.join('?' * len(keys))})")
+        args.extend(decode_token(token, len(keys)))
+    # One extra row tells whether there is a next page
+    db.cursor.execute(f'''
+        SELECT {columns}, {', '.join(keys)}
+        FROM {source}
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        ORDER BY {', '.join(keys)}
+        LIMIT ?
+    ''', args + [page_size + 1])
+    rows = db.cursor.fetchall()
+
+    next_token = encode_token(rows[page_size - 1][-len(keys):]) if len(rows) > page_size else None
+    return [row[:-len(keys)] for row in rows[:page_size]], next_token
+
+
+def browse(get_page, show_page):
+    """
+    Console paging: show a page from get_page(token) -> (rows, next_token) with show_page(rows, page_number),
+    then offer the next page until the last one or the user stops. Empty pages are not shown.
+    Returns the number of rows shown, so 0 means the listing is empty.
+    """
+    token = None
+    page_number = shown = 0
+    while True:
+        rows, token = get_page(token)
+        if rows:
+            page_number += 1
+            shown += len(rows)
+            show_page(rows, page_number)
+        if not token:
+            return shown
+        if input("[N] Next page  [Q] Stop: ").strip().lower() not in ("n", ""):
+            return shown
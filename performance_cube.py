@@ -0,0 +1,512 @@
+import argparse
+import sqlite3
+import time
+
+from exposure import APPROVED, CLAIMED
+from sales_summary import CLOSED_TERM_START, NOT_SOLD, TERM_START
+
+# Precomputed agent performance cube.
+# agent_performance_cube holds one cell per agent x month x policy type x policy plan of policy term
+# start: policy terms sold, premium, coverage, cancellations and claims filed against those terms. The
+# current term of a policy is its purchased_policy row and the terms a renewal closed are in
+# policy_terms, so a renewal is a sale in its own month and leaves earlier months as they were. Writes don't
+# touch the cube; triggers only append the affected cell keys to cube_dirty_keys. refresh_cube()
+# recomputes the cells logged after the watermark from the source tables and moves the watermark,
+# so a refresh costs in proportion to what changed. performance_cube_totals is the same cube summed
+# over agents, kept in step by the refresh, so roll-ups that don't involve agents read a few hundred
+# rows. Roll-ups and drill-downs read the cube only. Policies with no agent or start date have no cell.
+
+JOB_NAME = "performance_cube"
+_NOT_SOLD_SQL = ", ".join(f"'{status}'" for status in NOT_SOLD)
+
+MEASURES = ("policy_count", "premium_total", "coverage_total", "cancelled_count", "claim_count",
+            "claimed_amount", "approved_amount")
+
+# Ways to group cube cells: name -> expression over the cube's columns
+DIMENSIONS = {
+    "agent_id": "agent_id",
+    "year": "substr(month, 1, 4)",
+    "quarter": "substr(month, 1, 4) || '-Q' || ((CAST(substr(month, 6, 2) AS INTEGER) + 2) / 3)",
+    "month": "month",
+    "policy_type": "policy_type",
+    "policy_plan": "policy_plan",
+}
+
+# Cell key of a policy term starting on {start}
+_KEY = {
+    "agent_id": "{row}.agent_id",
+    "month": "strftime('%Y-%m', {start})",
+    "policy_type": "COALESCE({row}.policy_type, '')",
+    "policy_plan": "COALESCE({row}.policy_plan, '')",
+}
+_HAS_CELL = "{row}.agent_id IS NOT NULL AND {start} IS NOT NULL"
+
+
+def _key(row, start=TERM_START, aliased=False):
+    start = start.format(row=row)
+    return ", ".join(expression.format(row=row, start=start) + (f" AS {name}" if aliased else "")
+                     for name, expression in _KEY.items())
+
+
+def _has_cell(row, start=TERM_START):
+    return _HAS_CELL.format(row=row, start=start.format(row=row))
+
+
+def _log_policy(row, start=TERM_START):
+    return f'''
+        INSERT INTO cube_dirty_keys (agent_id, month, policy_type, policy_plan)
+        SELECT {_key(row, start)}
+        WHERE {_has_cell(row, start)};
+    '''
+
+
+def _log_claim(row):
+    # A claim changes the cell of the policy term it is filed against
+    return f'''
+        INSERT INTO cube_dirty_keys (agent_id, month, policy_type, policy_plan)
+        SELECT {_key("pp")}
+        FROM purchased_policy pp
+        WHERE pp.customer_id = {row}.customer_id AND pp.policy_id = {row}.policy_id AND pp.term = {row}.term
+          AND {_has_cell("pp")}
+        UNION ALL
+        SELECT {_key("t", CLOSED_TERM_START)}
+        FROM policy_terms t
+        WHERE t.customer_id = {row}.customer_id AND t.policy_id = {row}.policy_id AND t.term = {row}.term
+          AND {_has_cell("t", CLOSED_TERM_START)};
+    '''
+
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS agent_performance_cube (
+        agent_id TEXT NOT NULL,
+        month TEXT NOT NULL,
+        policy_type TEXT NOT NULL,
+        policy_plan TEXT NOT NULL,
+        policy_count INTEGER NOT NULL DEFAULT 0,
+        premium_total REAL NOT NULL DEFAULT 0,
+        coverage_total REAL NOT NULL DEFAULT 0,
+        cancelled_count INTEGER NOT NULL DEFAULT 0,
+        claim_count INTEGER NOT NULL DEFAULT 0,
+        claimed_amount REAL NOT NULL DEFAULT 0,
+        approved_amount REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (agent_id, month, policy_type, policy_plan)
+    )
+    ''',
+    # Summing a totals row from the agents' cells
+    "CREATE INDEX IF NOT EXISTS idx_performance_cube_period ON agent_performance_cube (month, policy_type, policy_plan)",
+    '''
+    CREATE TABLE IF NOT EXISTS performance_cube_totals (
+        month TEXT NOT NULL,
+        policy_type TEXT NOT NULL,
+        policy_plan TEXT NOT NULL,
+        policy_count INTEGER NOT NULL DEFAULT 0,
+        premium_total REAL NOT NULL DEFAULT 0,
+        coverage_total REAL NOT NULL DEFAULT 0,
+        cancelled_count INTEGER NOT NULL DEFAULT 0,
+        claim_count INTEGER NOT NULL DEFAULT 0,
+        claimed_amount REAL NOT NULL DEFAULT 0,
+        approved_amount REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, policy_type, policy_plan)
+    )
+    ''',
+    # AUTOINCREMENT: a refresh empties the log, and reused numbers would fall behind the watermark
+    '''
+    CREATE TABLE IF NOT EXISTS cube_dirty_keys (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        agent_id TEXT NOT NULL,
+        month TEXT NOT NULL,
+        policy_type TEXT NOT NULL,
+        policy_plan TEXT NOT NULL
+    )
+    ''',
+]
+
+# Indexes and triggers on the tables the cube is computed from
+TRIGGERS = [
+    # Refreshing a cell reads its policy terms by agent and term start range
+    "CREATE INDEX IF NOT EXISTS idx_purchased_policy_agent_term_start "
+    "ON purchased_policy (agent_id, COALESCE(term_start, start_date))",
+    "CREATE INDEX IF NOT EXISTS idx_policy_terms_agent_start ON policy_terms (agent_id, start_date)",
+    # Claims of a closed term are summed by term
+    "CREATE INDEX IF NOT EXISTS idx_claims_policy_term ON claims (customer_id, policy_id, term)",
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_cube_policy_insert
+    AFTER INSERT ON purchased_policy
+    BEGIN
+        {_log_policy("new")}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_cube_policy_update
+    AFTER UPDATE OF agent_id, start_date, term_start, term, policy_type, policy_plan, status, premium,
+        coverage_amount ON purchased_policy
+    WHEN old.agent_id IS NOT new.agent_id OR old.start_date IS NOT new.start_date
+      OR old.term_start IS NOT new.term_start OR old.term IS NOT new.term
+      OR old.policy_type IS NOT new.policy_type OR old.policy_plan IS NOT new.policy_plan
+      OR old.status IS NOT new.status OR old.premium IS NOT new.premium
+      OR old.coverage_amount IS NOT new.coverage_amount
+    BEGIN
+        {_log_policy("old")}
+        {_log_policy("new")}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_cube_policy_delete
+    AFTER DELETE ON purchased_policy
+    BEGIN
+        {_log_policy("old")}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_cube_term_insert
+    AFTER INSERT ON policy_terms
+    BEGIN
+        {_log_policy("new", CLOSED_TERM_START)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_cube_term_update
+    AFTER UPDATE ON policy_terms
+    BEGIN
+        {_log_policy("old", CLOSED_TERM_START)}
+        {_log_policy("new", CLOSED_TERM_START)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_cube_term_delete
+    AFTER DELETE ON policy_terms
+    BEGIN
+        {_log_policy("old", CLOSED_TERM_START)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_cube_claim_insert
+    AFTER INSERT ON claims
+    BEGIN
+        {_log_claim("new")}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_cube_claim_update
+    AFTER UPDATE OF status, amount, customer_id, policy_id, term ON claims
+    WHEN old.status IS NOT new.status OR old.amount IS NOT new.amount
+      OR old.customer_id IS NOT new.customer_id OR old.policy_id IS NOT new.policy_id
+      OR old.term IS NOT new.term
+    BEGIN
+        {_log_claim("old")}
+        {_log_claim("new")}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_cube_claim_delete
+    AFTER DELETE ON claims
+    BEGIN
+        {_log_claim("old")}
+    END
+    ''',
+]
+
+
+# Cells computed from the current terms in purchased_policy, with claim totals from policy_exposure, and the
+# closed terms in policy_terms, with claim totals from their claims; {current} and {closed} may narrow it to some cells
+CELLS_SQL = f'''
+    SELECT agent_id, month, policy_type, policy_plan, SUM(sold), SUM(premium), SUM(coverage), SUM(cancelled),
+           SUM(claim_count), SUM(claimed), SUM(approved)
+    FROM (
+        SELECT {_key("pp", aliased=True)},
+               pp.status NOT IN ({_NOT_SOLD_SQL}) AS sold,
+               CASE WHEN pp.status NOT IN ({_NOT_SOLD_SQL}) THEN COALESCE(pp.premium, 0) ELSE 0 END AS premium,
+               CASE WHEN pp.status NOT IN ({_NOT_SOLD_SQL}) THEN COALESCE(pp.coverage_amount, 0) ELSE 0 END
+                   AS coverage,
+               pp.status = 'Cancelled' AS cancelled,
+               COALESCE(e.claim_count, 0) AS claim_count,
+               COALESCE(e.total_claimed, 0) AS claimed,
+               COALESCE(e.total_approved, 0) AS approved
+        FROM {{current}}
+        LEFT JOIN policy_exposure e ON e.customer_id = pp.customer_id AND e.policy_id = pp.policy_id
+        WHERE {_has_cell("pp")}
+        UNION ALL
+        SELECT {_key("t", CLOSED_TERM_START)},
+               t.status NOT IN ({_NOT_SOLD_SQL}),
+               CASE WHEN t.status NOT IN ({_NOT_SOLD_SQL}) THEN COALESCE(t.premium, 0) ELSE 0 END,
+               CASE WHEN t.status NOT IN ({_NOT_SOLD_SQL}) THEN COALESCE(t.coverage_amount, 0) ELSE 0 END,
+               t.status = 'Cancelled',
+               COUNT(c.claim_id), SUM({CLAIMED.format(row="c")}), SUM({APPROVED.format(row="c")})
+        FROM {{closed}}
+        LEFT JOIN claims c ON c.customer_id = t.customer_id AND c.policy_id = t.policy_id AND c.term = t.term
+        WHERE {_has_cell("t", CLOSED_TERM_START)}
+        GROUP BY t.customer_id, t.policy_id, t.term
+    )
+    GROUP BY 1, 2, 3, 4
+'''
+
+# Totals rows summed from the agents' cells; {source} may narrow it to some periods
+TOTALS_SQL = f'''
+    SELECT c.month, c.policy_type, c.policy_plan, {', '.join(f"SUM(c.{measure})" for measure in MEASURES)}
+    FROM {{source}}
+    GROUP BY 1, 2, 3
+'''
+
+
+def _dirty_terms(table, row, start):
+    # CROSS JOIN keeps the changed keys as the outer loop, so each is an index seek into the big table
+    start = start.format(row=row)
+    return f'''
+    temp.cube_refresh_keys k
+    CROSS JOIN {table} {row}
+      ON {row}.agent_id = k.agent_id
+     AND {start} >= k.month || '-01' AND {start} < date(k.month || '-01', '+1 month')
+     AND strftime('%Y-%m', {start}) = k.month
+     AND COALESCE({row}.policy_type, '') = k.policy_type AND COALESCE({row}.policy_plan, '') = k.policy_plan
+    '''
+
+
+_ALL_CELLS = CELLS_SQL.format(current="purchased_policy pp", closed="policy_terms t")
+_DIRTY_CURRENT = _dirty_terms("purchased_policy", "pp", TERM_START)
+_DIRTY_CLOSED = _dirty_terms("policy_terms", "t", CLOSED_TERM_START)
+_DIRTY_TOTALS = '''
+    (SELECT DISTINCT month, policy_type, policy_plan FROM temp.cube_refresh_keys) k
+    CROSS JOIN agent_performance_cube c
+      ON c.month = k.month AND c.policy_type = k.policy_type AND c.policy_plan = k.policy_plan
+'''
+
+_INSERT_CELLS = f"INSERT INTO agent_performance_cube (agent_id, month, policy_type, policy_plan, {', '.join(MEASURES)})"
+_INSERT_TOTALS = f"INSERT INTO performance_cube_totals (month, policy_type, policy_plan, {', '.join(MEASURES)})"
+
+
+def read_watermark(db):
+    # Sequence number of the last logged change folded into the cube
+    db.cursor.execute("SELECT last_key FROM job_checkpoints WHERE job_name = ?", (JOB_NAME,))
+    row = db.cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else 0
+
+
+def _save_watermark(cursor, seq, cells):
+    cursor.execute('''
+        INSERT INTO job_checkpoints (job_name, last_key, rows_done, status, updated_at)
+        VALUES (?, ?, ?, 'done', CURRENT_TIMESTAMP)
+        ON CONFLICT (job_name) DO UPDATE SET
+            last_key = excluded.last_key,
+            rows_done = rows_done + excluded.rows_done,
+            status = excluded.status,
+            updated_at = excluded.updated_at
+    ''', (JOB_NAME, str(seq), cells))
+
+
+def create_cube(cursor):
+    # Migration step: create the cube and the change log. The triggers and cells read policy terms, so
+    # recreate_cube_triggers in a later migration installs them and builds every cell
+    for statement in SCHEMA:
+        cursor.execute(statement)
+
+
+def recreate_dirty_keys(cursor):
+    # Migration step: replace the change log with one whose sequence numbers are never reused. Whatever
+    # was still pending in the old log is covered by the rebuild in recreate_cube_triggers
+    cursor.execute("DROP TABLE IF EXISTS cube_dirty_keys")
+    cursor.execute(next(statement for statement in SCHEMA if "TABLE IF NOT EXISTS cube_dirty_keys" in statement))
+
+
+def recreate_cube_triggers(cursor):
+    # Migration step: replace the indexes and triggers with their current definitions, then build every cell
+    cursor.execute("DROP INDEX IF EXISTS idx_purchased_policy_agent_start")
+    for statement in TRIGGERS:
+        if "TRIGGER IF NOT EXISTS" in statement:
+            name = statement.split("IF NOT EXISTS", 1)[1].split()[0]
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(statement)
+    rebuild_cube(cursor)
+
+
+def rebuild_cube(cursor):
+    # Recompute the whole cube and mark every logged change as folded in
+    cursor.execute("DELETE FROM agent_performance_cube")
+    cursor.execute(_INSERT_CELLS + _ALL_CELLS)
+    cells = cursor.rowcount
+    cursor.execute("DELETE FROM performance_cube_totals")
+    cursor.execute(_INSERT_TOTALS + TOTALS_SQL.format(source="agent_performance_cube c"))
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM cube_dirty_keys")
+    seq = cursor.fetchone()[0]
+    cursor.execute("DELETE FROM cube_dirty_keys WHERE seq <= ?", (seq,))
+    _save_watermark(cursor, seq, cells)
+    return cells
+
+
+def refresh_cube(db):
+    """
+    Recompute the cells changed since the watermark. Returns a summary dict with the
+    changes and cells processed, the new watermark, and seconds taken.
+    """
+    started = time.perf_counter()
+    try:
+        db.conn.commit()
+        db.cursor.execute("BEGIN IMMEDIATE")
+        watermark = read_watermark(db)
+        db.cursor.execute("SELECT COUNT(*), MAX(seq) FROM cube_dirty_keys WHERE seq > ?", (watermark,))
+        changes, high = db.cursor.fetchone()
+        cells = 0
+        if changes:
+            db.cursor.execute('''
+                CREATE TEMP TABLE IF NOT EXISTS cube_refresh_keys (
+                    agent_id TEXT, month TEXT, policy_type TEXT, policy_plan TEXT,
+                    PRIMARY KEY (agent_id, month, policy_type, policy_plan)
+                )
+            ''')
+            db.cursor.execute("DELETE FROM temp.cube_refresh_keys")
+            db.cursor.execute('''
+                INSERT OR IGNORE INTO temp.cube_refresh_keys
+                SELECT agent_id, month, policy_type, policy_plan
+                FROM cube_dirty_keys
+                WHERE seq > ? AND seq <= ?
+            ''', (watermark, high))
+            cells = db.cursor.rowcount
+            # Cells left with no policies disappear; the rest are recomputed from scratch
+            db.cursor.execute('''
+                DELETE FROM agent_performance_cube
+                WHERE (agent_id, month, policy_type, policy_plan) IN
+                      (SELECT agent_id, month, policy_type, policy_plan FROM temp.cube_refresh_keys)
+            ''')
+            db.cursor.execute(_INSERT_CELLS + CELLS_SQL.format(current=_DIRTY_CURRENT, closed=_DIRTY_CLOSED))
+            # Then the totals rows of the same periods, from the refreshed cells
+            db.cursor.execute('''
+                DELETE FROM performance_cube_totals
+                WHERE (month, policy_type, policy_plan) IN
+                      (SELECT month, policy_type, policy_plan FROM temp.cube_refresh_keys)
+            ''')
+            db.cursor.execute(_INSERT_TOTALS + TOTALS_SQL.format(source=_DIRTY_TOTALS))
+            db.cursor.execute("DELETE FROM cube_dirty_keys WHERE seq <= ?", (high,))
+            db.cursor.execute("DELETE FROM temp.cube_refresh_keys")
+            _save_watermark(db.cursor, high, cells)
+            watermark = high
+        db.conn.commit()
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+    return {"changes": changes, "cells": cells, "watermark": watermark, "seconds": time.perf_counter() - started}
+
+
+def query_cube(db, by=("year",), agent_id=None, start_month=None, end_month=None, policy_type=None,
+               policy_plan=None, refresh=True):
+    """
+    Roll the cube up to the `by` dimensions (see DIMENSIONS), optionally for one agent, policy type
+    or plan and a month range ('YYYY-MM', inclusive). Pending changes are folded in first unless
+    refresh is False. Returns (column names, rows).
+    """
+    unknown = [name for name in by if name not in DIMENSIONS]
+    if unknown:
+        raise ValueError(f"unknown dimension {', '.join(unknown)} (choose from {', '.join(DIMENSIONS)})")
+    if refresh:
+        refresh_cube(db)
+
+    conditions = []
+    params = []
+    for column, value in (("agent_id", agent_id), ("policy_type", policy_type), ("policy_plan", policy_plan)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if start_month:
+        conditions.append("month >= ?")
+        params.append(start_month)
+    if end_month:
+        conditions.append("month <= ?")
+        params.append(end_month)
+
+    # Roll-ups that don't involve agents read the totals rows
+    source = "agent_performance_cube" if agent_id is not None or "agent_id" in by else "performance_cube_totals"
+    groups = [f"{DIMENSIONS[name]} AS {name}" for name in by]
+    db.cursor.execute(f'''
+        SELECT {', '.join(groups + [f"SUM({measure}) AS {measure}" for measure in MEASURES])}
+        FROM {source}
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        {'GROUP BY ' + ', '.join(by) if by else ''}
+        {'ORDER BY ' + ', '.join(by) if by else ''}
+    ''', params)
+    return list(by) + list(MEASURES), db.cursor.fetchall()
+
+
+def _compare(db, table, key_size, recompute_sql, tolerance):
+    # (key, stored, recomputed) for rows of `table` that differ from recompute_sql's
+    db.cursor.execute(recompute_sql)
+    fresh = {row[:key_size]: row[key_size:] for row in db.cursor.fetchall()}
+    db.cursor.execute(f"SELECT * FROM {table}")
+    stored = {row[:key_size]: row[key_size:] for row in db.cursor.fetchall()}
+    mismatches = []
+    for key in sorted(fresh.keys() | stored.keys()):
+        kept, recomputed = stored.get(key), fresh.get(key)
+        if kept is None or recomputed is None or any(abs(a - b) > tolerance for a, b in zip(kept, recomputed)):
+            mismatches.append((key, kept, recomputed))
+    return mismatches
+
+
+def verify_cube(db, tolerance=0.005):
+    """
+    Compare the refreshed cube with a full recompute, and the totals rows with the cube.
+    Returns a list of (key, stored, recomputed) for rows that differ; stored/recomputed are
+    measure tuples or None when the row is missing. Totals keys have '*' for the agent.
+    """
+    refresh_cube(db)
+    mismatches = _compare(db, "agent_performance_cube", 4, _ALL_CELLS, tolerance)
+    totals = _compare(db, "performance_cube_totals", 3, TOTALS_SQL.format(source="agent_performance_cube c"), tolerance)
+    return mismatches + [(("*",) + key, kept, recomputed) for key, kept, recomputed in totals]
+
+
+def print_rollup(columns, rows):
+    dims = len(columns) - len(MEASURES)
+    widths = [max([len(columns[i])] + [len(str(row[i])) for row in rows]) for i in range(dims)]
+    header = [f"{name:<{width}}" for name, width in zip(columns, widths)]
+    header += ["Sold", "Premium (RM)", "Coverage (RM)", "Cancelled", "Claims", "Claimed (RM)", "Approved (RM)"]
+    print("  ".join(f"{title:>14}" if i >= dims else title for i, title in enumerate(header)))
+    print("-" * (sum(widths) + 2 * dims + 16 * len(MEASURES)))
+    for row in rows:
+        cells = [f"{str(row[i]):<{widths[i]}}" for i in range(dims)]
+        sold, premium, coverage, cancelled, claims, claimed, approved = row[dims:]
+        cells += [f"{sold:>14,}", f"{premium:>14,.2f}", f"{coverage:>14,.0f}", f"{cancelled:>14,}",
+                  f"{claims:>14,}", f"{claimed:>14,.2f}", f"{approved:>14,.2f}"]
+        print("  ".join(cells))
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Refresh and query the agent performance cube.")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--by", default="year", help=f"comma-separated dimensions: {', '.join(DIMENSIONS)}")
+    parser.add_argument("--agent", help="only this agent ID")
+    parser.add_argument("--type", dest="policy_type", help="only this policy type")
+    parser.add_argument("--plan", dest="policy_plan", help="only this policy plan")
+    parser.add_argument("--from", dest="start_month", help="first month (YYYY-MM)")
+    parser.add_argument("--to", dest="end_month", help="last month (YYYY-MM)")
+    parser.add_argument("--refresh-only", action="store_true", help="fold in pending changes and stop")
+    parser.add_argument("--verify", action="store_true", help="compare the cube with a full recompute")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every cell")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        if args.rebuild:
+            print(f"Rebuilt {rebuild_cube(db.cursor):,} cells.")
+            db.conn.commit()
+        elif args.verify:
+            mismatches = verify_cube(db)
+            print(f"{len(mismatches)} cells differ from a full recompute.")
+            for key, stored, recomputed in mismatches[:20]:
+                print(f"  {' / '.join(key)}: stored {stored}, recomputed {recomputed}")
+        elif args.refresh_only:
+            summary = refresh_cube(db)
+            print(f"Folded in {summary['changes']:,} changes ({summary['cells']:,} cells) "
+                  f"in {summary['seconds'] * 1000:.1f} ms; watermark {summary['watermark']}")
+        else:
+            by = [name.strip() for name in args.by.split(",") if name.strip()]
+            print_rollup(*query_cube(db, by, args.agent, args.start_month, args.end_month,
+                                     args.policy_type, args.policy_plan))
+    except ValueError as e:
+        print(f"Error: {e}")
+    except sqlite3.Error as e:
+        db.conn.rollback()
+        print(f"Error: {e}")
+    finally:
+        db.close()
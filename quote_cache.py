@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict
+
+from insurance_class import PolicyType, calculate_premium
+from rate_tables import current_rates
+
+# Memoized premium quotes.
+# Inputs are normalized into a key holding only what the policy type's calculator actually uses,
+# so quotes that differ only in irrelevant or cosmetic ways (letter case, int vs float) share an entry.
+
+
+def quote_key(policy_type, coverage_amount=0, age=None, medical_history="None", vehicle_value=None,
+              vehicle_age=None, coverage_type="BASIC", property_type="", property_value=None, property_age=None,
+              rates=None):
+    """Normalize rating inputs into a hashable cache key."""
+    # Conditions are tested the way the premium calculators test them
+    has_condition = (rates or current_rates()).has_condition
+    if policy_type == PolicyType.LIFE.value:
+        return (policy_type, float(age), float(coverage_amount), has_condition(medical_history))
+    if policy_type == PolicyType.VEHICLE.value:
+        return (policy_type, float(vehicle_value), float(vehicle_age))
+    if policy_type == PolicyType.HEALTH.value:
+        return (policy_type, float(age), float(coverage_amount), coverage_type.upper(),
+                has_condition(medical_history))
+    if policy_type == PolicyType.PROPERTY.value:
+        return (policy_type, float(property_value), float(property_age), property_type.lower())
+    raise ValueError(f"Unknown policy type: {policy_type}")
+
+
+class QuoteCache:
+    """
+    Bounded LRU cache of premiums keyed by normalized rating inputs.
+    Every entry belongs to the rate table version it was priced under. When
+    a new version is loaded the whole cache is dropped.
+    """
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = current_rates().version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+            self.invalidations += 1
+
+    def quote_with_version(self, policy_type, **inputs):
+        """
+        Premium for the given inputs and the rate table version it was priced under.
+        Misses are computed with the insurance_class calculators.
+        """
+        # One CompiledRates for the whole quote, so the premium and version always agree
+        rates = current_rates()
+        key = quote_key(policy_type, rates=rates, **inputs)
+        with self._lock:
+            self._check_version(rates.version)
+            premium = self._entries.get(key)
+            if premium is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return premium, rates.version
+            self.misses += 1
+
+        premium = calculate_premium(policy_type, rates=rates, **inputs)
+
+        with self._lock:
+            # Don't store a premium computed under rates that were replaced while it was being rated
+            if rates.version == self._version:
+                self._entries[key] = premium
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return premium, rates.version
+
+    def quote(self, policy_type, **inputs):
+        return self.quote_with_version(policy_type, **inputs)[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "rating_version": self._version,
+            }
+
+
+QUOTE_CACHE = QuoteCache()
+
+
+def quote_premium(policy_type, **inputs):
+    # Quote through the shared process-wide cache
+    return QUOTE_CACHE.quote(policy_type, **inputs)
+
+
+def quote_with_version(policy_type, **inputs):
+    # (premium, rate table version) through the shared cache
+    return QUOTE_CACHE.quote_with_version(policy_type, **inputs)
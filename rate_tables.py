@@ -0,0 +1,220 @@
+import sqlite3
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+# Rating factors live in the `rate_factors` table, one set of rows per version.
+# At startup (or on reload) the active version is compiled into an immutable CompiledRates,
+# with factor tables precomputed per age / vehicle age / property age, and swapped in atomically.
+# The premium calculators read whatever CompiledRates is current when they start a quote.
+
+DEFAULT_FACTORS = {
+    "life": {"base_rate": 0.15, "base_age": 25, "age_slope_up": 0.04, "age_slope_down": 0.02,
+             "age_floor": 0.8, "coverage_divisor": 1000000, "coverage_slope": 0.1, "medical_loading": 1.5},
+    "vehicle": {"base_rate": 0.05, "age_slope": 0.1, "value_divisor": 100000},
+    "property": {"base_rate": 0.003, "age_slope": 0.015, "value_divisor": 1000000},
+    "property_risk": {"residential": 1.0, "commercial": 1.2, "industrial": 1.5},
+    "health": {"base_rate": 0.03, "age_slope": 0.025, "coverage_divisor": 100000, "medical_loading": 1.8},
+    "health_coverage": {"BASIC": 1.0, "COMPREHENSIVE": 1.5, "FAMILY": 2.0, "INDIVIDUAL": 0.8,
+                        "HOSPITAL": 1.2, "OUTPATIENT": 1.1, "SPECIALIST": 1.3},
+}
+
+LifeFactors = namedtuple("LifeFactors", DEFAULT_FACTORS["life"])
+VehicleFactors = namedtuple("VehicleFactors", DEFAULT_FACTORS["vehicle"])
+PropertyFactors = namedtuple("PropertyFactors", DEFAULT_FACTORS["property"])
+HealthFactors = namedtuple("HealthFactors", DEFAULT_FACTORS["health"])
+
+# Precomputed table sizes; inputs outside them fall back to the formula
+MAX_AGE = 120
+MAX_VEHICLE_AGE = 100
+MAX_PROPERTY_AGE = 300
+
+# Spellings of "no medical history" recognised without lower-casing
+_NO_CONDITION = frozenset(("None", "none", "NONE"))
+
+
+def _spellings(mapping, normalize):
+    # Index a label mapping under its common spellings so lookups rarely need to normalize
+    spelled = {}
+    for label, value in mapping.items():
+        for variant in (label, label.lower(), label.upper(), label.capitalize(), label.title()):
+            if normalize(variant) == label:
+                spelled[variant] = value
+    return MappingProxyType(spelled)
+
+
+class CompiledRates:
+    """
+    Immutable, precomputed view of one rate table version.
+    Per-age factors are plain tuples indexed by age; label factors are read-only mappings.
+    """
+    __slots__ = ("version", "life", "vehicle", "property", "health", "property_risk", "health_coverage",
+                 "_property_risk_spelled", "_health_coverage_spelled",
+                 "life_age_factors", "health_age_factors", "vehicle_age_factors", "property_age_factors")
+
+    def __init__(self, version, factors):
+        object.__setattr__(self, "version", version)
+        object.__setattr__(self, "life", LifeFactors(**factors["life"]))
+        object.__setattr__(self, "vehicle", VehicleFactors(**factors["vehicle"]))
+        object.__setattr__(self, "property", PropertyFactors(**factors["property"]))
+        object.__setattr__(self, "health", HealthFactors(**factors["health"]))
+        object.__setattr__(self, "property_risk",
+                           MappingProxyType({k.lower(): v for k, v in factors["property_risk"].items()}))
+        object.__setattr__(self, "health_coverage",
+                           MappingProxyType({k.upper(): v for k, v in factors["health_coverage"].items()}))
+        object.__setattr__(self, "_property_risk_spelled", _spellings(self.property_risk, str.lower))
+        object.__setattr__(self, "_health_coverage_spelled", _spellings(self.health_coverage, str.upper))
+        object.__setattr__(self, "life_age_factors",
+                           tuple(self._life_age_formula(age) for age in range(MAX_AGE + 1)))
+        object.__setattr__(self, "health_age_factors",
+                           tuple(1 + (age * self.health.age_slope) for age in range(MAX_AGE + 1)))
+        object.__setattr__(self, "vehicle_age_factors",
+                           tuple(1 + (age * self.vehicle.age_slope) for age in range(MAX_VEHICLE_AGE + 1)))
+        object.__setattr__(self, "property_age_factors",
+                           tuple(1 + (age * self.property.age_slope) for age in range(MAX_PROPERTY_AGE + 1)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledRates is immutable")
+
+    def _life_age_formula(self, age):
+        life = self.life
+        if age < life.base_age:
+            # Discount below the base age, down to the floor
+            return max(life.age_floor, 1 - ((life.base_age - age) * life.age_slope_down))
+        return 1 + ((age - life.base_age) * life.age_slope_up)
+
+    # Whole-number inputs inside a precomputed table are looked up; anything else uses the formula
+    def life_age_factor(self, age):
+        if type(age) is int and 0 <= age <= MAX_AGE:
+            return self.life_age_factors[age]
+        return self._life_age_formula(age)
+
+    def health_age_factor(self, age):
+        if type(age) is int and 0 <= age <= MAX_AGE:
+            return self.health_age_factors[age]
+        return 1 + (age * self.health.age_slope)
+
+    def vehicle_age_factor(self, vehicle_age):
+        if type(vehicle_age) is int and 0 <= vehicle_age <= MAX_VEHICLE_AGE:
+            return self.vehicle_age_factors[vehicle_age]
+        return 1 + (vehicle_age * self.vehicle.age_slope)
+
+    def property_age_factor(self, property_age):
+        if type(property_age) is int and 0 <= property_age <= MAX_PROPERTY_AGE:
+            return self.property_age_factors[property_age]
+        return 1 + (property_age * self.property.age_slope)
+
+    def property_risk_factor(self, property_type):
+        factor = self._property_risk_spelled.get(property_type)
+        if factor is None:
+            factor = self.property_risk.get(property_type.lower(), 1.0)
+        return factor
+
+    def health_coverage_factor(self, coverage_type):
+        factor = self._health_coverage_spelled.get(coverage_type)
+        if factor is None:
+            factor = self.health_coverage.get(coverage_type.upper(), 1.0)
+        return factor
+
+    def as_factors(self):
+        # Plain factor dicts, the same shape DEFAULT_FACTORS and publish_rates use
+        return {
+            "life": self.life._asdict(),
+            "vehicle": self.vehicle._asdict(),
+            "property": self.property._asdict(),
+            "property_risk": dict(self.property_risk),
+            "health": self.health._asdict(),
+            "health_coverage": dict(self.health_coverage),
+        }
+
+    @staticmethod
+    def has_condition(medical_history):
+        # Anything other than "none" (in any case) counts as a pre-existing condition, a missing history too
+        if medical_history in _NO_CONDITION:
+            return False
+        return (medical_history or "").lower() != "none"
+
+
+# Built-in defaults are version 1, the same rows the rate table migration seeds
+_current = CompiledRates(1, DEFAULT_FACTORS)
+_reload_lock = threading.Lock()
+
+
+def current_rates():
+    """The CompiledRates in effect. Read it once per quote and use that object throughout."""
+    return _current
+
+
+def set_current_rates(compiled):
+    """Make an already compiled CompiledRates the one used for pricing."""
+    global _current
+    with _reload_lock:
+        _current = compiled
+    return compiled
+
+
+def _read_factors(db, version):
+    db.cursor.execute('''
+        SELECT factor_group, factor_key, value
+        FROM rate_factors
+        WHERE version = ?
+    ''', (version,))
+    factors = {}
+    for group, key, value in db.cursor.fetchall():
+        factors.setdefault(group, {})[key] = value
+    return factors
+
+
+def load_rates(db, version=None):
+    """
+    Compile the active rate version (or `version`) from the database and make it current.
+    The new tables are fully built before the swap, so a failed load leaves the old rates in place.
+    """
+    try:
+        if version is None:
+            db.cursor.execute("SELECT MAX(version) FROM rate_table_versions WHERE is_active = 1")
+            version = db.cursor.fetchone()[0]
+            if version is None:
+                return _current
+        factors = _read_factors(db, version)
+        if not factors:
+            raise ValueError(f"Rate table version {version} has no factors")
+        compiled = CompiledRates(version, factors)
+    except (sqlite3.Error, TypeError, KeyError) as e:
+        raise ValueError(f"Could not load rate table version {version}: {e}") from e
+
+    return set_current_rates(compiled)
+
+
+def publish_rates(db, factors, description):
+    """
+    Store a complete set of factors as a new version and make it the active one.
+    Returns the new version number; call load_rates() to start pricing with it.
+    """
+    CompiledRates(0, factors)  # reject incomplete factor sets before writing anything
+    try:
+        db.cursor.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM rate_table_versions")
+        version = db.cursor.fetchone()[0]
+        db.cursor.execute('''
+            INSERT INTO rate_table_versions (version, description, is_active) VALUES (?, ?, 0)
+        ''', (version, description))
+        db.cursor.executemany('''
+            INSERT INTO rate_factors (version, factor_group, factor_key, value) VALUES (?, ?, ?, ?)
+        ''', [(version, group, key, value) for group, values in factors.items() for key, value in values.items()])
+        db.cursor.execute("UPDATE rate_table_versions SET is_active = (version = ?)", (version,))
+        db.conn.commit()
+        return version
+    except sqlite3.Error:
+        db.conn.rollback()
+        raise
+
+
+def seed_default_rates(cursor):
+    # Migration step: record the built-in factors as version 1
+    cursor.execute('''
+        INSERT OR IGNORE INTO rate_table_versions (version, description, is_active)
+        VALUES (1, 'Initial rating factors', 1)
+    ''')
+    cursor.executemany('''
+        INSERT OR IGNORE INTO rate_factors (version, factor_group, factor_key, value) VALUES (1, ?, ?, ?)
+    ''', [(group, key, value) for group, values in DEFAULT_FACTORS.items() for key, value in values.items()])
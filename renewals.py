@@ -0,0 +1,229 @@
+import argparse
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from batch_rating import RATING_COLUMNS, rate_batch
+from rate_tables import current_rates, load_rates
+
+# Bulk policy renewal.
+# Paid-up policies whose end date falls in the renewal window are read a chunk at a time in
+# (end_date, rowid) order through the (status, end_date) index and renewed for another year with the
+# same agent. CUSTOM policies are re-priced from their own *_policy_details row with batch_rating
+# (which matches the insurance_class premium methods to the cent); prepared plans renew at their
+# current policy_package premium. Renewing archives the current term in policy_terms, then moves the
+# policy to its next term: term + 1, starting on the old end date (term_start) and ending a year later,
+# the new premium, and status 'Accepted' so billing collects the renewal premium. start_date stays the
+# policy's original start. The sales summary and performance cube count every term as a sale in the
+# month it started, so a renewal is booked in its own month and earlier months keep the premium they
+# were sold at. Each chunk is written with two set-based statements in its own transaction; a renewed
+# policy leaves the window, so a rerun only picks up what is left.
+
+TERM_STATUS = "Accepted"
+
+# Statuses of a paid-up policy that can be renewed
+RENEWABLE = ("Premium paid", "Active")
+
+# A details row belongs to the policy's holder: detail customer_id holds the customer ID (or NRIC),
+# and the create-custom-policy screen leaves it empty. Prepared plan IDs such as H001 are shared by
+# every customer who bought the plan, so their details rows are never used.
+_HOLDER_DETAILS = """
+    {d}.policy_id = pp.policy_id AND pp.policy_plan = 'CUSTOM'
+    AND ({d}.customer_id IS NULL OR {d}.customer_id IN (pp.customer_id, u.nric)
+         OR (SELECT nric FROM customers WHERE customer_id = {d}.customer_id) = u.nric)
+"""
+
+# Next chunk of renewable policies after the (end_date, rowid) keyset position, with every rating input.
+# purchased_policy.customer_id holds either the customer ID or the NRIC.
+CHUNK_SQL = f'''
+    SELECT pp.rowid, pp.policy_type, pp.coverage_amount, pp.premium, u.age,
+           COALESCE(ld.medical_history, hd.medical_history) AS medical_history,
+           hd.coverage_type,
+           vd.vehicle_value, vd.vehicle_age,
+           pd.property_value, pd.property_age, pd.property_type,
+           pp.end_date, pp.policy_plan, pk.premium
+    FROM purchased_policy pp
+    LEFT JOIN customers c ON c.customer_id = pp.customer_id
+    LEFT JOIN users u ON u.nric = COALESCE(c.nric, pp.customer_id)
+    LEFT JOIN policy_package pk ON pk.policy_id = pp.policy_id
+    LEFT JOIN life_policy_details ld ON {_HOLDER_DETAILS.format(d="ld")}
+    LEFT JOIN health_policy_details hd ON {_HOLDER_DETAILS.format(d="hd")}
+    LEFT JOIN vehicle_policy_details vd ON {_HOLDER_DETAILS.format(d="vd")}
+    LEFT JOIN property_policy_details pd ON {_HOLDER_DETAILS.format(d="pd")}
+    WHERE pp.status = ? AND pp.end_date >= ? AND pp.end_date < ?
+      AND (pp.end_date, pp.rowid) > (?, ?)
+    ORDER BY pp.end_date, pp.rowid
+    LIMIT ?
+'''
+
+# Position of each rating input in a CHUNK_SQL row
+ROW_FIELDS = {
+    "coverage_amount": 2, "age": 4, "medical_history": 5, "coverage_type": 6,
+    "vehicle_value": 7, "vehicle_age": 8, "property_value": 9, "property_age": 10, "property_type": 11,
+}
+
+
+def _rate_chunk(rows, rates):
+    """
+    Re-price one chunk. Returns (priced, skipped) where priced is a list of
+    (rowid, old_premium, new_premium) and skipped counts rows missing rating inputs
+    or, for a prepared plan, its package.
+    """
+    groups = {}
+    priced = []
+    skipped = 0
+    for row in rows:
+        if row[13] != "CUSTOM":
+            if row[14] is None:
+                skipped += 1
+            else:
+                priced.append((row[0], row[3], float(row[14])))
+            continue
+        names = RATING_COLUMNS.get(row[1])
+        if names is None or any(row[ROW_FIELDS[name]] is None for name in names):
+            skipped += 1
+            continue
+        groups.setdefault(row[1], []).append(row)
+
+    for policy_type, group in groups.items():
+        columns = {name: [row[ROW_FIELDS[name]] for row in group] for name in RATING_COLUMNS[policy_type]}
+        premiums = rate_batch(policy_type, columns, rates)
+        priced.extend((row[0], row[3], float(premium)) for row, premium in zip(group, premiums))
+    return priced, skipped
+
+
+def _renew(db, priced):
+    # Archive the current terms of the priced policies, then start their next terms
+    db.cursor.execute("CREATE TEMP TABLE IF NOT EXISTS renewal_batch (policy_rowid INTEGER PRIMARY KEY, premium REAL)")
+    db.cursor.execute("DELETE FROM temp.renewal_batch")
+    db.cursor.executemany("INSERT INTO temp.renewal_batch (policy_rowid, premium) VALUES (?, ?)",
+                          [(rowid, premium) for rowid, _, premium in priced])
+    db.cursor.execute('''
+        INSERT INTO policy_terms (customer_id, policy_id, term, agent_id, policy_type, policy_plan,
+                                  coverage_amount, premium, status, start_date, end_date)
+        SELECT pp.customer_id, pp.policy_id, pp.term, pp.agent_id, pp.policy_type, pp.policy_plan,
+               pp.coverage_amount, pp.premium, pp.status,
+               COALESCE(pp.term_start, pp.start_date), pp.end_date
+        FROM temp.renewal_batch b
+        JOIN purchased_policy pp ON pp.rowid = b.policy_rowid
+    ''')
+    db.cursor.execute(f'''
+        UPDATE purchased_policy
+        SET term = term + 1,
+            term_start = end_date,
+            end_date = date(end_date, '+1 year'),
+            premium = b.premium,
+            status = '{TERM_STATUS}'
+        FROM temp.renewal_batch b
+        WHERE purchased_policy.rowid = b.policy_rowid
+    ''')
+    db.cursor.execute("DELETE FROM temp.renewal_batch")
+
+
+def renew_policies(db, as_of=None, days=30, chunk_size=1000, rates=None, dry_run=False, progress_every=50000):
+    """
+    Renew every paid-up policy whose end date is within `days` days from `as_of` ('YYYY-MM-DD',
+    default today), re-priced with `rates` (default: the current compiled rates). With dry_run
+    the new premiums are computed and reported but nothing is written.
+    Returns a summary dict.
+    """
+    rates = rates or current_rates()
+    as_of = as_of or date.today().isoformat()
+    until = (date.fromisoformat(as_of) + timedelta(days=days)).isoformat()
+    renewed = skipped = chunks = 0
+    premium_before = premium_after = 0.0
+    max_chunk_seconds = 0.0
+    next_report = progress_every
+    started = time.perf_counter()
+    db.conn.commit()
+
+    try:
+        for status in RENEWABLE:
+            last_key = ("", 0)
+            while True:
+                chunk_started = time.perf_counter()
+                if not dry_run:
+                    # Take the write lock before reading, so the chunk can't change before it is renewed
+                    db.cursor.execute("BEGIN IMMEDIATE")
+                # The last end date is also the lower bound of the index range, so earlier rows aren't rescanned
+                since = max(as_of, last_key[0])
+                db.cursor.execute(CHUNK_SQL, (status, since, until) + last_key + (chunk_size,))
+                rows = db.cursor.fetchall()
+                if not rows:
+                    db.conn.commit()
+                    break
+
+                priced, chunk_skipped = _rate_chunk(rows, rates)
+                if not dry_run and priced:
+                    _renew(db, priced)
+                db.conn.commit()
+                max_chunk_seconds = max(max_chunk_seconds, time.perf_counter() - chunk_started)
+
+                last_key = (rows[-1][12], rows[-1][0])
+                renewed += len(priced)
+                skipped += chunk_skipped
+                premium_before += sum(old or 0 for _, old, _ in priced)
+                premium_after += sum(new for _, _, new in priced)
+                chunks += 1
+                if renewed >= next_report:
+                    elapsed = time.perf_counter() - started
+                    print(f"  {renewed:,} policies {'priced' if dry_run else 'renewed'} "
+                          f"({renewed / elapsed:,.0f} policies/sec), up to end date {last_key[0]}")
+                    next_report += progress_every
+    except sqlite3.Error as e:
+        db.conn.rollback()
+        print(f"Renewal stopped after {renewed:,} policies: {e}")
+        raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        "as_of": as_of,
+        "until": until,
+        "rate_version": rates.version,
+        "dry_run": dry_run,
+        "renewed": renewed,
+        "skipped": skipped,
+        "premium_before": premium_before,
+        "premium_after": premium_after,
+        "chunks": chunks,
+        "max_chunk_seconds": max_chunk_seconds,
+        "seconds": elapsed,
+        "policies_per_sec": renewed / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def print_summary(summary):
+    title = "Renewal (dry run)" if summary["dry_run"] else "Renewal"
+    print(f"\n{title}: end dates from {summary['as_of']} to before {summary['until']}, "
+          f"rate version {summary['rate_version']}")
+    print(f"  Policies {'to renew' if summary['dry_run'] else 'renewed'}: {summary['renewed']:,}")
+    print(f"  Skipped (missing rating details or plan): {summary['skipped']:,}")
+    change = summary["premium_after"] - summary["premium_before"]
+    print(f"  Premium: RM{summary['premium_before']:,.2f} -> RM{summary['premium_after']:,.2f} "
+          f"({'+' if change >= 0 else '-'}RM{abs(change):,.2f})")
+    print(f"  Elapsed: {summary['seconds']:.2f}s ({summary['policies_per_sec']:,.0f} policies/sec), "
+          f"{summary['chunks']:,} chunks, longest {summary['max_chunk_seconds'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Renew paid-up policies nearing their end date.")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--as-of", help="start of the renewal window (YYYY-MM-DD, default: today)")
+    parser.add_argument("--days", type=int, default=30, help="length of the renewal window in days")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="policies renewed per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="price the renewals without writing them")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        load_rates(db)
+        print_summary(renew_policies(db, args.as_of, args.days, args.chunk_size, dry_run=args.dry_run))
+    except sqlite3.Error as e:
+        print(f"Error renewing policies: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Write-aware cache of report query results.
+# Every table a cached report reads has a change counter in table_versions, bumped by triggers on
+# each insert, update and delete, so every write path (the console screens, billing, settlement,
+# the claims engine, ...) invalidates it. A cached result remembers the counters of the tables it
+# was computed from and is served only while they are unchanged and it is younger than the TTL.
+
+# Tables with change counters: everything the cached reports read
+TRACKED_TABLES = ("users", "agents", "policy_package", "purchased_policy", "agent_sales_summary",
+                  "commission_ledger")
+
+
+def _version_triggers(table):
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_version_{table}_{event.lower()}
+        AFTER {event} ON {table}
+        BEGIN
+            UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+        END
+        '''
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS table_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+] + [statement for table in TRACKED_TABLES for statement in _version_triggers(table)]
+
+
+def create_table_versions(cursor):
+    # Migration step: counters for the tracked tables and the triggers that bump them
+    for statement in SCHEMA:
+        cursor.execute(statement)
+    cursor.executemany("INSERT OR IGNORE INTO table_versions (table_name) VALUES (?)",
+                       [(table,) for table in TRACKED_TABLES])
+
+
+def table_versions(db, tables):
+    # Current change counters of `tables`, in the order given
+    db.cursor.execute(f'''
+        SELECT table_name, version FROM table_versions
+        WHERE table_name IN ({', '.join('?' * len(tables))})
+    ''', tuple(tables))
+    versions = dict(db.cursor.fetchall())
+    missing = [table for table in tables if table not in versions]
+    if missing:
+        raise ValueError(f"No change counter for {', '.join(missing)}")
+    return tuple(versions[table] for table in tables)
+
+
+class ReportCache:
+    """
+    Bounded LRU cache of report results keyed by database, query and parameters.
+    An entry is valid while the change counters of the tables it depends on are the
+    ones it was computed under, and for at most `ttl` seconds.
+    """
+    def __init__(self, max_entries=256, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def configure(self, max_entries=None, ttl=None):
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if ttl is not None:
+                self.ttl = ttl
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, db, key, tables, compute):
+        """
+        Result of compute() for `key`, which depends on `tables`: from the cache when it is still
+        current, otherwise computed and stored.
+        """
+        key = (os.path.abspath(db.db_name), key)
+        versions = table_versions(db, tables)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                cached_versions, expires_at, result = entry
+                if cached_versions == versions and now < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+                if cached_versions != versions:
+                    self.invalidations += 1
+                else:
+                    self.expirations += 1
+            self.misses += 1
+
+        result = compute()
+
+        # Changes inside an open transaction may still be rolled back, which would reuse the counters
+        if not db.conn.in_transaction and self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = (versions, now + self.ttl, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.invalidations = self.expirations = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+
+REPORT_CACHE = ReportCache()
+
+
+def cached_query(db, sql, params=(), tables=()):
+    # Rows of a read-only query through the shared cache; `tables` are the tables it reads
+    def run():
+        db.cursor.execute(sql, params)
+        return tuple(db.cursor.fetchall())
+    return REPORT_CACHE.get(db, ("query", sql, tuple(params)), tables, run)
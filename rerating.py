@@ -0,0 +1,202 @@
+import argparse
+import sqlite3
+import time
+
+from batch_rating import RATING_COLUMNS, rate_batch
+from rate_tables import current_rates, load_rates
+
+# Bulk re-rating of the custom policy book.
+# CUSTOM policies are streamed in policy_id order, a chunk at a time, re-priced from their
+# *_policy_details rows with batch_rating, and written back to policy_package and custom_policy.
+# Each chunk is written in one transaction together with the job checkpoint, so an interrupted
+# run resumes right after the last committed chunk. Memory use depends on the chunk size only.
+# purchased_policy premiums are left alone: policies already sold keep the premium they were sold at.
+
+JOB_NAME = "rerate_custom_policies"
+
+# One row per CUSTOM policy with every rating input it could need.
+# The holder's age comes from `users`; custom_policy.customer_id holds either the customer ID or the NRIC.
+CHUNK_SQL = '''
+    SELECT pp.policy_id, pp.policy_type, pp.coverage_amount, pp.premium,
+           (SELECT u.age
+            FROM custom_policy cp
+            LEFT JOIN customers c ON c.customer_id = cp.customer_id
+            JOIN users u ON u.nric = COALESCE(c.nric, cp.customer_id)
+            WHERE cp.policy_id = pp.policy_id
+            LIMIT 1) AS age,
+           COALESCE(ld.medical_history, hd.medical_history) AS medical_history,
+           hd.coverage_type,
+           vd.vehicle_value, vd.vehicle_age,
+           pd.property_value, pd.property_age, pd.property_type
+    FROM policy_package pp
+    LEFT JOIN life_policy_details ld ON ld.policy_id = pp.policy_id
+    LEFT JOIN health_policy_details hd ON hd.policy_id = pp.policy_id
+    LEFT JOIN vehicle_policy_details vd ON vd.policy_id = pp.policy_id
+    LEFT JOIN property_policy_details pd ON pd.policy_id = pp.policy_id
+    WHERE pp.policy_plan = 'CUSTOM' AND pp.policy_id > ?
+    ORDER BY pp.policy_id
+    LIMIT ?
+'''
+
+# Position of each rating input in a CHUNK_SQL row
+ROW_FIELDS = {
+    "coverage_amount": 2, "age": 4, "medical_history": 5, "coverage_type": 6,
+    "vehicle_value": 7, "vehicle_age": 8, "property_value": 9, "property_age": 10, "property_type": 11,
+}
+
+
+def read_checkpoint(db, job_name=JOB_NAME):
+    db.cursor.execute('''
+        SELECT last_key, rows_done, rate_version, status
+        FROM job_checkpoints
+        WHERE job_name = ?
+    ''', (job_name,))
+    return db.cursor.fetchone()
+
+
+def _save_checkpoint(db, job_name, last_key, rows_done, rate_version, status):
+    db.cursor.execute('''
+        INSERT INTO job_checkpoints (job_name, last_key, rows_done, rate_version, status, updated_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT (job_name) DO UPDATE SET
+            last_key = excluded.last_key,
+            rows_done = excluded.rows_done,
+            rate_version = excluded.rate_version,
+            status = excluded.status,
+            updated_at = excluded.updated_at
+    ''', (job_name, last_key, rows_done, rate_version, status))
+
+
+def _rate_chunk(rows, rates):
+    """
+    Re-price one chunk. Returns (priced, skipped) where priced is a list of
+    (policy_id, old_premium, new_premium) and skipped counts rows missing rating inputs.
+    """
+    groups = {}
+    skipped = 0
+    for row in rows:
+        names = RATING_COLUMNS.get(row[1])
+        if names is None or any(row[ROW_FIELDS[name]] is None for name in names):
+            skipped += 1
+            continue
+        groups.setdefault(row[1], []).append(row)
+
+    priced = []
+    for policy_type, group in groups.items():
+        columns = {name: [row[ROW_FIELDS[name]] for row in group] for name in RATING_COLUMNS[policy_type]}
+        premiums = rate_batch(policy_type, columns, rates)
+        priced.extend((row[0], row[3], float(premium)) for row, premium in zip(group, premiums))
+    return priced, skipped
+
+
+def rerate_custom_policies(db, chunk_size=2000, rates=None, restart=False, job_name=JOB_NAME,
+                           progress_every=20000, max_chunks=None):
+    """
+    Re-price every CUSTOM policy with `rates` (default: the current compiled rates).
+    Resumes from the job checkpoint when it was left part-way under the same rate version;
+    a new rate version or `restart=True` starts again from the first policy.
+    `max_chunks` stops after that many chunks, leaving the checkpoint to resume from.
+    Returns a summary dict.
+    """
+    rates = rates or current_rates()
+    last_key, rows_done = "", 0
+    checkpoint = read_checkpoint(db, job_name)
+    if checkpoint and not restart and checkpoint[2] == rates.version:
+        if checkpoint[3] == "completed":
+            print(f"Custom policies are already rated with rate version {rates.version}.")
+            return {"rate_version": rates.version, "rows": 0, "updated": 0, "skipped": 0,
+                    "seconds": 0.0, "rows_per_sec": 0.0, "completed": True}
+        last_key, rows_done = checkpoint[0], checkpoint[1]
+        print(f"Resuming after policy {last_key} ({rows_done:,} rows already done).")
+
+    db.cursor.execute('''
+        SELECT COUNT(*) FROM policy_package WHERE policy_plan = 'CUSTOM' AND policy_id > ?
+    ''', (last_key,))
+    remaining = db.cursor.fetchone()[0]
+    db.conn.commit()
+
+    started = time.perf_counter()
+    processed = updated = skipped = chunks = 0
+    next_report = progress_every
+    completed = False
+    try:
+        while True:
+            db.cursor.execute(CHUNK_SQL, (last_key, chunk_size))
+            rows = db.cursor.fetchall()
+            if not rows:
+                completed = True
+                break
+
+            priced, chunk_skipped = _rate_chunk(rows, rates)
+            changed = [(premium, policy_id) for policy_id, old, premium in priced if old != premium]
+
+            db.cursor.execute("BEGIN")
+            db.cursor.executemany("UPDATE policy_package SET premium = ? WHERE policy_id = ?", changed)
+            db.cursor.executemany('''
+                UPDATE custom_policy SET premium = ?, rate_version = ?
+                WHERE policy_id = ? AND (premium IS NOT ? OR rate_version IS NOT ?)
+            ''', [(premium, rates.version, policy_id, premium, rates.version) for policy_id, _, premium in priced])
+            _save_checkpoint(db, job_name, rows[-1][0], rows_done + processed + len(rows), rates.version, "running")
+            db.conn.commit()
+
+            last_key = rows[-1][0]
+            processed += len(rows)
+            updated += len(changed)
+            skipped += chunk_skipped
+
+            chunks += 1
+            if processed >= next_report:
+                elapsed = time.perf_counter() - started
+                print(f"  {processed:,}/{remaining:,} policies re-rated "
+                      f"({processed / elapsed:,.0f} rows/sec), up to {last_key}")
+                next_report += progress_every
+            if max_chunks is not None and chunks >= max_chunks:
+                break
+
+        if completed:
+            _save_checkpoint(db, job_name, last_key, rows_done + processed, rates.version, "completed")
+            db.conn.commit()
+    except sqlite3.Error as e:
+        db.conn.rollback()
+        print(f"Re-rating stopped at policy {last_key}: {e}")
+        raise
+
+    elapsed = time.perf_counter() - started
+    return {
+        "rate_version": rates.version,
+        "rows": processed,
+        "updated": updated,
+        "skipped": skipped,
+        "seconds": elapsed,
+        "rows_per_sec": processed / elapsed if elapsed > 0 else 0.0,
+        "completed": completed,
+    }
+
+
+def print_summary(summary):
+    state = "Completed" if summary["completed"] else "Paused (resume to continue)"
+    print(f"\n{state}: {summary['rows']:,} custom policies read with rate version {summary['rate_version']}")
+    print(f"  Premiums changed: {summary['updated']:,}")
+    print(f"  Skipped (missing rating details): {summary['skipped']:,}")
+    print(f"  Elapsed: {summary['seconds']:.2f}s ({summary['rows_per_sec']:,.0f} rows/sec)")
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Re-price the custom policy book with the active rate table.")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the beginning")
+    parser.add_argument("--max-chunks", type=int, help="stop after this many chunks (resume later)")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        load_rates(db)
+        print_summary(rerate_custom_policies(db, args.chunk_size, restart=args.restart, max_chunks=args.max_chunks))
+    finally:
+        db.close()
@@ -0,0 +1,269 @@
+import argparse
+import sqlite3
+
+# Materialized agent sales summary.
+# agent_sales_summary holds one row per (agent, year, month, policy type) of sale start date with the
+# number of policies sold, their premium total and the agent's commission on it. Every term of a policy
+# is a sale in the month it started: the current term is the purchased_policy row, and the terms a
+# renewal has closed are in policy_terms. Triggers keep it current as either table's rows are inserted,
+# change status or other sale fields, or are deleted, and when agents are added, removed or change
+# commission rate. The admin and agent reports read from it.
+# A policy counts as a sale unless it is still pending, was rejected, or was cancelled.
+
+NOT_SOLD = ("Pending request", "Rejected", "Cancelled")
+_NOT_SOLD_SQL = ", ".join(f"'{status}'" for status in NOT_SOLD)
+
+# Start of a purchased_policy row's current term; a renewal sets term_start, the first term has none
+TERM_START = "COALESCE({row}.term_start, {row}.start_date)"
+# Start of a policy_terms row
+CLOSED_TERM_START = "{row}.start_date"
+
+# Summary key of a sale starting on {start}
+_KEY = {
+    "agent_id": "COALESCE({row}.agent_id, '')",
+    "year": "COALESCE(strftime('%Y', {start}), '')",
+    "month": "COALESCE(strftime('%m', {start}), '')",
+    "policy_type": "COALESCE({row}.policy_type, '')",
+}
+
+
+def _not_sold(row):
+    # Spelled out rather than IN (...), which builds a lookup table each time a trigger fires
+    return "(" + " OR ".join(f"{row}.status = '{status}'" for status in NOT_SOLD) + ")"
+
+
+def _key(row, start=TERM_START, aliased=False):
+    start = start.format(row=row)
+    return ", ".join(expression.format(row=row, start=start) + (f" AS {name}" if aliased else "")
+                     for name, expression in _KEY.items())
+
+
+def _apply_policy(row, sign, start=TERM_START):
+    # Upsert adding (sign=+1) or removing (sign=-1) one sold policy term
+    return f'''
+        INSERT INTO agent_sales_summary (agent_id, year, month, policy_type, policy_count, premium_total,
+                                         commission_total)
+        SELECT {_key(row, start)}, {sign}, {sign} * COALESCE({row}.premium, 0),
+               {sign} * COALESCE({row}.premium, 0)
+                   * COALESCE((SELECT commission_rate FROM agents WHERE agent_id = {row}.agent_id), 0) / 100.0
+        WHERE NOT {_not_sold(row)}
+        ON CONFLICT (agent_id, year, month, policy_type) DO UPDATE SET
+            policy_count = policy_count + excluded.policy_count,
+            premium_total = premium_total + excluded.premium_total,
+            commission_total = commission_total + excluded.commission_total;
+        DELETE FROM agent_sales_summary
+        WHERE (agent_id, year, month, policy_type) = ({_key(row, start)}) AND policy_count = 0;
+    '''
+
+
+def _reprice_agent(row):
+    # Recompute commission on all of an agent's summary rows at the rate the agent has now
+    return f'''
+        UPDATE agent_sales_summary
+        SET commission_total = premium_total
+            * COALESCE((SELECT commission_rate FROM agents WHERE agent_id = {row}.agent_id), 0) / 100.0
+        WHERE agent_id = {row}.agent_id;
+    '''
+
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS agent_sales_summary (
+        agent_id TEXT NOT NULL,
+        year TEXT NOT NULL,
+        month TEXT NOT NULL,
+        policy_type TEXT NOT NULL,
+        policy_count INTEGER NOT NULL DEFAULT 0,
+        premium_total REAL NOT NULL DEFAULT 0,
+        commission_total REAL NOT NULL DEFAULT 0,
+        PRIMARY KEY (agent_id, year, month, policy_type)
+    )
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_sales_policy_insert
+    AFTER INSERT ON purchased_policy
+    BEGIN
+        {_apply_policy("new", 1)}
+    END
+    ''',
+    # Moving between two sold statuses (e.g. 'Accepted' to 'Premium paid') leaves the summary unchanged.
+    # A renewal moves the row to its new term's month; the closed term is added back from policy_terms.
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_sales_policy_update
+    AFTER UPDATE OF status, premium, agent_id, policy_type, start_date, term_start ON purchased_policy
+    WHEN {_not_sold('old')} IS NOT {_not_sold('new')}
+      OR old.premium IS NOT new.premium OR old.agent_id IS NOT new.agent_id
+      OR old.policy_type IS NOT new.policy_type OR old.start_date IS NOT new.start_date
+      OR old.term_start IS NOT new.term_start
+    BEGIN
+        {_apply_policy("old", -1)}
+        {_apply_policy("new", 1)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_sales_policy_delete
+    AFTER DELETE ON purchased_policy
+    BEGIN
+        {_apply_policy("old", -1)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_sales_term_insert
+    AFTER INSERT ON policy_terms
+    BEGIN
+        {_apply_policy("new", 1, CLOSED_TERM_START)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_sales_term_update
+    AFTER UPDATE OF status, premium, agent_id, policy_type, start_date ON policy_terms
+    WHEN {_not_sold('old')} IS NOT {_not_sold('new')}
+      OR old.premium IS NOT new.premium OR old.agent_id IS NOT new.agent_id
+      OR old.policy_type IS NOT new.policy_type OR old.start_date IS NOT new.start_date
+    BEGIN
+        {_apply_policy("old", -1, CLOSED_TERM_START)}
+        {_apply_policy("new", 1, CLOSED_TERM_START)}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_sales_term_delete
+    AFTER DELETE ON policy_terms
+    BEGIN
+        {_apply_policy("old", -1, CLOSED_TERM_START)}
+    END
+    ''',
+    # Commission follows the agent's current rate, as the reports always have. Policies can be loaded
+    # before their agent row exists, so adding or removing an agent reprices its rows too.
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_sales_agent_insert
+    AFTER INSERT ON agents
+    BEGIN
+        {_reprice_agent("new")}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_sales_agent_update
+    AFTER UPDATE OF agent_id, commission_rate ON agents
+    WHEN old.agent_id IS NOT new.agent_id OR old.commission_rate IS NOT new.commission_rate
+    BEGIN
+        {_reprice_agent("old")}
+        {_reprice_agent("new")}
+    END
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_sales_agent_delete
+    AFTER DELETE ON agents
+    BEGIN
+        {_reprice_agent("old")}
+    END
+    ''',
+]
+
+RECOMPUTE_SQL = f'''
+    SELECT s.agent_id, s.year, s.month, s.policy_type, COUNT(*), SUM(s.premium),
+           SUM(s.premium) * COALESCE(a.commission_rate, 0) / 100.0
+    FROM (
+        SELECT {_key("pp", aliased=True)}, COALESCE(pp.premium, 0) AS premium
+        FROM purchased_policy pp
+        WHERE pp.status NOT IN ({_NOT_SOLD_SQL})
+        UNION ALL
+        SELECT {_key("t", CLOSED_TERM_START)}, COALESCE(t.premium, 0)
+        FROM policy_terms t
+        WHERE t.status NOT IN ({_NOT_SOLD_SQL})
+    ) s
+    LEFT JOIN agents a ON a.agent_id = s.agent_id
+    GROUP BY 1, 2, 3, 4
+'''
+
+
+def fix_policy_agent_ids(cursor):
+    # select_prepared_policy used to store the agent's NRIC as agent_id; point those rows at the agent
+    cursor.execute('''
+        UPDATE purchased_policy
+        SET agent_id = (SELECT agent_id FROM agents WHERE agents.nric = purchased_policy.agent_id)
+        WHERE agent_id NOT IN (SELECT agent_id FROM agents)
+          AND agent_id IN (SELECT nric FROM agents)
+    ''')
+
+
+def create_sales_summary(cursor):
+    # Migration step: create the table. The triggers read policy terms, so recreate_sales_triggers in a
+    # later migration installs them and fills the table
+    cursor.execute(SCHEMA[0])
+
+
+def recreate_sales_triggers(cursor):
+    # Migration step: replace the triggers with their current definitions, then refill the table
+    for statement in SCHEMA[1:]:
+        name = statement.split("IF NOT EXISTS", 1)[1].split()[0]
+        cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(statement)
+    rebuild_sales_summary(cursor)
+
+
+def rebuild_sales_summary(cursor):
+    cursor.execute("DELETE FROM agent_sales_summary")
+    cursor.execute(f'''
+        INSERT INTO agent_sales_summary (agent_id, year, month, policy_type, policy_count, premium_total,
+                                         commission_total)
+        {RECOMPUTE_SQL}
+    ''')
+    return cursor.rowcount
+
+
+def verify_sales_summary(db, tolerance=0.005):
+    """
+    Compare agent_sales_summary with a full recompute from purchased_policy and policy_terms.
+    Returns a list of (key, stored, recomputed) for rows that differ, where key is
+    (agent_id, year, month, policy_type) and stored/recomputed are (count, premium, commission) or None.
+    """
+    db.cursor.execute(f'''
+        WITH fresh (agent_id, year, month, policy_type, policy_count, premium_total, commission_total) AS (
+            {RECOMPUTE_SQL}
+        )
+        SELECT f.agent_id, f.year, f.month, f.policy_type,
+               s.policy_count, s.premium_total, s.commission_total,
+               f.policy_count, f.premium_total, f.commission_total
+        FROM fresh f
+        LEFT JOIN agent_sales_summary s USING (agent_id, year, month, policy_type)
+        WHERE s.agent_id IS NULL OR s.policy_count != f.policy_count
+           OR ABS(s.premium_total - f.premium_total) > ? OR ABS(s.commission_total - f.commission_total) > ?
+        UNION ALL
+        SELECT s.agent_id, s.year, s.month, s.policy_type,
+               s.policy_count, s.premium_total, s.commission_total, NULL, NULL, NULL
+        FROM agent_sales_summary s
+        WHERE NOT EXISTS (SELECT 1 FROM fresh f
+                          WHERE (f.agent_id, f.year, f.month, f.policy_type)
+                              = (s.agent_id, s.year, s.month, s.policy_type))
+    ''', (tolerance, tolerance))
+    return [(row[:4], row[4:7] if row[4] is not None else None, row[7:] if row[7] is not None else None)
+            for row in db.cursor.fetchall()]
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Verify or rebuild the agent sales summary.")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--rebuild", action="store_true", help="recompute the whole table from the policy terms")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        mismatches = verify_sales_summary(db)
+        print(f"{len(mismatches)} summary rows differ from a full recompute.")
+        for key, stored, recomputed in mismatches[:20]:
+            print(f"  {' / '.join(key)}: stored {stored}, recomputed {recomputed}")
+        if args.rebuild:
+            try:
+                rows = rebuild_sales_summary(db.cursor)
+                db.conn.commit()
+                print(f"Rebuilt {rows} summary rows.")
+            except sqlite3.Error as e:
+                db.conn.rollback()
+                print(f"Error rebuilding sales summary: {e}")
+    finally:
+        db.close()
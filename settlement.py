@@ -0,0 +1,224 @@
+import argparse
+import csv
+import sqlite3
+import time
+from itertools import islice
+
+from id_allocator import format_id, get_allocator
+
+# Bank settlement file reconciliation.
+# The provider's CSV is read a batch of lines at a time. Each record is matched to an existing payment
+# by payment_id, or to a purchased policy by (customer_id, policy_id) when the provider initiated it,
+# using primary-key lookups. Matches update or create the payment and settle the policy; records that
+# don't match are written to a reject file with the reason. Every payment keeps its provider_reference,
+# which is unique, so a record already applied (in this file or an earlier one) is skipped as a duplicate.
+
+# Provider statuses and the payment status they become
+STATUS_MAP = {
+    "SETTLED": "Completed",
+    "COMPLETED": "Completed",
+    "FAILED": "Failed",
+    "RETURNED": "Failed",
+    "REJECTED": "Failed",
+}
+REQUIRED_COLUMNS = ("provider_reference", "amount", "status")
+
+# Outcomes of applying one record
+UPDATED = "updated"
+INSERTED = "inserted"
+DUPLICATE = "duplicate"
+
+
+class Rejected(Exception):
+    # A settlement record that can't be applied; the message is written to the reject file
+    pass
+
+
+def _parse(record):
+    reference = (record.get("provider_reference") or "").strip()
+    if not reference:
+        raise Rejected("missing provider_reference")
+    status = STATUS_MAP.get((record.get("status") or "").strip().upper())
+    if status is None:
+        raise Rejected(f"unknown status '{record.get('status')}'")
+    try:
+        amount = round(float(record.get("amount")), 2)
+    except (TypeError, ValueError):
+        raise Rejected(f"invalid amount '{record.get('amount')}'")
+    return reference, status, amount
+
+
+def _amounts_differ(expected, amount):
+    return expected is None or abs(float(expected) - amount) > 0.005
+
+
+def _settle_policy(db, customer_id, policy_id):
+    db.cursor.execute('''
+        UPDATE purchased_policy
+        SET status = 'Premium paid'
+        WHERE customer_id = ? AND policy_id = ? AND status = 'Accepted'
+    ''', (customer_id, policy_id))
+
+
+def _unsettle_policy(db, customer_id, policy_id):
+    # A returned payment leaves the policy unpaid again, unless another payment covers its current term
+    db.cursor.execute('''
+        UPDATE purchased_policy
+        SET status = 'Accepted'
+        WHERE customer_id = ? AND policy_id = ? AND status = 'Premium paid'
+          AND NOT EXISTS (SELECT 1 FROM payments
+                          WHERE policy_id = ? AND customer_id = ? AND status = 'Completed'
+                            AND term = purchased_policy.term)
+    ''', (customer_id, policy_id, policy_id, customer_id))
+
+
+def apply_record(db, record, allocator, payment_method):
+    """Apply one settlement record inside the caller's transaction. Returns the outcome or raises Rejected."""
+    reference, status, amount = _parse(record)
+    settled_at = (record.get("settled_at") or "").strip() or None
+
+    db.cursor.execute("SELECT 1 FROM payments WHERE provider_reference = ?", (reference,))
+    if db.cursor.fetchone():
+        return DUPLICATE
+
+    payment_id = (record.get("payment_id") or "").strip()
+    if payment_id:
+        # Settlement of a payment we already recorded
+        db.cursor.execute('''
+            SELECT customer_id, policy_id, amount, provider_reference, status
+            FROM payments
+            WHERE payment_id = ?
+        ''', (payment_id,))
+        payment = db.cursor.fetchone()
+        if not payment:
+            raise Rejected(f"unknown payment_id {payment_id}")
+        customer_id, policy_id, expected, existing_reference, previous_status = payment
+        if existing_reference:
+            raise Rejected(f"payment {payment_id} was already settled as {existing_reference}")
+        if _amounts_differ(expected, amount):
+            raise Rejected(f"amount {amount:.2f} does not match payment amount {expected}")
+        db.cursor.execute('''
+            UPDATE payments
+            SET status = ?, provider_reference = ?, payment_date = COALESCE(?, payment_date)
+            WHERE payment_id = ?
+        ''', (status, reference, settled_at, payment_id))
+        if previous_status == "Completed" and status == "Failed":
+            _unsettle_policy(db, customer_id, policy_id)
+        outcome = UPDATED
+    else:
+        # Payment collected by the provider: match it to the policy it pays for
+        customer_id = (record.get("customer_id") or "").strip()
+        policy_id = (record.get("policy_id") or "").strip()
+        if not customer_id or not policy_id:
+            raise Rejected("needs payment_id, or customer_id and policy_id")
+        db.cursor.execute('''
+            SELECT premium, term FROM purchased_policy WHERE customer_id = ? AND policy_id = ?
+        ''', (customer_id, policy_id))
+        policy = db.cursor.fetchone()
+        if not policy:
+            raise Rejected(f"no policy {policy_id} for customer {customer_id}")
+        if _amounts_differ(policy[0], amount):
+            raise Rejected(f"amount {amount:.2f} does not match premium {policy[0]}")
+        if status == "Completed":
+            db.cursor.execute('''
+                SELECT payment_id FROM payments
+                WHERE policy_id = ? AND customer_id = ? AND status = 'Completed' AND term = ?
+            ''', (policy_id, customer_id, policy[1]))
+            paid = db.cursor.fetchone()
+            if paid:
+                raise Rejected(f"policy {policy_id} is already paid by {paid[0]}")
+        payment_id = format_id("payment", allocator.reserve("payment", 1, db).start)
+        db.cursor.execute('''
+            INSERT INTO payments (payment_id, customer_id, policy_id, amount, payment_date, payment_method,
+                                  status, provider_reference, term)
+            VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?, ?, ?, ?)
+        ''', (payment_id, customer_id, policy_id, amount, settled_at, payment_method, status, reference,
+              policy[1]))
+        outcome = INSERTED
+
+    if status == "Completed":
+        _settle_policy(db, customer_id, policy_id)
+    return outcome
+
+
+def reconcile(db, settlement_file, reject_file, batch_size=1000, payment_method="Bank Settlement"):
+    """
+    Apply a settlement CSV. Rejected records go to `reject_file` with a reason column.
+    Returns a summary dict with counts per outcome and records/sec.
+    """
+    allocator = get_allocator(db)
+    counts = {UPDATED: 0, INSERTED: 0, DUPLICATE: 0, "rejected": 0}
+    records = 0
+    started = time.perf_counter()
+    db.conn.commit()
+
+    with open(settlement_file, newline="") as source, open(reject_file, "w", newline="") as rejects:
+        reader = csv.DictReader(source)
+        missing = [name for name in REQUIRED_COLUMNS if name not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"Settlement file is missing columns: {', '.join(missing)}")
+        reject_writer = csv.DictWriter(rejects, fieldnames=reader.fieldnames + ["reject_reason"],
+                                       extrasaction="ignore")
+        reject_writer.writeheader()
+
+        while True:
+            batch = list(islice(reader, batch_size))
+            if not batch:
+                break
+            # Outcomes and rejects of the batch only count once its transaction has committed
+            outcomes = []
+            rejected = []
+            try:
+                db.cursor.execute("BEGIN IMMEDIATE")
+                for record in batch:
+                    try:
+                        outcomes.append(apply_record(db, record, allocator, payment_method))
+                    except Rejected as e:
+                        record["reject_reason"] = str(e)
+                        rejected.append(record)
+                db.conn.commit()
+            except sqlite3.Error as e:
+                db.conn.rollback()
+                print(f"Reconciliation stopped after {records:,} records: {e}")
+                raise
+            for outcome in outcomes:
+                counts[outcome] += 1
+            counts["rejected"] += len(rejected)
+            reject_writer.writerows(rejected)
+            records += len(batch)
+
+    elapsed = time.perf_counter() - started
+    return dict(counts, records=records, seconds=elapsed,
+                records_per_sec=records / elapsed if elapsed > 0 else 0.0)
+
+
+def print_summary(summary, reject_file):
+    print("\n============[ Settlement Reconciliation ]============")
+    print(f"Records read         : {summary['records']:,}")
+    print(f"Payments settled     : {summary[UPDATED]:,}")
+    print(f"Payments created     : {summary[INSERTED]:,}")
+    print(f"Duplicates skipped   : {summary[DUPLICATE]:,}")
+    print(f"Rejected             : {summary['rejected']:,} (see {reject_file})")
+    print(f"Elapsed              : {summary['seconds']:.2f}s ({summary['records_per_sec']:,.0f} records/sec)")
+
+
+if __name__ == "__main__":
+    from database_setup import DatabaseManager
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Reconcile a bank settlement CSV against payments.")
+    parser.add_argument("settlement_file")
+    parser.add_argument("--rejects", default="settlement_rejects.csv", help="where unmatched records are written")
+    parser.add_argument("--db", default="insurance_system.db")
+    parser.add_argument("--batch-size", type=int, default=1000, help="records applied per transaction")
+    args = parser.parse_args()
+
+    db = DatabaseManager(args.db)
+    try:
+        db.connect()
+        run_migrations(db)
+        print_summary(reconcile(db, args.settlement_file, args.rejects, args.batch_size), args.rejects)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,26 @@
+from commission_ledger import verify_balances
+
+
+def _commission_by_year(db):
+    db.cursor.execute('''
+        SELECT strftime('%Y', effective_date), SUM(commission_amount)
+        FROM commission_ledger
+        WHERE agent_id = 'AG02' AND payment_id = 'PAY99'
+        GROUP BY 1
+    ''')
+    return db.cursor.fetchall()
+
+
+def test_commission_is_dated_by_payment(db):
+    # A payment recorded late is earned in the year it was paid, and its reversal cancels it there
+    db.cursor.execute('''
+        INSERT INTO payments (payment_id, customer_id, policy_id, amount, payment_date, payment_method, status)
+        VALUES ('PAY99', '850317138494', 'H002', 25000, '2023-12-30', 'Bank Transfer', 'Completed')
+    ''')
+    db.conn.commit()
+    assert _commission_by_year(db) == [("2023", 2500.0)]
+
+    db.cursor.execute("DELETE FROM payments WHERE payment_id = 'PAY99'")
+    db.conn.commit()
+    assert _commission_by_year(db) == [("2023", 0.0)]
+    assert verify_balances(db) == []
@@ -0,0 +1,21 @@
+from export import build_query, iter_rows, parse_filter
+
+
+def _export(db, dataset, *filters):
+    sql, params, columns = build_query(dataset, filters=[parse_filter(text) for text in filters])
+    return [dict(zip(columns, row)) for row in iter_rows(db, sql, params)]
+
+
+def test_text_id_keeps_leading_zero(db):
+    rows = _export(db, "purchased_policies", "customer_id=010410150097")
+    assert {row["policy_id"] for row in rows} == {"L002", "H001", "P002"}
+
+
+def test_numeric_column_compares_numerically(db):
+    rows = _export(db, "purchased_policies", "premium>=15000", "premium<20000")
+    assert {row["policy_id"] for row in rows} == {"L002", "V002"}
+
+
+def test_computed_column_compares_numerically(db):
+    rows = _export(db, "agents", "policies_sold>=4")
+    assert [row["agent_id"] for row in rows] == ["AG02"]
@@ -0,0 +1,28 @@
+from performance_cube import query_cube, refresh_cube, verify_cube
+
+
+def _set_status(db, customer_id, policy_id, status):
+    db.cursor.execute("UPDATE purchased_policy SET status = ? WHERE customer_id = ? AND policy_id = ?",
+                      (status, customer_id, policy_id))
+    db.conn.commit()
+
+
+def _cancelled(db, agent_id):
+    columns, rows = query_cube(db, by=("agent_id",), agent_id=agent_id)
+    return rows[0][columns.index("cancelled_count")]
+
+
+def test_changes_after_a_refresh_are_folded_in(db):
+    # The sample data's inserts are logged; folding them in empties the log
+    first = refresh_cube(db)
+    assert first["changes"] > 0
+    assert verify_cube(db) == []
+
+    _set_status(db, "010410150097", "L002", "Cancelled")
+    second = refresh_cube(db)
+    assert second["changes"] > 0 and second["watermark"] > first["watermark"]
+    assert verify_cube(db) == []
+
+    _set_status(db, "970521125566", "V002", "Cancelled")
+    assert _cancelled(db, "AG02") == 2
+    assert verify_cube(db) == []
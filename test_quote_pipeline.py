@@ -0,0 +1,19 @@
+import csv
+
+from quote_pipeline import run_pipeline
+
+
+def test_row_with_extra_fields_is_an_error_row(tmp_path):
+    source = tmp_path / "quotes.csv"
+    source.write_text("policy_type,age,coverage_amount,medical_history\n"
+                      "LIFE,30,100000,None\n"
+                      "LIFE,30,100000,None,surplus\n"
+                      "LIFE,40,100000,None\n")
+    target = tmp_path / "quoted.csv"
+    summary = run_pipeline(str(source), str(target), workers=1)
+    assert summary["rows"] == 3 and summary["errors"] == 1
+
+    with open(target, newline="") as output:
+        rows = list(csv.DictReader(output))
+    assert [row["error"] for row in rows] == ["", "1 more field(s) than the header", ""]
+    assert rows[0]["premium"] and rows[2]["premium"] and not rows[1]["premium"]
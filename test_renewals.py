@@ -0,0 +1,93 @@
+from batch_rating import rate_batch
+from exposure import get_exposure, verify_exposure
+from performance_cube import query_cube, verify_cube
+from renewals import renew_policies
+from sales_summary import verify_sales_summary
+
+# Sample data: 850317138494 holds prepared plan H002 (premium 25000, coverage 200000) ending 2025-06-15.
+# The H002 row in health_policy_details belongs to another customer.
+HOLDER = "850317138494"
+
+
+def _policy(db, customer_id, policy_id):
+    db.cursor.execute('''
+        SELECT term, premium, status, end_date FROM purchased_policy WHERE customer_id = ? AND policy_id = ?
+    ''', (customer_id, policy_id))
+    return db.cursor.fetchone()
+
+
+def _pay_up(db, customer_id, policy_id):
+    db.cursor.execute("UPDATE purchased_policy SET status = 'Premium paid' WHERE customer_id = ? AND policy_id = ?",
+                      (customer_id, policy_id))
+    db.conn.commit()
+
+
+def _sales(db, year, month):
+    db.cursor.execute('''
+        SELECT policy_count, premium_total FROM agent_sales_summary
+        WHERE agent_id = 'AG02' AND year = ? AND month = ? AND policy_type = 'HEALTH'
+    ''', (year, month))
+    return db.cursor.fetchone()
+
+
+def _cube(db, month):
+    columns, rows = query_cube(db, by=("month",), agent_id="AG02", start_month=month, end_month=month,
+                               policy_type="HEALTH")
+    return [row[columns.index("policy_count"):] for row in rows]
+
+
+def test_prepared_plan_renews_at_package_premium(db):
+    _pay_up(db, HOLDER, "H002")
+    summary = renew_policies(db, as_of="2025-06-01", days=30)
+    assert summary["renewed"] == 1 and summary["skipped"] == 0
+    assert _policy(db, HOLDER, "H002") == (2, 25000, "Accepted", "2026-06-15")
+
+
+def test_custom_policy_rated_from_holders_details_only(db):
+    # A custom policy whose details row names a different customer isn't priced from it
+    db.cursor.execute('''
+        INSERT INTO purchased_policy (customer_id, policy_id, agent_id, policy_type, policy_plan, coverage_amount,
+                                      premium, status, start_date, end_date)
+        VALUES (?, 'H003', 'AG01', 'HEALTH', 'CUSTOM', 150000, 12000, 'Active', '2024-06-10', '2025-06-10')
+    ''', (HOLDER,))
+    db.conn.commit()
+    summary = renew_policies(db, as_of="2025-06-01", days=30)
+    assert summary["renewed"] == 0 and summary["skipped"] == 1
+
+    # Once the details are the holder's, the renewal premium comes from them
+    db.cursor.execute("UPDATE health_policy_details SET customer_id = 'C03' WHERE policy_id = 'H003'")
+    db.conn.commit()
+    summary = renew_policies(db, as_of="2025-06-01", days=30)
+    assert summary["renewed"] == 1
+    expected = rate_batch("HEALTH", {"age": [40], "coverage_amount": [150000], "coverage_type": ["COMPREHENSIVE"],
+                                     "medical_history": ["Minor asthma"]})[0]
+    assert _policy(db, HOLDER, "H003")[:2] == (2, expected)
+
+
+def test_renewal_restores_coverage(db):
+    _pay_up(db, HOLDER, "H002")
+    db.cursor.execute('''
+        INSERT INTO claims (claim_id, policy_id, customer_id, details, amount, status, date_filed)
+        VALUES ('CL99', 'H002', ?, 'Surgery', 200000, 'Accepted', '2025-03-01')
+    ''', (HOLDER,))
+    db.conn.commit()
+    assert get_exposure(db, HOLDER, "H002")["remaining_coverage"] == 0
+
+    renew_policies(db, as_of="2025-06-01", days=30)
+    exposure = get_exposure(db, HOLDER, "H002")
+    assert exposure["remaining_coverage"] == 200000 and exposure["claim_count"] == 0
+    assert verify_exposure(db) == []
+
+
+def test_repriced_renewal_is_a_sale_in_its_own_month(db):
+    # H002 started in 2024-06; its renewal starts 2025-06-15 at the package's new premium
+    _pay_up(db, HOLDER, "H002")
+    db.cursor.execute("UPDATE policy_package SET premium = 27000 WHERE policy_id = 'H002'")
+    db.conn.commit()
+    first_month = _sales(db, "2024", "06"), _cube(db, "2024-06")
+
+    renew_policies(db, as_of="2025-06-01", days=30)
+    assert (_sales(db, "2024", "06"), _cube(db, "2024-06")) == first_month
+    assert _sales(db, "2025", "06") == (1, 27000)
+    assert [row[:2] for row in _cube(db, "2025-06")] == [(1, 27000)]
+    assert verify_sales_summary(db) == [] and verify_cube(db) == []